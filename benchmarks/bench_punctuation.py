@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+标点修复基准测试
+对比单遍实现 fix_punctuation 与逐条应用规则的 fix_punctuation_sequential 处理每段内容的耗时，
+并校验两者结果一致。
+
+用法:
+    python benchmarks/bench_punctuation.py [--chunks 200] [--chunk-size 4000] [--noise 0.05]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_text
+from core.text_processing import fix_punctuation, fix_punctuation_sequential
+
+# 模型输出中常见的标点问题
+NOISE = ["。。。。。。", "！！！！！", "？？？？", "。，", "，。", "！。", "。！", "？。", "。？",
+         "......", "!!!!", "????", '""', "。，。", "……"]
+
+
+def make_chunk(rng, size, noise):
+    """生成一段正文，并按比例在句末插入有问题的标点"""
+    text = make_text(rng, size)
+    parts = text.split("。")
+    return "".join(part + (rng.choice(NOISE) if rng.random() < noise else "。") for part in parts)
+
+
+def timed(func, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标点修复基准测试")
+    parser.add_argument("--chunks", type=int, default=200, help="内容段数")
+    parser.add_argument("--chunk-size", type=int, default=4000, help="每段字数")
+    parser.add_argument("--noise", type=float, default=0.05, help="句末插入问题标点的比例")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunks = [make_chunk(rng, args.chunk_size, args.noise) for _ in range(args.chunks)]
+    # 与 clean_lines 一致，按行调用
+    lines = [line for chunk in chunks for line in chunk.splitlines()]
+    for line in lines:
+        assert fix_punctuation(line) == fix_punctuation_sequential(line), line
+    print(f"一致性校验通过（{len(chunks)} 段，{len(lines)} 行）")
+
+    fast = timed(fix_punctuation, lines, args.repeat)
+    slow = timed(fix_punctuation_sequential, lines, args.repeat)
+    print(f"\n{'实现':<12} {'每段耗时(ms)':>14}")
+    print(f"{'逐条规则':<12} {slow / len(chunks) * 1000:>14.3f}")
+    print(f"{'单遍':<12} {fast / len(chunks) * 1000:>14.3f}")
+    print(f"加速比: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
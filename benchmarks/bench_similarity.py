@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+相似度计算基准测试
+对比后缀自动机实现与原动态规划实现的耗时，并校验两者结果一致。
+
+用法:
+    python benchmarks/bench_similarity.py [--sizes 500,1000,2000] [--tail 10000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.text_similarity import similarity, similarity_dp
+
+
+def make_text(rng, length, alphabet_size=3000):
+    """生成随机中文文本（仅包含汉字，对应去除标点后的简化文本）"""
+    return "".join(chr(0x4e00 + rng.randrange(alphabet_size)) for _ in range(length))
+
+
+def make_pair(rng, chunk_size, tail_size):
+    """生成一段新内容和小说尾部，新内容中嵌入一段尾部原文以模拟重复"""
+    tail = make_text(rng, tail_size)
+    chunk = make_text(rng, chunk_size)
+    overlap = rng.randrange(chunk_size // 2 + 1)
+    start = rng.randrange(tail_size - overlap + 1)
+    pos = rng.randrange(chunk_size - overlap + 1)
+    chunk = chunk[:pos] + tail[start:start + overlap] + chunk[pos + overlap:]
+    return chunk, tail
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def check_parity(rng, rounds=2000):
+    """在小规模随机文本上校验两种实现结果完全一致"""
+    for _ in range(rounds):
+        a = "".join(rng.choice("甲乙丙") for _ in range(rng.randint(0, 40)))
+        b = "".join(rng.choice("甲乙丙") for _ in range(rng.randint(0, 40)))
+        assert similarity(a, b) == similarity_dp(a, b), (a, b)
+    print(f"一致性校验通过（{rounds} 组随机文本）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="相似度计算基准测试")
+    parser.add_argument("--sizes", default="500,1000,2000", help="新内容长度列表，逗号分隔")
+    parser.add_argument("--tail", type=int, default=10000, help="小说尾部长度（生成器中为最近1万字）")
+    parser.add_argument("--skip-dp", action="store_true", help="跳过原动态规划实现（规模较大时非常慢）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    check_parity(rng)
+
+    print(f"\n{'新内容长度':>10} {'尾部长度':>10} {'自动机(ms)':>12} {'动态规划(ms)':>14} {'加速比':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        chunk, tail = make_pair(rng, size, args.tail)
+        fast, fast_time = timed(similarity, chunk, tail)
+        if args.skip_dp:
+            print(f"{size:>10} {args.tail:>10} {fast_time * 1000:>12.2f} {'-':>14} {'-':>8}")
+            continue
+        slow, slow_time = timed(similarity_dp, chunk, tail)
+        assert fast == slow, (fast, slow)
+        print(f"{size:>10} {args.tail:>10} {fast_time * 1000:>12.2f} {slow_time * 1000:>14.2f} "
+              f"{slow_time / fast_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟大模型服务
+提供与 OpenAI 兼容的 /v1/chat/completions 接口，用于离线测量 NovelGenerator 的吞吐量。
+
+- 响应延迟按配置的分布随机抽样（fixed / uniform / exponential / lognormal）
+- 支持普通 JSON 响应和 SSE 流式响应
+- 按概率注入 429（带 Retry-After）和 500 错误
+- 返回的正文由随机种子决定，同一种子、同一请求序号得到相同内容
+- GET /stats 返回请求计数，便于基准测试核对错误注入情况
+- 模拟 MidJourney（/mj/...）和 Suno（/suno/...）媒体接口：任务提交 media_delay 秒后完成，
+  结果中的图片和音频链接指向本服务的 /files/...；文件下载支持 Range 请求，
+  可以让前 download_failures 次下载在传输一半时断开连接
+
+用法:
+    python benchmarks/mock_llm_server.py [--port 8765] [--latency lognormal:0.8:0.3]
+                                         [--chars 2000] [--rate-429 0.05] [--rate-500 0.02]
+
+然后以 base_url="http://127.0.0.1:8765/v1/chat/completions" 创建 NovelGenerator。
+"""
+
+import os
+import json
+import math
+import random
+import asyncio
+import argparse
+import threading
+
+from aiohttp import web
+
+COMPLETIONS_PATH = "/v1/chat/completions"
+
+# 常用汉字区间，生成的正文只用于测量，不需要可读
+_CJK_START = 0x4e00
+_CJK_RANGE = 3000
+
+
+class LatencyModel:
+    """响应延迟分布
+
+    规格字符串格式为 "<分布>:<参数>..."，单位为秒:
+        fixed:0.5              固定延迟
+        uniform:0.2:1.0        [0.2, 1.0] 均匀分布
+        exponential:0.5        均值为0.5的指数分布
+        lognormal:0.8:0.3      中位数为0.8、对数标准差为0.3的对数正态分布
+    """
+
+    KINDS = ("fixed", "uniform", "exponential", "lognormal")
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"未知的延迟分布: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        parts = spec.split(":")
+        values = [float(v) for v in parts[1:]]
+        return cls(parts[0], *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.a) if self.a > 0 else 0.0
+        # 对数正态分布：a 为中位数
+        return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"LatencyModel({self.kind}, {self.a}, {self.b})"
+
+
+def make_text(rng: random.Random, length: int) -> str:
+    """生成指定长度左右的随机中文正文，按句号分句、按空行分段"""
+    paragraphs = []
+    total = 0
+    while total < length:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            clause = "".join(chr(_CJK_START + rng.randrange(_CJK_RANGE)) for _ in range(rng.randint(8, 20)))
+            tail = "".join(chr(_CJK_START + rng.randrange(_CJK_RANGE)) for _ in range(rng.randint(6, 16)))
+            sentences.append(f"{clause}，{tail}。")
+        paragraph = "".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+class MockLLMServer:
+    """模拟对话补全服务
+
+    可以在当前事件循环中启动（start/stop），也可以通过命令行单独运行。
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: LatencyModel = None,
+                 chars: int = 2000,
+                 stream_chunk_chars: int = 20,
+                 stream_interval: float = 0.005,
+                 rate_429: float = 0.0,
+                 rate_500: float = 0.0,
+                 retry_after: float = 1.0,
+                 media_delay: float = 0.0,
+                 file_size: int = 4096,
+                 download_failures: int = 0,
+                 seed: int = 0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示随机分配
+            latency: 返回首个字节前的延迟分布
+            chars: 每次响应的正文字符数
+            stream_chunk_chars: 流式响应中每个数据块的字符数
+            stream_interval: 流式响应中数据块之间的间隔（秒）
+            rate_429: 返回429的概率
+            rate_500: 返回500的概率
+            retry_after: 429响应中 Retry-After 头的秒数
+            media_delay: 媒体任务从提交到完成的秒数
+            file_size: /files/... 返回的文件字节数
+            download_failures: 前多少次文件下载在传输一半时断开连接
+            seed: 随机种子，决定延迟、错误注入和正文内容
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency or LatencyModel("fixed", 0.0)
+        self.chars = chars
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.stream_interval = stream_interval
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.retry_after = retry_after
+        self.media_delay = media_delay
+        self.file_size = file_size
+        self.download_failures = download_failures
+        self.seed = seed
+
+        self.stats = {"requests": 0, "ok": 0, "stream": 0, "status_429": 0, "status_500": 0, "chars": 0,
+                      "media_submits": 0, "media_polls": 0, "downloads": 0, "range_requests": 0,
+                      "download_bytes": 0}
+        self.media_tasks = {}  # 任务ID -> 提交时间
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{COMPLETIONS_PATH}"
+
+    @property
+    def media_url(self) -> str:
+        """媒体接口地址，用作 MediaGenerator 的 base_url"""
+        return f"http://{self.host}:{self.port}"
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(COMPLETIONS_PATH, self.handle_completion)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_post("/mj/submit/imagine", self.handle_mj_submit)
+        app.router.add_post("/mj/task/list-by-condition", self.handle_mj_list)
+        app.router.add_post("/suno/submit/music", self.handle_suno_submit)
+        app.router.add_get("/suno/fetch/{task_id}", self.handle_suno_fetch)
+        app.router.add_get("/files/{name}", self.handle_file)
+        return app
+
+    async def start(self) -> str:
+        """在当前事件循环中启动服务，返回接口地址"""
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def handle_completion(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        number = self.stats["requests"]
+        self.stats["requests"] += 1
+
+        # 每个请求使用独立的随机数生成器，内容只取决于种子和请求序号
+        rng = random.Random(f"{self.seed}:{number}")
+        await asyncio.sleep(self.latency.sample(rng))
+
+        roll = rng.random()
+        if roll < self.rate_429:
+            self.stats["status_429"] += 1
+            return web.json_response({"error": {"message": "rate limited"}}, status=429,
+                                     headers={"Retry-After": f"{self.retry_after:g}"})
+        if roll < self.rate_429 + self.rate_500:
+            self.stats["status_500"] += 1
+            return web.json_response({"error": {"message": "internal error"}}, status=500)
+
+        text = make_text(rng, self.chars)
+        self.stats["ok"] += 1
+        self.stats["chars"] += len(text)
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text),
+                 "total_tokens": prompt_tokens + len(text)}
+
+        if not payload.get("stream"):
+            return web.json_response({
+                "id": f"mock-{number}",
+                "object": "chat.completion",
+                "model": payload.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        self.stats["stream"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for start in range(0, len(text), self.stream_chunk_chars):
+            delta = text[start:start + self.stream_chunk_chars]
+            event = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+            await response.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            if self.stream_interval:
+                await asyncio.sleep(self.stream_interval)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+    # ---------- 媒体接口 ----------
+
+    def _submit_media(self, prefix: str) -> str:
+        self.stats["media_submits"] += 1
+        task_id = f"{prefix}-{len(self.media_tasks) + 1}"
+        self.media_tasks[task_id] = asyncio.get_running_loop().time()
+        return task_id
+
+    def _media_done(self, task_id: str) -> bool:
+        return asyncio.get_running_loop().time() - self.media_tasks[task_id] >= self.media_delay
+
+    async def handle_mj_submit(self, request: web.Request) -> web.Response:
+        await request.json()
+        return web.json_response({"code": 1, "result": self._submit_media("mj")})
+
+    async def handle_mj_list(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.stats["media_polls"] += 1
+        tasks = []
+        for task_id in payload.get("ids", []):
+            if task_id not in self.media_tasks:
+                continue
+            if self._media_done(task_id):
+                tasks.append({"id": task_id, "status": "SUCCESS", "progress": "100%",
+                              "imageUrl": f"{self.media_url}/files/{task_id}.png"})
+            else:
+                tasks.append({"id": task_id, "status": "IN_PROGRESS", "progress": "50%"})
+        return web.json_response(tasks)
+
+    async def handle_suno_submit(self, request: web.Request) -> web.Response:
+        await request.json()
+        return web.json_response({"code": "success", "data": self._submit_media("suno")})
+
+    async def handle_suno_fetch(self, request: web.Request) -> web.Response:
+        task_id = request.match_info["task_id"]
+        self.stats["media_polls"] += 1
+        if task_id not in self.media_tasks:
+            return web.json_response({"code": "error", "message": "task not found"}, status=404)
+        if not self._media_done(task_id):
+            return web.json_response({"code": "success", "data": task_id})
+        return web.json_response({"code": "success", "data": {
+            "status": "complete",
+            "data": [{"id": task_id, "title": "mock music", "audio_url": f"{self.media_url}/files/{task_id}.mp3"}]
+        }})
+
+    def file_content(self, name: str) -> bytes:
+        """/files/{name} 的内容，由文件名决定"""
+        unit = name.encode("utf-8")
+        return (unit * (self.file_size // len(unit) + 1))[:self.file_size]
+
+    async def handle_file(self, request: web.Request) -> web.StreamResponse:
+        self.stats["downloads"] += 1
+        body = self.file_content(request.match_info["name"])
+        start = 0
+        range_header = request.headers.get("Range", "")
+        if range_header.startswith("bytes=") and range_header.endswith("-"):
+            self.stats["range_requests"] += 1
+            start = int(range_header[len("bytes="):-1])
+            if start >= len(body):
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{len(body)}"})
+
+        response = web.StreamResponse(status=206 if start else 200)
+        response.content_length = len(body) - start
+        if start:
+            response.headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+        await response.prepare(request)
+
+        if self.download_failures > 0:
+            # 只发送一半内容就断开连接，模拟下载中断
+            self.download_failures -= 1
+            half = start + (len(body) - start) // 2
+            await response.write(body[start:half])
+            self.stats["download_bytes"] += half - start
+            await asyncio.sleep(0.01)
+            request.transport.close()
+            return response
+
+        await response.write(body[start:])
+        self.stats["download_bytes"] += len(body) - start
+        await response.write_eof()
+        return response
+
+
+def start_in_thread(**kwargs):
+    """在后台线程的事件循环中启动模拟服务，供同步运行生成器的测试使用
+
+    Args:
+        **kwargs: MockLLMServer 的参数
+
+    Returns:
+        (server, stop): 已启动的服务，以及停止服务并关闭其事件循环的函数
+    """
+    loop = asyncio.new_event_loop()
+    server = MockLLMServer(**kwargs)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    return server, stop
+
+
+def list_novel_files(output_dir: str):
+    """输出目录中按编号命名的小说正文文件名（novel_*.txt，不含摘要和汇总文件），按文件名排序"""
+    return sorted(name for name in os.listdir(output_dir) if name.startswith("novel_") and name.endswith(".txt"))
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加模拟服务的命令行参数（基准测试脚本共用）"""
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help="响应延迟分布，例如 fixed:0.5、uniform:0.2:1、exponential:0.5、lognormal:0.8:0.3")
+    parser.add_argument("--chars", type=int, default=2000, help="每次响应的正文字符数")
+    parser.add_argument("--stream-chunk-chars", type=int, default=20, help="流式数据块的字符数")
+    parser.add_argument("--stream-interval", type=float, default=0.002, help="流式数据块之间的间隔（秒）")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回429的概率")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="返回500的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429响应的 Retry-After 秒数")
+    parser.add_argument("--media-delay", type=float, default=0.0, help="媒体任务从提交到完成的秒数")
+    parser.add_argument("--file-size", type=int, default=4096, help="媒体文件下载的字节数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+
+
+def server_from_args(args, host: str = "127.0.0.1", port: int = 0) -> MockLLMServer:
+    return MockLLMServer(
+        host=host,
+        port=port,
+        latency=LatencyModel.parse(args.latency),
+        chars=args.chars,
+        stream_chunk_chars=args.stream_chunk_chars,
+        stream_interval=args.stream_interval,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        retry_after=args.retry_after,
+        media_delay=args.media_delay,
+        file_size=args.file_size,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.host, args.port)
+    print(f"模拟服务地址: {server.url}")
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+小说生成吞吐量基准测试
+在子进程中启动本地模拟大模型服务，用 N 本小说 × M 个并发运行 generate_novels，
+报告生成速度（字/秒）、请求延迟 p50/p99、每段内容的CPU耗时和峰值内存。
+
+模拟服务运行在独立进程中，CPU耗时和峰值内存只统计生成器所在的进程。
+
+用法:
+    python benchmarks/run_benchmark.py [--novels 4] [--workers 4] [--target-length 20000]
+                                       [--stream] [--latency lognormal:0.05:0.5] [--rate-429 0.05]
+                                       [--json result.json]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+
+from mock_llm_server import add_server_arguments, server_from_args
+from core.generator import NovelGenerator
+from core.novel_store import read_novel_text
+from core.job_store import JobStore, job_store_path
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+
+def percentile(values, q):
+    """最近秩法计算百分位数，values 为空时返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为KB，macOS 上单位为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _serve(args, conn):
+    """子进程入口：启动模拟服务并把接口地址发回父进程"""
+    async def run():
+        server = server_from_args(args)
+        conn.send(await server.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+async def fetch_server_stats(url):
+    stats_url = url.replace("/v1/chat/completions", "/stats")
+    async with aiohttp.ClientSession() as session:
+        async with session.get(stats_url) as response:
+            return await response.json()
+
+
+async def run_generation(args, base_url, output_dir):
+    """运行一次 generate_novels，返回统计结果"""
+    generator = NovelGenerator(
+        api_key="benchmark",
+        model="mock",
+        max_workers=args.workers,
+        num_novels=args.novels,
+        target_length=args.target_length,
+        auto_summary_interval=args.summary_interval,
+        stream=args.stream,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        base_url=base_url
+    )
+    generator.output_dir = output_dir
+
+    # 记录每次内容生成调用的耗时（包含在速率限制器中排队和重试的时间）
+    latencies = []
+    original_generate_content = generator._generate_content
+
+    async def timed_generate_content(*call_args, **call_kwargs):
+        start = time.perf_counter()
+        content = await original_generate_content(*call_args, **call_kwargs)
+        if content:
+            latencies.append(time.perf_counter() - start)
+        return content
+
+    generator._generate_content = timed_generate_content
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await generator.generate_novels()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    # 只统计本次运行记录在任务库中的小说正文，不包括摘要和汇总文件
+    store = JobStore(job_store_path(generator.main_output_dir))
+    try:
+        total_chars = sum(len(read_novel_text(entry["txt_path"])) for entry in store.entries())
+    finally:
+        store.close()
+
+    chunks = len(latencies)
+    return {
+        "novels": args.novels,
+        "workers": args.workers,
+        "stream": args.stream,
+        "total_chars": total_chars,
+        "wall_seconds": round(wall, 3),
+        "chars_per_second": round(total_chars / wall, 1) if wall > 0 else 0.0,
+        "chunks": chunks,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_per_chunk_ms": round(cpu / chunks * 1000, 2) if chunks else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+        "limiter": generator.rate_limiter.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="小说生成吞吐量基准测试")
+    parser.add_argument("--novels", type=int, default=4, help="小说数量 N")
+    parser.add_argument("--workers", type=int, default=4, help="并发数 M")
+    parser.add_argument("--target-length", type=int, default=20000, help="每本小说的目标字数")
+    parser.add_argument("--summary-interval", type=int, default=0, help="自动摘要间隔字数，0 表示不生成摘要")
+    parser.add_argument("--stream", action="store_true", help="使用SSE流式接收")
+    parser.add_argument("--rpm", type=int, default=0, help="每分钟请求数上限")
+    parser.add_argument("--tpm", type=int, default=0, help="每分钟token数上限")
+    parser.add_argument("--url", default=None, help="使用已启动的服务地址，不再启动模拟服务")
+    parser.add_argument("--json", default=None, help="把结果写入JSON文件")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server_process = None
+    base_url = args.url
+    if not base_url:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        server_process = multiprocessing.Process(target=_serve, args=(args, child_conn), daemon=True)
+        server_process.start()
+        base_url = parent_conn.recv()
+
+    # 生成器会在当前目录创建输出目录，在临时目录中运行，避免污染工作区
+    original_cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            result = asyncio.run(run_generation(args, base_url, tmp_dir))
+            os.chdir(original_cwd)
+        result["server"] = asyncio.run(fetch_server_stats(base_url))
+    finally:
+        os.chdir(original_cwd)
+        if server_process:
+            server_process.terminate()
+            server_process.join()
+
+    print(f"小说数 × 并发数:   {result['novels']} × {result['workers']}"
+          f"{'（流式）' if result['stream'] else ''}")
+    print(f"总字数:            {result['total_chars']}")
+    print(f"耗时:              {result['wall_seconds']:.2f} 秒")
+    print(f"生成速度:          {result['chars_per_second']:.1f} 字/秒")
+    print(f"请求延迟 p50/p99:  {result['latency_p50_ms']:.1f} / {result['latency_p99_ms']:.1f} 毫秒")
+    print(f"CPU耗时/段:        {result['cpu_per_chunk_ms']:.2f} 毫秒（共 {result['chunks']} 段）")
+    if result["peak_rss_mb"] is not None:
+        print(f"峰值内存:          {result['peak_rss_mb']:.1f} MB")
+    server = result["server"]
+    print(f"服务端请求数:      {server['requests']}（429: {server['status_429']}，500: {server['status_500']}）")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
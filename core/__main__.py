@@ -0,0 +1,13 @@
+"""
+命令行入口: python -m core job.json，参见 core/cli.py
+"""
+
+import sys
+
+try:
+    from .cli import main
+except ImportError:
+    from core.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+多进程批量生成模块 - 把大批量小说分片到多个工作进程中生成。
+
+BatchRunner 把 num_novels（或续写模式下的 continuation_files）按轮询方式分给 N 个工作进程：
+- 每个进程有自己的事件循环、连接池和 NovelGenerator，写入同一个输出目录；
+- 状态消息和进度通过队列汇总到父进程，转交给父进程的回调；
+- 汇总文件由父进程在所有进程结束后统一创建一次。
+
+每分钟请求数/token数上限按进程数平均分配，总体速率与单进程运行时一致。
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+import traceback
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .generator import NovelGenerator
+    from .job_store import JobStore, job_store_path
+    from ..utils.common import get_output_dir
+except ImportError:
+    from core.generator import NovelGenerator
+    from core.job_store import JobStore, job_store_path
+    from utils.common import get_output_dir
+
+logger = logging.getLogger("novel_generator")
+
+# 不能传给子进程的设置项（回调函数由父进程统一处理）
+CALLBACK_KEYS = ("status_callback", "progress_callback", "retry_callback")
+
+# 进度消息中转发给父进程的字段
+PROGRESS_KEYS = ("index", "id", "genre", "word_count", "target_length", "percentage", "estimated_time")
+
+
+def split_round_robin(items: List[Any], parts: int) -> List[List[Any]]:
+    """把任务轮询分成若干份，去掉空的分片"""
+    return [shard for shard in (items[i::parts] for i in range(parts)) if shard]
+
+
+def _worker_main(shard: int,
+                 settings: Dict[str, Any],
+                 indices: Optional[List[int]],
+                 files: Optional[List[Dict[str, str]]],
+                 output_dir: str,
+                 messages,
+                 stop_event) -> None:
+    """工作进程入口：在独立的事件循环中生成分配到的小说"""
+    import asyncio
+
+    def on_status(message):
+        messages.put(("status", shard, message))
+
+    def on_progress(novel_setup):
+        snapshot = {key: novel_setup[key] for key in PROGRESS_KEYS if key in novel_setup}
+        messages.put(("progress", shard, snapshot))
+
+    try:
+        generator = NovelGenerator(
+            **settings,
+            status_callback=on_status,
+            progress_callback=on_progress,
+            main_output_dir=None if files is not None else output_dir,
+            novel_indices=indices
+        )
+        generator.summary_file_enabled = False
+        if files is not None:
+            # 续写文件已由父进程加载和迁移，这里只处理分配到的部分
+            generator.continue_from_dir = output_dir
+            generator.continuation_files = files
+
+        # 父进程请求停止时通知生成器
+        def watch_stop():
+            stop_event.wait()
+            generator.stop()
+
+        threading.Thread(target=watch_stop, daemon=True).start()
+
+        ok = asyncio.run(generator.generate_novels())
+        messages.put(("done", shard, {"ok": bool(ok), "completed": generator.completed_novels}))
+    except Exception as e:
+        traceback.print_exc()
+        messages.put(("done", shard, {"ok": False, "completed": 0, "error": str(e)}))
+
+
+class BatchRunner:
+    """多进程批量生成
+
+    用法:
+        runner = BatchRunner(settings, processes=4, status_callback=print)
+        result = runner.run()
+
+    settings 为 NovelGenerator 的构造参数（不含回调函数）。
+    """
+
+    def __init__(self,
+                 settings: Dict[str, Any],
+                 processes: Optional[int] = None,
+                 status_callback: Optional[Callable[[str], None]] = None,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 poll_interval: float = 0.2):
+        """
+        Args:
+            settings: NovelGenerator 的构造参数
+            processes: 工作进程数，默认为CPU核心数（不超过任务数）
+            status_callback: 状态消息回调，消息带有进程编号前缀
+            progress_callback: 进度回调，参数中的 shard 为进程编号
+            poll_interval: 父进程读取消息队列的等待间隔（秒）
+        """
+        self.settings = {key: value for key, value in settings.items() if key not in CALLBACK_KEYS}
+        self.processes = processes or os.cpu_count() or 1
+        self.status_callback = status_callback
+        self.progress_callback = progress_callback
+        self.poll_interval = poll_interval
+
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self.output_dir = None
+        self.expected = 0  # 需要生成（或续写）的小说数
+        self.progress: Dict[Any, Dict[str, Any]] = {}  # (进程编号, 小说编号) -> 最新进度
+
+    def update_status(self, message: str) -> None:
+        if self.status_callback:
+            self.status_callback(message)
+
+    def stop(self) -> None:
+        """请求所有工作进程停止生成（已生成的内容会被保存）"""
+        self._stop_event.set()
+
+    def _plan(self):
+        """确定输出目录并把任务分片，返回 [(小说编号列表, 续写文件列表)]"""
+        continue_dir = self.settings.get("continue_from_dir")
+        if continue_dir:
+            # 在父进程中加载一次续写文件（旧版本元数据在此迁移），再分给各进程
+            loader = NovelGenerator(**self.settings, status_callback=self.status_callback)
+            self.output_dir = continue_dir
+            # 任务库中尚未开始的小说与续写文件一起分片
+            tasks = [(None, file_info) for file_info in loader.continuation_files]
+            tasks += [(index, None) for index in loader.novel_indices or []]
+            shards = split_round_robin(tasks, self.processes)
+            return [([index for index, _ in shard if index is not None],
+                     [file_info for _, file_info in shard if file_info is not None]) for shard in shards]
+
+        if self.settings.get("main_output_dir"):
+            self.output_dir = self.settings["main_output_dir"]
+        else:
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            self.output_dir = os.path.join(get_output_dir(), f"novel_output_{timestamp}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        indices = list(range(self.settings.get("num_novels", 1)))
+        # 先在任务库中登记全部小说，还没启动的工作进程负责的小说在中断后也能续写
+        store = JobStore(job_store_path(self.output_dir))
+        store.plan(indices)
+        store.close()
+        shards = split_round_robin(indices, self.processes)
+        return [(indices, None) for indices in shards]
+
+    def _worker_settings(self, shards: int) -> Dict[str, Any]:
+        settings = {key: value for key, value in self.settings.items()
+                    if key not in ("continue_from_dir", "main_output_dir", "novel_indices")}
+        # 工作进程本身已经分担了CPU密集的后处理，且守护进程不能再创建子进程，因此同步执行后处理
+        settings["postprocess_workers"] = 0
+        # 速率上限按进程数平均分配
+        for key in ("requests_per_minute", "tokens_per_minute"):
+            if settings.get(key):
+                settings[key] = max(1, settings[key] // shards)
+        return settings
+
+    def run(self) -> Dict[str, Any]:
+        """运行批量生成，阻塞直到所有工作进程结束
+
+        Returns:
+            dict: output_dir（输出目录）、completed（完成的小说数）、expected（需要生成的小说数）、
+                  failed_shards（失败的进程编号）
+        """
+        plan = self._plan()
+        self.expected = sum(len(indices or []) + len(files or []) for indices, files in plan)
+        if not plan:
+            self.update_status("没有需要生成的小说")
+            return {"output_dir": self.output_dir, "completed": 0, "expected": 0, "failed_shards": []}
+
+        settings = self._worker_settings(len(plan))
+        messages = self._context.Queue()
+        workers = []
+        for shard, (indices, files) in enumerate(plan):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(shard, settings, indices, files, self.output_dir, messages, self._stop_event),
+                name=f"novel-batch-{shard + 1}",
+                daemon=True
+            )
+            process.start()
+            workers.append(process)
+        self.update_status(f"已启动 {len(workers)} 个工作进程，输出目录: {self.output_dir}")
+
+        results: Dict[int, Dict[str, Any]] = {}
+        while len(results) < len(workers):
+            try:
+                kind, shard, payload = messages.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # 进程异常退出（例如被系统终止）时不会发送完成消息
+                for shard, process in enumerate(workers):
+                    if shard not in results and not process.is_alive() and process.exitcode not in (0, None):
+                        results[shard] = {"ok": False, "completed": 0,
+                                          "error": f"进程退出码 {process.exitcode}"}
+                continue
+
+            if kind == "status":
+                self.update_status(f"[进程{shard + 1}] {payload}")
+            elif kind == "progress":
+                payload["shard"] = shard
+                self.progress[(shard, payload.get("index", payload.get("id")))] = payload
+                if self.progress_callback:
+                    self.progress_callback(payload)
+            elif kind == "done":
+                results[shard] = payload
+                if payload.get("error"):
+                    self.update_status(f"[进程{shard + 1}] 出错: {payload['error']}")
+
+        for process in workers:
+            process.join()
+
+        completed = sum(result.get("completed", 0) for result in results.values())
+        failed = sorted(shard for shard, result in results.items() if not result.get("ok"))
+
+        # 所有进程结束后统一创建一次汇总文件
+        if not self.settings.get("continue_from_dir") and not self._stop_event.is_set():
+            summary_writer = NovelGenerator(**self.settings, status_callback=self.status_callback)
+            summary_writer.main_output_dir = self.output_dir
+            summary_writer.create_summary_file()
+
+        self.update_status(f"批量生成结束，共 {len(workers)} 个进程，失败 {len(failed)} 个")
+        return {"output_dir": self.output_dir, "completed": completed, "expected": self.expected,
+                "failed_shards": failed}
+
+
+def run_batch(settings: Dict[str, Any], processes: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+    """以多进程方式运行批量生成，参数见 BatchRunner"""
+    return BatchRunner(settings, processes, **kwargs).run()
@@ -0,0 +1,231 @@
+"""
+命令行批量生成 - 不依赖图形界面，根据任务文件运行批量生成。
+
+用法:
+    python -m core job.json
+    python -m core job.yaml --processes 4 --concurrency 3
+    python -m core job.json --resume novel_output_20250101_120000
+
+任务文件（JSON 或 YAML）中的字段即 NovelGenerator 的构造参数，另外可以包含 processes
+（工作进程数）。api_key 未填写时读取环境变量 NOVEL_GENERATOR_API_KEY。
+
+运行过程以 JSON Lines 输出到标准输出，每行一个事件：
+    {"event": "start", ...}     开始生成
+    {"event": "status", ...}    状态消息
+    {"event": "progress", ...}  小说进度
+    {"event": "done", ...}      生成结束，包含输出目录和完成数量
+    {"event": "error", ...}     任务文件或参数错误
+收到 SIGINT/SIGTERM 时停止生成并保存已生成的内容，之后可以用 --resume 继续。
+
+退出码见 EXIT_* 常量。
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import inspect
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .generator import NovelGenerator
+    from .batch_runner import BatchRunner, CALLBACK_KEYS, PROGRESS_KEYS
+except ImportError:
+    from core.generator import NovelGenerator
+    from core.batch_runner import BatchRunner, CALLBACK_KEYS, PROGRESS_KEYS
+
+# 退出码
+EXIT_OK = 0            # 所有小说生成完成
+EXIT_FAILED = 1        # 生成出错，或有小说未完成
+EXIT_USAGE = 2         # 参数或任务文件错误
+EXIT_INTERRUPTED = 130  # 被 SIGINT/SIGTERM 停止，已保存的内容可以用 --resume 继续
+
+API_KEY_ENV = "NOVEL_GENERATOR_API_KEY"
+
+# 任务文件中不允许设置的构造参数（回调由命令行提供，小说编号由批量生成分配）
+JOB_EXCLUDED_KEYS = CALLBACK_KEYS + ("novel_indices",)
+
+
+class JobError(Exception):
+    """任务文件或参数错误"""
+
+
+def generator_options() -> List[str]:
+    """任务文件可以设置的 NovelGenerator 构造参数"""
+    parameters = inspect.signature(NovelGenerator.__init__).parameters
+    return [name for name in parameters if name != "self" and name not in JOB_EXCLUDED_KEYS]
+
+
+def load_job(path: str) -> Dict[str, Any]:
+    """读取 JSON 或 YAML 任务文件"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise JobError(f"无法读取任务文件 {path}: {e}")
+
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise JobError("读取 YAML 任务文件需要安装 pyyaml，或改用 JSON 格式")
+        try:
+            job = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise JobError(f"任务文件格式错误: {e}")
+    else:
+        try:
+            job = json.loads(text)
+        except ValueError as e:
+            raise JobError(f"任务文件格式错误: {e}")
+
+    if not isinstance(job, dict):
+        raise JobError("任务文件的内容必须是键值对象")
+    return job
+
+
+def build_settings(job: Dict[str, Any], args: argparse.Namespace) -> Tuple[Dict[str, Any], int]:
+    """合并任务文件和命令行参数，返回 (NovelGenerator 构造参数, 进程数)"""
+    job = dict(job)
+    processes = job.pop("processes", 1)
+
+    unknown = sorted(set(job) - set(generator_options()))
+    if unknown:
+        raise JobError(f"任务文件中有未知字段: {', '.join(unknown)}")
+
+    settings = job
+    if args.resume:
+        if not os.path.isdir(args.resume):
+            raise JobError(f"续写目录不存在: {args.resume}")
+        settings["continue_from_dir"] = args.resume
+        settings.pop("main_output_dir", None)
+    if args.output_dir:
+        settings["main_output_dir"] = args.output_dir
+    if args.concurrency is not None:
+        settings["max_workers"] = args.concurrency
+    if args.processes is not None:
+        processes = args.processes
+
+    if not settings.get("api_key"):
+        settings["api_key"] = os.environ.get(API_KEY_ENV, "")
+    if not settings["api_key"]:
+        raise JobError(f"未设置 api_key，请在任务文件中填写或设置环境变量 {API_KEY_ENV}")
+
+    if not isinstance(processes, int) or processes < 1:
+        raise JobError(f"processes 必须是正整数: {processes!r}")
+    if not isinstance(settings.get("max_workers", 1), int) or settings.get("max_workers", 1) < 1:
+        raise JobError(f"concurrency（max_workers）必须是正整数: {settings.get('max_workers')!r}")
+    return settings, processes
+
+
+class EventWriter:
+    """以 JSON Lines 格式输出事件（多个线程可能同时输出）"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields) -> None:
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def status(self, message: str) -> None:
+        self.emit("status", message=message)
+
+    def progress(self, snapshot: Dict[str, Any]) -> None:
+        self.emit("progress", **{key: value for key, value in snapshot.items()
+                                 if key in PROGRESS_KEYS or key == "shard"})
+
+
+def run_job(settings: Dict[str, Any], processes: int, events: EventWriter) -> int:
+    """运行批量生成，返回退出码"""
+    stopped = threading.Event()
+
+    if processes > 1:
+        runner = BatchRunner(settings, processes,
+                             status_callback=events.status, progress_callback=events.progress)
+    else:
+        runner = NovelGenerator(**settings, status_callback=events.status, progress_callback=events.progress)
+
+    def on_signal(signum, frame):
+        if stopped.is_set():
+            # 第二次收到信号时立即退出
+            raise KeyboardInterrupt
+        stopped.set()
+
+        # 信号处理函数可能打断正在输出事件的主线程，在新线程中停止，避免在输出锁上死锁
+        def stop():
+            events.status(f"收到信号 {signal.Signals(signum).name}，正在停止并保存已生成的内容")
+            runner.stop()
+
+        threading.Thread(target=stop, daemon=True).start()
+
+    handlers = {}
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            handlers[signum] = signal.signal(signum, on_signal)
+        except (ValueError, OSError):
+            pass  # 不在主线程中运行时无法设置信号处理
+
+    try:
+        if processes > 1:
+            result = runner.run()
+            ok = not result["failed_shards"]
+        else:
+            ok = bool(asyncio.run(runner.generate_novels()))
+            # 续写模式下 num_novels 为待续写的文件数
+            result = {"output_dir": runner.main_output_dir, "completed": runner.completed_novels,
+                      "expected": runner.num_novels, "failed_shards": []}
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+    expected = result["expected"]
+    if stopped.is_set():
+        code = EXIT_INTERRUPTED
+    elif ok and result["completed"] >= expected:
+        code = EXIT_OK
+    else:
+        code = EXIT_FAILED
+    events.emit("done", exit_code=code, output_dir=result["output_dir"], completed=result["completed"],
+                expected=expected, failed_shards=result["failed_shards"], stopped=stopped.is_set())
+    return code
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m core",
+        description="不启动图形界面，根据任务文件批量生成小说，进度以 JSON Lines 输出到标准输出")
+    parser.add_argument("job", help="任务文件（.json 或 .yaml），字段为 NovelGenerator 的构造参数")
+    parser.add_argument("--resume", metavar="DIR", help="继续生成该输出目录中的小说")
+    parser.add_argument("--output-dir", metavar="DIR", help="输出目录，默认按时间创建")
+    parser.add_argument("--processes", type=int, metavar="N", help="工作进程数，默认 1（在当前进程中生成）")
+    parser.add_argument("--concurrency", type=int, metavar="N", help="每个进程同时生成的小说数（max_workers）")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口，返回退出码"""
+    args = build_parser().parse_args(argv)
+    events = EventWriter()
+    try:
+        settings, processes = build_settings(load_job(args.job), args)
+    except JobError as e:
+        events.emit("error", message=str(e))
+        return EXIT_USAGE
+
+    events.emit("start", job=os.path.abspath(args.job), processes=processes,
+                concurrency=settings.get("max_workers", 3), resume=settings.get("continue_from_dir"))
+    try:
+        return run_job(settings, processes, events)
+    except KeyboardInterrupt:
+        events.emit("done", exit_code=EXIT_INTERRUPTED, stopped=True)
+        return EXIT_INTERRUPTED
@@ -0,0 +1,247 @@
+"""
+下载管理模块 - 并发、可断点续传的流式文件下载。
+
+DownloadManager 由媒体生成器持有，所有下载共用它的连接池：
+- 最多同时下载 max_concurrent 个文件；
+- 响应按块流式写入 "<目标文件>.part" 临时文件，下载完成并校验长度后才重命名为目标文件；
+- 网络错误时保留临时文件，重试时用 HTTP Range 请求从已下载的位置继续，
+  服务器不支持 Range（返回200）时从头下载；
+- 下载过程中计算 SHA-256，记录在下载目录的 downloads.json 中：内容相同的文件只保留一份，
+  同一链接已下载且文件完整时直接返回本地路径。
+"""
+
+import os
+import json
+import random
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger("novel_generator")
+
+# 下载索引文件名（位于下载目录中）
+DOWNLOAD_INDEX_NAME = "downloads.json"
+# 临时文件后缀
+PART_SUFFIX = ".part"
+
+
+class DownloadError(Exception):
+    """文件下载失败（重试次数用尽或服务器拒绝）"""
+
+
+def _hash_file(path: str, chunk_size: int) -> "hashlib._Hash":
+    """计算已下载部分的哈希，续传时在此基础上继续累加"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest
+
+
+def _content_range_total(value: Optional[str]) -> Optional[int]:
+    """从 "bytes 100-199/1000" 形式的 Content-Range 中取出文件总长度"""
+    if not value or "/" not in value:
+        return None
+    total = value.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+class DownloadManager:
+    """并发、可续传、按内容去重的下载管理器"""
+
+    def __init__(self, http_pool, download_dir: str = "downloads",
+                 max_concurrent: int = 4,
+                 chunk_size: int = 256 * 1024,
+                 max_retries: int = 3,
+                 retry_delay: float = 1.0,
+                 read_timeout: float = 60,
+                 status_callback=None):
+        """
+        Args:
+            http_pool: 共享的 ConnectionPool
+            download_dir: 下载目录，下载索引保存在其中
+            max_concurrent: 同时下载的文件数上限
+            chunk_size: 每次读取和写盘的块大小（字节）
+            max_retries: 单个文件失败后的最大重试次数
+            retry_delay: 首次重试前的等待时间（秒），之后按指数增长
+            read_timeout: 两次读到数据之间的最长等待时间（秒）；大文件不受总超时限制
+            status_callback: 状态消息回调
+        """
+        self.http_pool = http_pool
+        self.download_dir = download_dir
+        self.max_concurrent = max(1, max_concurrent)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.read_timeout = read_timeout
+        self.status_callback = status_callback
+
+        self.index_path = os.path.join(download_dir, DOWNLOAD_INDEX_NAME)
+        self.index = self._load_index()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self._inflight: Dict[str, asyncio.Future] = {}  # 目标路径 -> 正在进行的下载
+        self.stats = {"downloads": 0, "resumed": 0, "retries": 0, "deduplicated": 0, "cached": 0, "bytes": 0}
+
+    def update_status(self, message: str) -> None:
+        if self.status_callback:
+            self.status_callback(message)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """加载下载索引：{"urls": {链接: 哈希}, "files": {哈希: {"path", "size"}}}"""
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                if isinstance(index.get("urls"), dict) and isinstance(index.get("files"), dict):
+                    return index
+            except Exception as e:
+                logger.warning(f"加载下载索引失败: {e}")
+        return {"urls": {}, "files": {}}
+
+    def _save_index(self) -> None:
+        try:
+            os.makedirs(self.download_dir, exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"保存下载索引失败: {e}")
+
+    def _indexed_file(self, digest: Optional[str]) -> Optional[str]:
+        """返回索引中哈希对应、且仍完整存在的文件路径"""
+        entry = self.index["files"].get(digest) if digest else None
+        if entry and os.path.isfile(entry["path"]) and os.path.getsize(entry["path"]) == entry["size"]:
+            return entry["path"]
+        return None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 同步接口每次调用都在新的事件循环中运行，信号量需要跟随当前循环重建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def download(self, url: str, local_path: str) -> str:
+        """
+        下载文件，返回本地路径
+
+        内容与已下载的文件相同时删除新文件，返回已有文件的路径；
+        同一个目标路径同时只会下载一次，重复调用等待同一个结果。
+
+        Raises:
+            DownloadError: 重试次数用尽或服务器返回错误
+        """
+        cached = self._indexed_file(self.index["urls"].get(url))
+        if cached:
+            self.stats["cached"] += 1
+            return cached
+
+        inflight = self._inflight.get(local_path)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[local_path] = future
+        try:
+            async with self._get_semaphore():
+                path = await self._download_with_retries(url, local_path)
+            future.set_result(path)
+            return path
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待方时取出异常，避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[local_path]
+
+    async def _download_with_retries(self, url: str, local_path: str) -> str:
+        part_path = local_path + PART_SUFFIX
+        for attempt in range(self.max_retries + 1):
+            try:
+                digest, size = await self._fetch(url, part_path)
+                break
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status >= 500 or e.status == 429
+                if not retryable or attempt >= self.max_retries:
+                    raise DownloadError(f"下载 {url} 失败: {e}") from e
+                self.stats["retries"] += 1
+                delay = self.retry_delay * (2 ** attempt) * random.uniform(0.8, 1.2)
+                logger.warning(f"下载 {url} 中断（{e}），{delay:.1f} 秒后续传")
+                await asyncio.sleep(delay)
+
+        self.stats["downloads"] += 1
+        self.stats["bytes"] += size
+        existing = self._indexed_file(digest)
+        if existing and os.path.abspath(existing) != os.path.abspath(local_path):
+            os.remove(part_path)
+            self.stats["deduplicated"] += 1
+            path = existing
+        else:
+            os.replace(part_path, local_path)
+            self.index["files"][digest] = {"path": local_path, "size": size}
+            path = local_path
+        self.index["urls"][url] = digest
+        self._save_index()
+        return path
+
+    async def _fetch(self, url: str, part_path: str):
+        """下载一次，已有临时文件时从其末尾续传；返回 (SHA-256, 文件大小)"""
+        loop = asyncio.get_running_loop()
+        os.makedirs(os.path.dirname(part_path) or ".", exist_ok=True)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # 要求不压缩传输：Range 偏移和长度校验都针对磁盘上的原始字节
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        session = await self.http_pool.get_session()
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.read_timeout)
+        async with session.get(url, headers=headers, timeout=timeout) as res:
+            if res.status == 416:
+                # 临时文件与服务器上的文件不一致，删除后从头下载
+                os.remove(part_path)
+                raise DownloadError("续传位置超出文件长度")
+            res.raise_for_status()
+            # 仍然返回了压缩内容时，aiohttp 读到的是解压后的字节，与 Content-Length 和 Range 偏移都对不上
+            encoded = res.headers.get("Content-Encoding", "identity").lower() != "identity"
+            if encoded and res.status == 206:
+                os.remove(part_path)
+                raise DownloadError("服务器返回了压缩的分段内容，无法续传")
+
+            if offset and res.status == 206:
+                self.stats["resumed"] += 1
+                digest = await loop.run_in_executor(None, _hash_file, part_path, self.chunk_size)
+                total = _content_range_total(res.headers.get("Content-Range"))
+                mode = "ab"
+            else:
+                # 首次下载，或服务器忽略了 Range 返回完整内容
+                offset = 0
+                digest = hashlib.sha256()
+                total = None if encoded else res.content_length
+                mode = "wb"
+
+            size = offset
+            f = await loop.run_in_executor(None, open, part_path, mode)
+            try:
+                async for chunk in res.content.iter_chunked(self.chunk_size):
+                    digest.update(chunk)
+                    await loop.run_in_executor(None, f.write, chunk)
+                    size += len(chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+
+        if total is not None and size != total:
+            raise DownloadError(f"文件长度不符: 已下载 {size} 字节，应为 {total} 字节")
+        return digest.hexdigest(), size
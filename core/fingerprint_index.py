@@ -0,0 +1,233 @@
+"""
+段落指纹索引模块 - 用于长篇小说的近似重复段落检测。
+
+每个段落计算一个64位 SimHash 指纹，并按 LSH 分段（band）建立倒排索引：
+两个指纹的海明距离不超过 max_distance 时，按鸽巢原理至少有一个分段完全相同，
+因此只需比较落在同一分段桶里的少量候选，查找与全书段落数量无关（亚线性）。
+
+索引以 JSON Lines 形式保存在小说元数据文件旁（<小说名>_fingerprints.jsonl），
+每次合并新内容时只追加新段落的指纹。
+"""
+
+import os
+import json
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("novel_generator")
+
+FINGERPRINT_BITS = 64
+
+
+def simplify_text(text: str) -> str:
+    """简化段落，仅保留字母和数字（与重复检测中的简化规则一致）"""
+    return ''.join(c for c in text if c.isalnum())
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    # 使用稳定的哈希函数，保证指纹在不同进程之间一致，可以持久化
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str, ngram: int = 2) -> int:
+    """计算文本的64位 SimHash 指纹，特征为字符 n-gram"""
+    if len(text) <= ngram:
+        features = [text]
+    else:
+        features = [text[i:i + ngram] for i in range(len(text) - ngram + 1)]
+
+    # 逐位统计各特征哈希中1的个数，超过半数的位在指纹中置1
+    # 借助二进制字符串按列统计，比逐位移位计数快一个数量级
+    rows = [format(_feature_hash(feature), "064b") for feature in features]
+    half = len(rows) / 2
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = (fingerprint << 1) | (column.count("1") > half)
+    return fingerprint
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按空行切分段落，没有空行时按换行切分"""
+    paragraphs = text.split('\n\n')
+    if len(paragraphs) <= 1:
+        paragraphs = text.split('\n')
+    return paragraphs
+
+
+class FingerprintIndex:
+    """段落指纹索引
+
+    - add_text(): 追加新内容中各段落的指纹（有持久化路径时同步追加到文件）
+    - find_duplicate(): 查找与给定段落近似重复的已有段落编号
+    - replace_tail(): 末尾内容被替换后更新索引
+    - rebuild(): 全文内容被替换后重建索引
+    """
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_distance: int = 5,
+                 min_length: int = 20,
+                 ngram: int = 2):
+        """
+        Args:
+            path: 索引文件路径，为 None 时只保存在内存中
+            max_distance: 判定为近似重复的最大海明距离（无关段落的距离通常在20左右）
+            min_length: 参与索引的段落最小长度（简化后的字符数）
+            ngram: SimHash 特征的字符 n-gram 长度
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.ngram = ngram
+
+        # 分段数为 max_distance+1，保证海明距离不超过 max_distance 的指纹至少有一个分段相同
+        self.bands = max_distance + 1
+        self._band_bits = FINGERPRINT_BITS // self.bands
+        self._band_mask = (1 << self._band_bits) - 1
+
+        self.fingerprints: List[int] = []
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> (i * self._band_bits)) & self._band_mask for i in range(self.bands)]
+
+    def _fingerprint(self, paragraph: str) -> Optional[int]:
+        simplified = simplify_text(paragraph)
+        if len(simplified) < self.min_length:
+            return None
+        return simhash(simplified, self.ngram)
+
+    def _insert(self, fingerprint: int) -> None:
+        position = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            self._buckets[band].setdefault(key, []).append(position)
+
+    def _lookup(self, fingerprint: int) -> Optional[int]:
+        checked = set()
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            for position in self._buckets[band].get(key, ()):
+                if position in checked:
+                    continue
+                checked.add(position)
+                if bin(self.fingerprints[position] ^ fingerprint).count("1") <= self.max_distance:
+                    return position
+        return None
+
+    def find_duplicate(self, paragraph: str) -> Optional[int]:
+        """查找与段落近似重复的已索引段落
+
+        Returns:
+            Optional[int]: 重复段落在索引中的编号，没有重复或段落过短时返回 None
+        """
+        fingerprint = self._fingerprint(paragraph)
+        if fingerprint is None:
+            return None
+        return self._lookup(fingerprint)
+
+    def add_paragraph(self, paragraph: str) -> bool:
+        """索引单个段落，返回是否被索引（过短的段落会被忽略）"""
+        fingerprint = self._fingerprint(paragraph)
+        if fingerprint is None:
+            return False
+        self._insert(fingerprint)
+        self._append_to_file([fingerprint])
+        return True
+
+    def add_text(self, text: str) -> int:
+        """索引一段新内容中的所有段落，返回新增的指纹数"""
+        added = []
+        for paragraph in split_paragraphs(text):
+            fingerprint = self._fingerprint(paragraph)
+            if fingerprint is not None:
+                self._insert(fingerprint)
+                added.append(fingerprint)
+        self._append_to_file(added)
+        return len(added)
+
+    def replace_tail(self, removed: str, added: str) -> None:
+        """末尾的 removed 被替换为 added 后更新索引：移除末尾对应段落的指纹，索引新内容，同时重写索引文件
+
+        指纹按段落在正文中的顺序加入，被替换内容的段落对应索引末尾的指纹，不需要根据全文重建。
+        """
+        count = sum(1 for paragraph in split_paragraphs(removed) if self._fingerprint(paragraph) is not None)
+        for _ in range(min(count, len(self.fingerprints))):
+            fingerprint = self.fingerprints.pop()
+            # 被移除的是编号最大的指纹，位于各分段桶的末尾
+            for band, key in enumerate(self._band_keys(fingerprint)):
+                bucket = self._buckets[band][key]
+                bucket.pop()
+                if not bucket:
+                    del self._buckets[band][key]
+        for paragraph in split_paragraphs(added):
+            fingerprint = self._fingerprint(paragraph)
+            if fingerprint is not None:
+                self._insert(fingerprint)
+        self._write_file()
+
+    def rebuild(self, text: str) -> None:
+        """清空索引并根据全文重建，同时重写索引文件"""
+        self.fingerprints = []
+        self._buckets = [{} for _ in range(self.bands)]
+        for paragraph in split_paragraphs(text):
+            fingerprint = self._fingerprint(paragraph)
+            if fingerprint is not None:
+                self._insert(fingerprint)
+        self._write_file()
+
+    def _write_file(self) -> None:
+        if self.path:
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for fingerprint in self.fingerprints:
+                        f.write(json.dumps({"fp": f"{fingerprint:016x}"}) + "\n")
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"写入段落指纹索引失败: {e}")
+
+    def load(self) -> bool:
+        """从索引文件加载，返回是否成功加载到已有索引"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._insert(int(json.loads(line)["fp"], 16))
+                    except (ValueError, KeyError, TypeError):
+                        # 跳过写入中断造成的损坏行
+                        continue
+        except OSError as e:
+            logger.warning(f"读取段落指纹索引失败: {e}")
+            return False
+        return len(self.fingerprints) > 0
+
+    def _append_to_file(self, fingerprints: List[int]) -> None:
+        if not self.path or not fingerprints:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for fingerprint in fingerprints:
+                    f.write(json.dumps({"fp": f"{fingerprint:016x}"}) + "\n")
+        except OSError as e:
+            logger.warning(f"写入段落指纹索引失败: {e}")
+
+    @classmethod
+    def for_text(cls, path: Optional[str], text: str, **kwargs) -> "FingerprintIndex":
+        """加载已有索引；索引文件不存在（例如旧版本生成的小说）时根据全文建立"""
+        index = cls(path, **kwargs)
+        if not index.load() and text:
+            index.rebuild(text)
+        return index
@@ -0,0 +1,108 @@
+"""
+HTTP连接池模块 - 为所有小说工作协程提供一个长期存活、共享的 aiohttp 会话。
+
+所有并发的生成任务共用同一个连接池：单个请求出现网络错误时只会丢弃出错的那条
+连接，不会关闭整个会话，从而避免一个请求失败导致所有进行中的小说一起断线重连。
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger("novel_generator")
+
+
+class ConnectionPool:
+    """共享的HTTP连接池
+
+    - 按主机限制连接数，保持长连接（keep-alive）
+    - 缓存DNS解析结果
+    - 会话被意外关闭时，由第一个发现的请求负责重建，其余请求等待复用
+    """
+
+    def __init__(self,
+                 limit: int = 100,
+                 limit_per_host: int = 10,
+                 keepalive_timeout: float = 60,
+                 dns_cache_ttl: int = 300,
+                 request_timeout: float = 120,
+                 verify_ssl: bool = False):
+        """
+        Args:
+            limit: 连接池总连接数上限
+            limit_per_host: 每个主机的连接数上限
+            keepalive_timeout: 空闲连接保持时间（秒）
+            dns_cache_ttl: DNS缓存时间（秒）
+            request_timeout: 单个请求的默认超时时间（秒）
+            verify_ssl: 是否校验SSL证书
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+        self.verify_ssl = verify_ssl
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sessions_created = 0
+
+    @property
+    def closed(self) -> bool:
+        """连接池当前是否没有可用会话"""
+        return self._session is None or self._session.closed
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """获取共享会话，不存在或已关闭时创建新会话"""
+        if not self.closed:
+            return self._session
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            # 其他协程可能已经在等待期间重建了会话
+            if self.closed:
+                self._session = self._create_session()
+                self._loop = asyncio.get_running_loop()
+                self.sessions_created += 1
+                if self.sessions_created > 1:
+                    logger.info(f"已重建共享HTTP会话（第 {self.sessions_created} 次）")
+            return self._session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            ssl=None if self.verify_ssl else False
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+
+    async def close(self) -> None:
+        """关闭共享会话及其所有连接"""
+        session = self._session
+        self._session = None
+        if session and not session.closed:
+            await session.close()
+
+    def close_threadsafe(self) -> None:
+        """从其他线程（例如界面线程）请求关闭连接池
+
+        会话只能在创建它的事件循环中关闭，这里把关闭操作提交到该循环。
+        """
+        loop = self._loop
+        if self.closed or loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), loop)
+        except RuntimeError as e:
+            logger.warning(f"提交关闭连接池任务失败: {e}")
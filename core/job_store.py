@@ -0,0 +1,203 @@
+"""
+任务库模块 - 用 SQLite 记录批量生成中每本小说的状态，供崩溃后续写。
+
+任务库保存在输出目录下的 jobs.db（WAL 模式）中：
+- planned 表记录本批次计划生成的小说编号，进程被杀时尚未开始的小说也能找回；
+- novels 表按小说文件记录编号、设定、已保存正文的位置（字数、.txt 和块日志的字节数）、
+  摘要、重试次数和状态（running/done/failed）。
+
+文件路径按相对于数据库所在目录保存，输出目录整体移动后仍然有效。
+多个工作进程可以同时写入同一个任务库。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from .novel_store import EXCLUDED_META_KEYS
+except ImportError:
+    from core.novel_store import EXCLUDED_META_KEYS
+
+logger = logging.getLogger("novel_generator")
+
+# 任务库在输出目录中的文件名
+JOB_DB_NAME = "jobs.db"
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def job_store_path(output_dir: str) -> str:
+    """输出目录对应的任务库路径"""
+    return os.path.join(output_dir, JOB_DB_NAME)
+
+
+class JobStore:
+    """基于 SQLite 的批量生成任务库，可在多个线程和进程中共用"""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Args:
+            path: 数据库文件路径
+            timeout: 其他进程持有写锁时的最长等待时间（秒）
+        """
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS planned (novel_index INTEGER PRIMARY KEY)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS novels ("
+            " txt_path TEXT PRIMARY KEY,"
+            " novel_index INTEGER,"
+            " status TEXT NOT NULL,"
+            " setup TEXT,"
+            " summaries TEXT,"
+            " word_count INTEGER NOT NULL DEFAULT 0,"
+            " target_length INTEGER NOT NULL DEFAULT 0,"
+            " txt_bytes INTEGER NOT NULL DEFAULT 0,"
+            " log_bytes INTEGER NOT NULL DEFAULT 0,"
+            " retries INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_novels_status ON novels(status)")
+        self._conn.commit()
+
+    def _relative(self, txt_path: str) -> str:
+        return os.path.relpath(os.path.abspath(txt_path), self.base_dir)
+
+    def _write(self, sql: str, params=()) -> bool:
+        """执行一条写入语句；任务库出错只记录警告，不影响生成"""
+        with self._lock:
+            try:
+                self._conn.execute(sql, params)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入任务库失败: {e}")
+                return False
+        return True
+
+    # ---------- 写入 ----------
+
+    def plan(self, indices: Iterable[int]) -> None:
+        """记录本批次计划生成的小说编号（已记录的忽略）"""
+        with self._lock:
+            try:
+                self._conn.executemany("INSERT OR IGNORE INTO planned (novel_index) VALUES (?)",
+                                       [(int(index),) for index in indices])
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入任务库失败: {e}")
+
+    def start(self, txt_path: str, index: int, novel_setup: Dict[str, Any]) -> bool:
+        """小说开始生成（或续写），保留已记录的重试次数"""
+        return self._write(
+            "INSERT INTO novels (txt_path, novel_index, status, target_length, word_count, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(txt_path) DO UPDATE SET novel_index = excluded.novel_index,"
+            " status = excluded.status, target_length = excluded.target_length,"
+            " word_count = MAX(word_count, excluded.word_count), error = NULL, updated = excluded.updated",
+            (self._relative(txt_path), index, STATUS_RUNNING, int(novel_setup.get("target_length") or 0),
+             int(novel_setup.get("word_count") or 0), time.time())
+        )
+
+    def update(self, txt_path: str, novel_setup: Dict[str, Any], offsets: Dict[str, int]) -> bool:
+        """小说保存后记录设定、摘要和已保存正文的位置
+
+        Args:
+            txt_path: 小说文本文件路径
+            novel_setup: 小说设定
+            offsets: NovelStore.offsets() 的返回值
+        """
+        setup = {key: value for key, value in novel_setup.items()
+                 if key not in EXCLUDED_META_KEYS and key != "summaries"}
+        return self._write(
+            "UPDATE novels SET setup = ?, summaries = ?, word_count = ?, target_length = ?,"
+            " txt_bytes = ?, log_bytes = ?, updated = ? WHERE txt_path = ?",
+            (json.dumps(setup, ensure_ascii=False, default=str),
+             json.dumps(novel_setup.get("summaries", []), ensure_ascii=False, default=str),
+             offsets["length"], int(novel_setup.get("target_length") or 0),
+             offsets["txt_bytes"], offsets["log_bytes"], time.time(), self._relative(txt_path))
+        )
+
+    def finish(self, txt_path: str, status: str, error: Optional[str] = None) -> bool:
+        """小说生成结束，status 为 done 或 failed"""
+        return self._write("UPDATE novels SET status = ?, error = ?, updated = ? WHERE txt_path = ?",
+                           (status, error, time.time(), self._relative(txt_path)))
+
+    def add_retry(self, txt_path: str) -> bool:
+        """小说的重试次数加一"""
+        return self._write("UPDATE novels SET retries = retries + 1, updated = ? WHERE txt_path = ?",
+                           (time.time(), self._relative(txt_path)))
+
+    # ---------- 查询 ----------
+
+    def _row(self, row) -> Dict[str, Any]:
+        (txt_path, index, status, setup, summaries, word_count, target_length,
+         txt_bytes, log_bytes, retries, error, updated) = row
+        return {
+            "txt_path": os.path.join(self.base_dir, txt_path),
+            "index": index,
+            "status": status,
+            "setup": json.loads(setup) if setup else None,
+            "summaries": json.loads(summaries) if summaries else [],
+            "word_count": word_count,
+            "target_length": target_length,
+            "txt_bytes": txt_bytes,
+            "log_bytes": log_bytes,
+            "retries": retries,
+            "error": error,
+            "updated": updated,
+        }
+
+    def _select(self, where: str = "", params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT txt_path, novel_index, status, setup, summaries, word_count, target_length,"
+                " txt_bytes, log_bytes, retries, error, updated FROM novels " + where +
+                " ORDER BY novel_index, txt_path", params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def get(self, txt_path: str) -> Optional[Dict[str, Any]]:
+        rows = self._select("WHERE txt_path = ?", (self._relative(txt_path),))
+        return rows[0] if rows else None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """所有已开始的小说"""
+        return self._select()
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """已开始但未完成（生成中被中断或失败）的小说"""
+        return self._select("WHERE status != ?", (STATUS_DONE,))
+
+    def unstarted(self) -> List[int]:
+        """计划生成但还没有开始的小说编号"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT novel_index FROM planned WHERE novel_index NOT IN"
+                " (SELECT novel_index FROM novels WHERE novel_index IS NOT NULL) ORDER BY novel_index"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的小说数，pending 为尚未开始的数量"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM novels GROUP BY status").fetchall()
+        counts = {status: count for status, count in rows}
+        counts["pending"] = len(self.unstarted())
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,19 +1,105 @@
-import http.client
+"""
+媒体生成模块 - 为小说生成封面图片（MidJourney）和音乐（Suno）。
+
+提交任务、轮询状态和下载文件都是 asyncio 协程，经由媒体生成器自己的连接池发送：
+- 多张封面同时提交，所有未完成的图片任务由一个 TaskPoller 批量轮询（每个间隔一个请求），
+  轮询间隔使用 asyncio.sleep，不阻塞事件循环；
+- 提交的任务记录在 MediaTaskManager 中（保存在下载目录的 media_tasks.json），
+  上次运行时未完成的图片任务也会被一并查询并更新状态；
+- 图片和音乐由 DownloadManager 并发、流式下载，中断后断点续传，内容相同的文件只保留一份；
+- NovelGenerator 把每本小说的媒体生成作为后台任务运行，正文生成不必等待封面和音乐，
+  停止生成时直接取消这些任务，不会像原先那样在保存小说时阻塞最多10分钟。
+
+generate_cover_images / generate_music 是同步接口，供脚本和测试直接调用。
+"""
+
 import json
 import time
 import os
-import urllib.request
+import asyncio
 from typing import Dict, Any, List, Optional
 
+try:
+    from .rate_limiter import parse_retry_after
+    from .http_pool import ConnectionPool
+    from .media_poller import TaskPoller
+    from .media_task_manager import MediaTaskManager
+    from .download_manager import DownloadManager
+except ImportError:
+    from core.rate_limiter import parse_retry_after
+    from core.http_pool import ConnectionPool
+    from core.media_poller import TaskPoller
+    from core.media_task_manager import MediaTaskManager
+    from core.download_manager import DownloadManager
+
+# 默认的媒体接口主机
+DEFAULT_MEDIA_HOST = "aiapi.space"
+
 
 class MediaGenerator:
     """媒体生成器：处理封面图片和音乐生成"""
     
-    def __init__(self, api_key: str, status_callback=None):
+    def __init__(self, api_key: str, status_callback=None, rate_limiter=None,
+                 base_url: Optional[str] = None, poll_interval: float = 10, timeout: float = 600,
+                 download_dir: str = "downloads", task_manager: Optional[MediaTaskManager] = None):
+        """
+        Args:
+            api_key: API密钥
+            status_callback: 状态消息回调
+            rate_limiter: 与正文生成共享的速率限制器（可选）
+            base_url: 媒体接口地址，只写主机名时使用 https
+            poll_interval: 查询任务状态的最长间隔（秒），图片任务接近完成时间隔缩短到其五分之一
+            timeout: 单个任务的最长等待时间（秒）
+            download_dir: 下载图片和音乐的目录
+            task_manager: 记录媒体任务的 MediaTaskManager，默认保存在下载目录中
+        """
         self.api_key = api_key
-        self.base_url = "aiapi.space"
+        self.base_url = base_url or DEFAULT_MEDIA_HOST
         self.status_callback = status_callback
-        
+        self.rate_limiter = rate_limiter
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.download_dir = download_dir
+        # 媒体请求使用独立的连接池，其生命周期与正文生成的连接池无关
+        self.http_pool = ConnectionPool(limit_per_host=8, request_timeout=120)
+        self._task_manager = task_manager
+        self._poller: Optional[TaskPoller] = None
+        self._downloader: Optional[DownloadManager] = None
+    
+    @property
+    def task_manager(self) -> MediaTaskManager:
+        """媒体任务记录，首次使用时在下载目录中创建"""
+        if self._task_manager is None:
+            os.makedirs(self.download_dir, exist_ok=True)
+            self._task_manager = MediaTaskManager(os.path.join(self.download_dir, "media_tasks.json"))
+        return self._task_manager
+    
+    @property
+    def poller(self) -> TaskPoller:
+        """批量轮询所有未完成图片任务的轮询器（所有小说共用）"""
+        if self._poller is None:
+            self._poller = TaskPoller(self._query_image_tasks, self.task_manager,
+                                      min_interval=self.poll_interval / 5, max_interval=self.poll_interval,
+                                      status_callback=self.update_status)
+        return self._poller
+    
+    @property
+    def downloader(self) -> DownloadManager:
+        """下载管理器，下载目录改变后重新创建"""
+        if self._downloader is None or self._downloader.download_dir != self.download_dir:
+            self._downloader = DownloadManager(self.http_pool, self.download_dir, status_callback=self.update_status)
+        return self._downloader
+    
+    async def _query_image_tasks(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        """用批量查询接口查询多个图片任务的状态"""
+        response = await self._request("POST", "/mj/task/list-by-condition", {"ids": task_ids})
+        # 根据API文档，返回的是任务列表；也兼容 {"data": [...]} 格式
+        if isinstance(response, dict):
+            response = response.get("data", [])
+        if not isinstance(response, list):
+            raise ValueError(f"图片任务查询响应格式异常: {response}")
+        return response
+    
     def update_status(self, message: str):
         """更新状态信息"""
         if self.status_callback:
@@ -21,14 +107,65 @@ class MediaGenerator:
         else:
             print(message)
     
+    def _url(self, path: str) -> str:
+        base = self.base_url if "://" in self.base_url else f"https://{self.base_url}"
+        return base.rstrip("/") + path
+    
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+        """发送一次API请求并解析JSON响应，配置了速率限制器时由限制器统一调度"""
+        if self.rate_limiter:
+            async with self.rate_limiter.slot() as slot:
+                data = await self._send(method, path, payload, slot)
+        else:
+            data = await self._send(method, path, payload)
+        return json.loads(data.decode("utf-8"))
+    
+    async def _send(self, method: str, path: str, payload: Optional[Dict[str, Any]], slot=None) -> bytes:
+        """发送请求并返回响应内容，结果记录到速率限制器的名额中"""
+        headers = {
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        session = await self.http_pool.get_session()
+        async with session.request(method, self._url(path), json=payload, headers=headers) as res:
+            if slot:
+                slot.record(res.status, parse_retry_after(res.headers.get("Retry-After")))
+            return await res.read()
+    
+    async def close(self) -> None:
+        """停止轮询并关闭媒体请求的连接池"""
+        if self._poller is not None:
+            await self._poller.close()
+        await self.http_pool.close()
+    
+    def _run_sync(self, coro):
+        """在新的事件循环中运行协程，结束后关闭连接池"""
+        async def run():
+            try:
+                return await coro
+            finally:
+                await self.close()
+        return asyncio.run(run())
+    
     def generate_cover_images(self, novel_setup: Dict[str, Any], num_images: int = 1) -> List[Dict[str, Any]]:
+        """同步生成封面图片，参数见 generate_cover_images_async"""
+        return self._run_sync(self.generate_cover_images_async(novel_setup, num_images))
+    
+    def generate_music(self, novel_setup: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """同步生成音乐，参数见 generate_music_async"""
+        return self._run_sync(self.generate_music_async(novel_setup))
+    
+    async def generate_cover_images_async(self, novel_setup: Dict[str, Any], num_images: int = 1,
+                                          output_dir: str = "") -> List[Dict[str, Any]]:
         """
-        生成封面图片
+        生成封面图片：所有图片同时提交，再并发等待完成
         
         Args:
             novel_setup: 小说设置信息
             num_images: 生成图片数量
-            
+            output_dir: 小说的输出目录（记录在任务信息中）
+        
         Returns:
             List[Dict[str, Any]]: 生成的图片结果列表
         """
@@ -37,64 +174,61 @@ class MediaGenerator:
             prompt = self._generate_cover_prompt(novel_setup)
             self.update_status(f"正在生成封面图片，提示词：{prompt}")
             
-            image_results = []
-            
-            for i in range(num_images):
-                self.update_status(f"正在生成第 {i+1}/{num_images} 张封面图片...")
-                
-                # 调用MidJourney API生成图片
-                conn = http.client.HTTPSConnection(self.base_url)
-                payload = json.dumps({
-                    "prompt": prompt,
-                    "base64": False
-                })
-                headers = {
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                }
-                
-                try:
-                    conn.request("POST", "/mj/submit/imagine", payload, headers)
-                    res = conn.getresponse()
-                    data = res.read()
-                    response = json.loads(data.decode("utf-8"))
-                    conn.close()
-                    
-                    self.update_status(f"MidJourney API响应: {response}")
-                    
-                    # 修正API响应判断逻辑：MidJourney返回code=1表示成功
-                    if response.get("code") == 1 and response.get("result"):
-                        task_id = response["result"]
-                        self.update_status(f"封面图片 {i+1} 任务提交成功，任务ID: {task_id}")
-                        
-                        # 等待任务完成（10分钟）
-                        result = self.wait_for_image_completion(task_id, timeout=600)  # 10分钟
-                        if result:
-                            image_results.append(result)
-                            self.update_status(f"封面图片 {i+1} 生成成功")
-                        else:
-                            self.update_status(f"封面图片 {i+1} 等待超时，请稍后手动查询任务状态 (任务ID: {task_id})")
-                    else:
-                        error_msg = response.get("description", response.get("error", "API调用失败"))
-                        self.update_status(f"封面图片 {i+1} 生成失败：{error_msg}")
-                        
-                except Exception as e:
-                    self.update_status(f"封面图片 {i+1} 生成失败：{str(e)}")
-                    continue
-                    
-            return image_results
-            
+            novel_info = self._novel_info(novel_setup)
+            submitted = await asyncio.gather(*(self._submit_image(prompt, i, num_images, novel_info, output_dir)
+                                               for i in range(num_images)))
+            results = await asyncio.gather(*(self._wait_for_image(task, i) for i, task in enumerate(submitted)
+                                             if task))
+            return [result for result in results if result]
+        
         except Exception as e:
             self.update_status(f"生成封面图片时出错: {str(e)}")
             return []
     
-    def generate_music(self, novel_setup: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _novel_info(novel_setup: Dict[str, Any]) -> Dict[str, Any]:
+        """记录在媒体任务中的小说信息"""
+        return {key: novel_setup[key] for key in ("id", "index", "title", "genre", "novel_type") if key in novel_setup}
+    
+    async def _submit_image(self, prompt: str, i: int, num_images: int, novel_info: Dict[str, Any],
+                            output_dir: str) -> Optional[tuple]:
+        """提交一张封面图片的生成任务，返回 (任务ID, 本地任务标识)"""
+        self.update_status(f"正在生成第 {i+1}/{num_images} 张封面图片...")
+        try:
+            # 调用MidJourney API生成图片
+            response = await self._request("POST", "/mj/submit/imagine", {"prompt": prompt, "base64": False})
+            
+            self.update_status(f"MidJourney API响应: {response}")
+            
+            # 修正API响应判断逻辑：MidJourney返回code=1表示成功
+            if response.get("code") == 1 and response.get("result"):
+                task_id = response["result"]
+                self.update_status(f"封面图片 {i+1} 任务提交成功，任务ID: {task_id}")
+                return task_id, self.task_manager.add_image_task(task_id, novel_info, prompt, output_dir)
+            error_msg = response.get("description", response.get("error", "API调用失败"))
+            self.update_status(f"封面图片 {i+1} 生成失败：{error_msg}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.update_status(f"封面图片 {i+1} 生成失败：{str(e)}")
+        return None
+    
+    async def _wait_for_image(self, task, i: int) -> Optional[Dict[str, Any]]:
+        task_id, local_id = task
+        result = await self.wait_for_image_completion(task_id, local_id=local_id)
+        if result:
+            self.update_status(f"封面图片 {i+1} 生成成功")
+        else:
+            self.update_status(f"封面图片 {i+1} 未能完成，请稍后手动查询任务状态 (任务ID: {task_id})")
+        return result
+    
+    async def generate_music_async(self, novel_setup: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         生成音乐
         
         Args:
             novel_setup: 小说设置信息
-            
+        
         Returns:
             Optional[Dict[str, Any]]: 生成的音乐结果
         """
@@ -104,23 +238,11 @@ class MediaGenerator:
             self.update_status(f"正在生成音乐，提示词：{prompt}")
             
             # 调用Suno API生成音乐
-            conn = http.client.HTTPSConnection(self.base_url)
-            payload = json.dumps({
+            response = await self._request("POST", "/suno/submit/music", {
                 "prompt": prompt,
                 "make_instrumental": False,
                 "wait_audio": False
             })
-            headers = {
-                'Accept': 'application/json',
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            conn.request("POST", "/suno/submit/music", payload, headers)
-            res = conn.getresponse()
-            data = res.read()
-            response = json.loads(data.decode("utf-8"))
-            conn.close()
             
             self.update_status(f"Suno API响应: {response}")
             
@@ -129,134 +251,85 @@ class MediaGenerator:
                 task_id = response["data"]  # Suno直接返回任务ID字符串
                 self.update_status(f"音乐任务提交成功，任务ID: {task_id}")
                 
-                # 等待任务完成（10分钟）
-                result = self.wait_for_music_completion(task_id, timeout=600)  # 10分钟
+                result = await self.wait_for_music_completion(task_id)
                 if result:
                     self.update_status("音乐生成成功")
                     return result
                 else:
-                    self.update_status(f"音乐等待超时，请稍后手动查询任务状态 (任务ID: {task_id})")
+                    self.update_status(f"音乐未能完成，请稍后手动查询任务状态 (任务ID: {task_id})")
                     return None
             else:
                 error_msg = response.get("message", response.get("error", "API调用失败"))
                 self.update_status(f"音乐生成失败：{error_msg}")
                 return None
-                
+        
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.update_status(f"生成音乐时出错: {str(e)}")
             return None
     
-    def wait_for_image_completion(self, task_id: str, timeout: int = 600) -> Optional[Dict[str, Any]]:
+    async def wait_for_image_completion(self, task_id: str, timeout: Optional[float] = None,
+                                        local_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
-        等待图片生成完成
+        等待图片生成完成：任务由共用的轮询器批量查询，等待期间不占用事件循环
         
         Args:
             task_id: 任务ID
-            timeout: 超时时间（秒）
-            
+            timeout: 超时时间（秒），默认为 self.timeout
+            local_id: MediaTaskManager 中的本地任务标识，用于记录结果
+        
         Returns:
             Optional[Dict[str, Any]]: 完成的任务结果
         """
+        timeout = self.timeout if timeout is None else timeout
         start_time = time.time()
-        check_interval = 10  # 每10秒检查一次
         
-        self.update_status(f"等待图片任务完成: {task_id}，最长等待10分钟")
+        self.update_status(f"等待图片任务完成: {task_id}，最长等待 {int(timeout)} 秒")
         
-        while time.time() - start_time < timeout:
-            try:
-                # 使用批量查询接口检查任务状态
-                conn = http.client.HTTPSConnection(self.base_url)
-                payload = json.dumps({
-                    "ids": [task_id]
-                })
-                headers = {
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                }
-                conn.request("POST", "/mj/task/list-by-condition", payload, headers)
-                res = conn.getresponse()
-                data = res.read()
-                response = json.loads(data.decode("utf-8"))
-                conn.close()
-                
-                # 修正响应解析：根据API文档，返回的是任务列表
-                task_info = None
-                if isinstance(response, list) and len(response) > 0:
-                    task_info = response[0]
-                elif isinstance(response, dict) and "data" in response:
-                    # 如果返回格式是 {"data": [...]}
-                    data_list = response.get("data", [])
-                    if isinstance(data_list, list) and len(data_list) > 0:
-                        task_info = data_list[0]
-                
-                if task_info:
-                    status = task_info.get("status")
-                    progress = task_info.get("progress", "0%")
-                    elapsed_time = int(time.time() - start_time)
-                    remaining_time = timeout - elapsed_time
-                    
-                    self.update_status(f"图片任务进度: {progress}, 状态: {status}, 已等待: {elapsed_time}秒, 剩余: {remaining_time}秒")
-                    
-                    if status == "SUCCESS":
-                        self.update_status(f"图片任务 {task_id} 完成！耗时: {elapsed_time}秒")
-                        # 自动下载图片
-                        downloaded_path = self.download_image(task_info)
-                        if downloaded_path:
-                            self.update_status(f"图片下载成功: {downloaded_path}")
-                            task_info["local_path"] = downloaded_path
-                        return task_info
-                    elif status == "FAILURE":
-                        failure_reason = task_info.get("failReason", "未知原因")
-                        self.update_status(f"图片任务 {task_id} 失败: {failure_reason}")
-                        return None
-                    elif status in ["IN_PROGRESS", "SUBMITTED"]:
-                        # 任务还在进行中，继续等待
-                        pass
-                    else:
-                        self.update_status(f"图片任务状态未知: {status}")
-                else:
-                    self.update_status(f"图片任务查询响应格式异常: {response}")
-                
-            except Exception as e:
-                self.update_status(f"检查图片任务状态时出错: {str(e)}")
-            
-            # 等待一段时间再检查
-            time.sleep(check_interval)
+        task_info = await self.poller.wait(task_id, timeout)
+        elapsed_time = int(time.time() - start_time)
+        if task_info is None:
+            self.update_status(f"图片任务 {task_id} 超时")
+            if local_id:
+                self.task_manager.update_task_status(local_id, "timeout")
+            return None
+        
+        if task_info.get("status") == "SUCCESS":
+            self.update_status(f"图片任务 {task_id} 完成！耗时: {elapsed_time}秒")
+            # 自动下载图片
+            downloaded_path = await self.download_image(task_info)
+            if downloaded_path:
+                self.update_status(f"图片下载成功: {downloaded_path}")
+                task_info["local_path"] = downloaded_path
+                if local_id:
+                    self.task_manager.update_task_status(local_id, "success", result=task_info)
+            return task_info
         
-        self.update_status(f"图片任务 {task_id} 超时")
+        failure_reason = task_info.get("failReason", "未知原因")
+        self.update_status(f"图片任务 {task_id} 失败: {failure_reason}")
         return None
     
-    def wait_for_music_completion(self, task_id: str, timeout: int = 600) -> Optional[Dict[str, Any]]:
+    async def wait_for_music_completion(self, task_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """
-        等待音乐生成完成
+        等待音乐生成完成（轮询间隔内不占用事件循环）
         
         Args:
             task_id: 任务ID
-            timeout: 超时时间（秒）
-            
+            timeout: 超时时间（秒），默认为 self.timeout
+        
         Returns:
             Optional[Dict[str, Any]]: 完成的任务结果
         """
+        timeout = self.timeout if timeout is None else timeout
         start_time = time.time()
-        check_interval = 10  # 每10秒检查一次
         
-        self.update_status(f"等待音乐任务完成: {task_id}，最长等待10分钟")
+        self.update_status(f"等待音乐任务完成: {task_id}，最长等待 {int(timeout)} 秒")
         
         while time.time() - start_time < timeout:
             try:
                 # 使用单个任务查询接口
-                conn = http.client.HTTPSConnection(self.base_url)
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}'
-                }
-                
-                conn.request("GET", f"/suno/fetch/{task_id}", "", headers)
-                res = conn.getresponse()
-                data = res.read()
-                response = json.loads(data.decode("utf-8"))
-                conn.close()
+                response = await self._request("GET", f"/suno/fetch/{task_id}")
                 
                 # 解析音乐任务响应
                 if response.get("code") == "success" and response.get("data"):
@@ -268,13 +341,13 @@ class MediaGenerator:
                     # 如果data是字符串，说明任务还在处理中
                     if isinstance(task_data, str):
                         elapsed_time = int(time.time() - start_time)
-                        remaining_time = timeout - elapsed_time
+                        remaining_time = int(timeout - elapsed_time)
                         self.update_status(f"音乐任务进度: 处理中, 状态: IN_PROGRESS, 已等待: {elapsed_time}秒, 剩余: {remaining_time}秒")
                     elif isinstance(task_data, dict):
                         # 如果data是字典，说明任务完成
                         status = task_data.get("status", "UNKNOWN")
                         elapsed_time = int(time.time() - start_time)
-                        remaining_time = timeout - elapsed_time
+                        remaining_time = int(timeout - elapsed_time)
                         
                         self.update_status(f"音乐任务进度: 100%, 状态: {status}, 已等待: {elapsed_time}秒, 剩余: {remaining_time}秒")
                         
@@ -297,7 +370,7 @@ class MediaGenerator:
                         if status in ["complete", "SUCCESS"] and has_audio_url:
                             self.update_status(f"音乐任务 {task_id} 完成！耗时: {elapsed_time}秒")
                             # 自动下载音乐 - 传递第一个音乐文件的数据
-                            downloaded_path = self.download_music(data_array[0])
+                            downloaded_path = await self.download_music(data_array[0])
                             if downloaded_path:
                                 self.update_status(f"音乐下载成功: {downloaded_path}")
                                 task_data["local_path"] = downloaded_path
@@ -322,28 +395,30 @@ class MediaGenerator:
                                 elapsed_time = int(time.time() - start_time)
                                 self.update_status(f"音乐任务 {task_id} 完成！耗时: {elapsed_time}秒")
                                 # 自动下载音乐
-                                downloaded_path = self.download_music(first_item)
+                                downloaded_path = await self.download_music(first_item)
                                 if downloaded_path:
                                     self.update_status(f"音乐下载成功: {downloaded_path}")
                                     first_item["local_path"] = downloaded_path
                                 return first_item
-                
+            
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 self.update_status(f"检查音乐任务状态时出错: {str(e)}")
             
             # 等待一段时间再检查
-            time.sleep(check_interval)
+            await asyncio.sleep(self.poll_interval)
         
         self.update_status(f"音乐任务 {task_id} 超时")
         return None
     
-    def download_image(self, task_info: Dict[str, Any]) -> Optional[str]:
+    async def download_image(self, task_info: Dict[str, Any]) -> Optional[str]:
         """
         下载图片到本地
         
         Args:
             task_info: 任务信息，包含imageUrl
-            
+        
         Returns:
             Optional[str]: 下载的本地文件路径
         """
@@ -353,10 +428,6 @@ class MediaGenerator:
                 self.update_status("未找到图片下载链接")
                 return None
             
-            # 创建下载目录
-            download_dir = "downloads/images"
-            os.makedirs(download_dir, exist_ok=True)
-            
             # 生成文件名
             task_id = task_info.get("id", "unknown")
             file_extension = ".png"
@@ -366,25 +437,25 @@ class MediaGenerator:
                 file_extension = ".webp"
             
             filename = f"cover_{task_id}{file_extension}"
-            local_path = os.path.join(download_dir, filename)
+            local_path = os.path.join(self.download_dir, "images", filename)
             
             # 下载文件
             self.update_status(f"正在下载图片: {image_url}")
-            urllib.request.urlretrieve(image_url, local_path)
-            
-            return local_path
-            
+            return await self.downloader.download(image_url, local_path)
+        
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.update_status(f"下载图片失败: {str(e)}")
             return None
     
-    def download_music(self, task_data: Dict[str, Any]) -> Optional[str]:
+    async def download_music(self, task_data: Dict[str, Any]) -> Optional[str]:
         """
         下载音乐到本地
         
         Args:
             task_data: 任务数据，包含audio_url
-            
+        
         Returns:
             Optional[str]: 下载的本地文件路径
         """
@@ -394,24 +465,20 @@ class MediaGenerator:
                 self.update_status("未找到音乐下载链接")
                 return None
             
-            # 创建下载目录
-            download_dir = "downloads/music"
-            os.makedirs(download_dir, exist_ok=True)
-            
             # 生成文件名
             task_id = task_data.get("id", "unknown")
             title = task_data.get("title", "music")
             # 清理文件名中的非法字符
             safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
             filename = f"{safe_title}_{task_id}.mp3"
-            local_path = os.path.join(download_dir, filename)
+            local_path = os.path.join(self.download_dir, "music", filename)
             
             # 下载文件
             self.update_status(f"正在下载音乐: {audio_url}")
-            urllib.request.urlretrieve(audio_url, local_path)
-            
-            return local_path
-            
+            return await self.downloader.download(audio_url, local_path)
+        
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.update_status(f"下载音乐失败: {str(e)}")
             return None
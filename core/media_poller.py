@@ -0,0 +1,175 @@
+"""
+媒体任务轮询模块 - 用一个后台协程批量查询所有未完成的 MidJourney 任务。
+
+TaskPoller 由媒体生成器持有（一个进程一个），所有等待中的任务共用一个轮询协程：
+- 每个间隔把等待中的任务ID和 MediaTaskManager 中尚未完成的图片任务合并，批量查询（每批最多
+  batch_size 个ID），完成或失败的任务通过 future 通知各自的等待方；
+- 轮询间隔随任务报告的进度自适应：刚提交时间隔较长，进度越接近100%间隔越短，并加入随机抖动；
+- 没有等待方时轮询协程自动结束，下次等待时重新启动。
+"""
+
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("novel_generator")
+
+# 表示任务已结束的 MidJourney 状态
+FINAL_STATUSES = ("SUCCESS", "FAILURE")
+
+# MidJourney 状态 -> MediaTaskManager 中的状态
+TASK_MANAGER_STATUS = {
+    "NOT_START": "queued",
+    "SUBMITTED": "submitted",
+    "IN_PROGRESS": "in_progress",
+    "SUCCESS": "success",
+    "FAILURE": "failure",
+}
+
+
+def parse_progress(value) -> float:
+    """把 "45%" 形式的进度转换为 0~1 之间的小数，无法解析时返回0"""
+    try:
+        return min(1.0, max(0.0, float(str(value).strip().rstrip("%")) / 100))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TaskPoller:
+    """批量轮询 MidJourney 任务状态，并把结果分发给等待方"""
+
+    def __init__(self,
+                 query: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+                 task_manager=None,
+                 min_interval: float = 2.0,
+                 max_interval: float = 10.0,
+                 jitter: float = 0.2,
+                 batch_size: int = 100,
+                 status_callback: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            query: 批量查询函数，参数为任务ID列表，返回任务信息列表
+            task_manager: 可选的 MediaTaskManager，其中尚未完成的图片任务一并查询并更新状态
+            min_interval: 任务接近完成时的轮询间隔（秒）
+            max_interval: 任务刚提交时的轮询间隔（秒）
+            jitter: 间隔的随机抖动比例
+            batch_size: 单个请求最多查询的任务数
+            status_callback: 状态消息回调
+        """
+        self.query = query
+        self.task_manager = task_manager
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.batch_size = max(1, batch_size)
+        self.status_callback = status_callback
+
+        self._waiters: Dict[str, List[asyncio.Future]] = {}  # 任务ID -> 等待该任务的 future
+        self._task: Optional[asyncio.Task] = None
+        self.requests = 0  # 发出的查询请求数
+
+    def update_status(self, message: str) -> None:
+        if self.status_callback:
+            self.status_callback(message)
+
+    @property
+    def pending(self) -> int:
+        """正在等待的任务数"""
+        return len(self._waiters)
+
+    async def wait(self, task_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """等待任务结束，返回最后一次查询到的任务信息；超时返回 None"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, []).append(future)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[task_id]
+
+    async def _run(self) -> None:
+        """轮询协程：有等待方时每个间隔批量查询一次"""
+        while self._waiters:
+            interval = await self.poll_once()
+            if self._waiters:
+                await asyncio.sleep(interval)
+
+    def _manager_tasks(self) -> Dict[str, Dict[str, Any]]:
+        """MediaTaskManager 中尚未完成的图片任务：任务ID -> 本地任务记录"""
+        if not self.task_manager:
+            return {}
+        return {task["api_task_id"]: task for task in self.task_manager.get_pending_tasks()
+                if task.get("type") == "image" and task.get("api_task_id")}
+
+    async def poll_once(self) -> float:
+        """批量查询一次所有未完成的任务，返回下一次查询前的等待时间"""
+        managed = self._manager_tasks()
+        ids = list(self._waiters)
+        ids += [task_id for task_id in managed if task_id not in self._waiters]
+
+        progress = []
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            try:
+                infos = await self.query(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.update_status(f"批量查询图片任务状态时出错: {str(e)}")
+                continue
+            self.requests += 1
+            for info in infos:
+                if isinstance(info, dict) and info.get("id"):
+                    done = self._dispatch(info, managed.get(info["id"]))
+                    if not done:
+                        progress.append(parse_progress(info.get("progress")))
+
+        if progress:
+            self.update_status(f"图片任务: {len(progress)} 个进行中，最高进度 {max(progress):.0%}")
+        return self.next_interval(progress)
+
+    def _dispatch(self, info: Dict[str, Any], managed: Optional[Dict[str, Any]]) -> bool:
+        """处理一个任务的查询结果，返回任务是否已结束"""
+        status = info.get("status")
+        if managed is not None:
+            manager_status = TASK_MANAGER_STATUS.get(status, str(status).lower())
+            if manager_status != managed.get("status"):
+                self.task_manager.update_task_status(
+                    managed["local_id"], manager_status,
+                    result=info if status == "SUCCESS" else None,
+                    error=info.get("failReason") if status == "FAILURE" else None)
+
+        if status not in FINAL_STATUSES:
+            return False
+        for future in self._waiters.pop(info["id"], []):
+            if not future.done():
+                future.set_result(info)
+        return True
+
+    def next_interval(self, progress: List[float]) -> float:
+        """根据进行中任务的最高进度计算轮询间隔，并加入随机抖动"""
+        highest = max(progress) if progress else 0.0
+        interval = self.max_interval - (self.max_interval - self.min_interval) * highest
+        if self.jitter:
+            interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, interval)
+
+    async def close(self) -> None:
+        """停止轮询协程"""
+        task = self._task
+        self._task = None
+        # 同步接口每次调用都在新的事件循环中运行，只有当前循环中的轮询协程需要等待其结束
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
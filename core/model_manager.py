@@ -1,6 +1,5 @@
 import os
 import sys
-import requests
 from typing import List, Dict, Any, Optional
 
 # 修复导入问题
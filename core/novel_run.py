@@ -0,0 +1,98 @@
+"""
+小说生成上下文模块 - 保存单本小说的正文、计数器、摘要状态和文件路径。
+
+生成器只保存所有小说共享的资源（连接池、速率限制器、后处理进程池），
+以及按小说文件索引的 NovelRun。
+"""
+
+import copy
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+try:
+    from .text_buffer import TextBuffer
+except ImportError:
+    from core.text_buffer import TextBuffer
+
+# 超过该字数的小说启用长文本处理（更严格的清理和重复检测）
+LONG_TEXT_THRESHOLD = 250000
+
+
+class NovelRun:
+    """一本小说的生成状态：正文缓冲区、计数器、摘要状态和文件路径"""
+
+    def __init__(self, index: int, novel_setup: Dict[str, Any], txt_path: str, text=""):
+        """
+        Args:
+            index: 小说编号（从0开始）
+            novel_setup: 小说设定，进度和字数会写回其中
+            txt_path: 小说文本文件路径
+            text: 已有正文（续写时）
+        """
+        self.index = index
+        self.setup = novel_setup
+        self.novel_id = novel_setup.get("id", novel_setup.get("index", index))
+        self.txt_path = txt_path
+        # 正文保存在分块缓冲区中，追加为O(1)，合并内容时就地修改
+        self.text = text if isinstance(text, TextBuffer) else TextBuffer(text)
+
+        self.start_time = time.time()
+        self.start_words = len(self.text)
+        self.last_saved_word_count = len(self.text)
+        self.last_summary_word_count = len(self.text)
+        self.last_cleaning_check = len(self.text)
+        self.ending_generated = False
+
+        self.fingerprint_index = None  # 段落指纹索引，开始生成时加载
+        self.summary_task: Optional[asyncio.Task] = None  # 后台摘要任务
+        self._save_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def meta_path(self) -> str:
+        return self.txt_path.replace('.txt', '_meta.json')
+
+    @property
+    def word_count(self) -> int:
+        return len(self.text)
+
+    @property
+    def is_long_text(self) -> bool:
+        return len(self.text) > LONG_TEXT_THRESHOLD
+
+    @property
+    def save_lock(self) -> asyncio.Lock:
+        """保存本小说时使用的锁（不同小说的保存互不等待）"""
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        return self._save_lock
+
+    def snapshot(self):
+        """返回 (起始位置, 该位置之后的正文, 设定) 的快照，供线程池写盘
+
+        只复制自上次快照以来追加或改写的部分，并把当前内容标记为已保存；写盘失败时
+        调用 text.mark_changed() 使下次快照重新包含这部分内容。
+        正文缓冲区和设定只在事件循环线程中修改，必须在该线程中调用；
+        其他线程直接读取可能遇到修改到一半的缓冲区。
+        """
+        offset = self.text.changed_from
+        delta = self.text[offset:]
+        self.text.mark()
+        return offset, delta, copy.deepcopy(self.setup)
+
+    def summary_pending(self) -> bool:
+        return self.summary_task is not None and not self.summary_task.done()
+
+    def update_progress(self) -> None:
+        """把字数、完成百分比和预计剩余时间写入小说设定"""
+        setup = self.setup
+        word_count = len(self.text)
+        target_length = max(setup.get("target_length") or 1, 1)
+        setup["word_count"] = word_count
+        setup["percentage"] = min(100.0, word_count / target_length * 100)
+
+        elapsed_time = time.time() - self.start_time
+        generated = word_count - self.start_words
+        remaining = target_length - word_count
+        if elapsed_time > 0 and generated > 0 and remaining > 0:
+            setup["estimated_time"] = remaining / (generated / elapsed_time)
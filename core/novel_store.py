@@ -0,0 +1,450 @@
+"""
+小说存储模块 - 追加式的增量持久化。
+
+1. 正文：新增内容以记录形式追加到块日志（<小说名>_chunks.jsonl），按时间间隔批量 fsync；
+   日志体积超过正文一定比例时，原子地（临时文件 + os.replace）合并进 .txt 并清空日志。
+2. 元数据：只把发生变化的字段追加到增量日志（<小说名>_meta_delta.jsonl），
+   累积到一定条数后再合并成完整的 _meta.json 快照。
+
+块日志第一行记录写入时 .txt 的长度和 SHA-1：如果合并时在替换 .txt 之后、删除日志之前中断，
+重新加载时会发现校验值不一致，从而丢弃已经合并过的旧日志，不会重复追加。
+
+元数据用 text_ref 字段按引用指向 .txt：
+    {"path": 文件名（相对于元数据所在目录）, "offset": 字节偏移, "length": 字节长度, "sha256": 校验值}
+text_ref 在每次合并 .txt 时更新，描述已合并的正文；尚未合并的部分在块日志中。
+正文内嵌在 content 字段中的旧版本元数据可用 migrate_metadata 迁移。
+
+读取时请使用 read_novel_text / read_novel_metadata，它们会回放尚未合并的日志。
+存储只在内存中保留已保存正文的长度和末尾窗口；save_text 可以只传入某个位置之后的正文。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("novel_generator")
+
+# 不写入元数据的字段：正文由 .txt 和块日志保存，_prompt_cache 为内存中的提示词渲染缓存
+EXCLUDED_META_KEYS = ("content", "_prompt_cache")
+
+# 比较新旧正文时只检查末尾这么多字符（正文的修改只发生在末尾）
+TAIL_WINDOW = 64 * 1024
+
+
+def chunk_log_path(txt_path: str) -> str:
+    """正文块日志的路径"""
+    return txt_path.replace('.txt', '_chunks.jsonl')
+
+
+def meta_delta_path(meta_path: str) -> str:
+    """元数据增量日志的路径"""
+    return meta_path.replace('_meta.json', '_meta_delta.jsonl')
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """原子写入：先写临时文件并落盘，再替换目标文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def make_text_ref(txt_path: str, data: bytes, offset: int = 0) -> Dict[str, Any]:
+    """生成指向正文文件的引用"""
+    return {
+        "path": os.path.basename(txt_path),
+        "offset": offset,
+        "length": len(data),
+        "sha256": hashlib.sha256(data).hexdigest()
+    }
+
+
+def read_text_ref(base_dir: str, text_ref: Dict[str, Any], verify: bool = True) -> Optional[str]:
+    """按引用读取正文
+
+    Args:
+        base_dir: 元数据文件所在目录，引用中的路径相对于该目录
+        text_ref: 正文引用
+        verify: 是否校验 sha256
+
+    Returns:
+        Optional[str]: 正文；文件缺失、长度不足或校验失败时返回 None
+    """
+    path = os.path.join(base_dir, text_ref["path"])
+    try:
+        with open(path, "rb") as f:
+            f.seek(text_ref.get("offset", 0))
+            data = f.read(text_ref["length"])
+    except OSError:
+        return None
+    if len(data) != text_ref["length"]:
+        return None
+    if verify and hashlib.sha256(data).hexdigest() != text_ref.get("sha256"):
+        return None
+    return data.decode("utf-8")
+
+
+def migrate_metadata(meta_path: str, txt_path: Optional[str] = None) -> bool:
+    """把旧版本元数据（正文内嵌在 content 字段中）迁移为按引用保存
+
+    .txt 不存在时先用 content 的内容创建它。
+
+    Returns:
+        bool: 是否进行了迁移
+    """
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if "content" not in meta:
+        return False
+
+    txt_path = txt_path or meta_path.replace('_meta.json', '.txt')
+    content = meta.pop("content") or ""
+    if not os.path.exists(txt_path) and content:
+        _write_atomic(txt_path, content.encode("utf-8"))
+    if os.path.exists(txt_path):
+        with open(txt_path, "rb") as f:
+            meta["text_ref"] = make_text_ref(txt_path, f.read())
+
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))
+    logger.info(f"已将元数据迁移为按引用保存正文: {meta_path}")
+    return True
+
+
+def _common_prefix_length(old: str, new: str) -> int:
+    """两段文本公共前缀的长度（内容变化通常只发生在末尾）"""
+    if new.startswith(old):
+        return len(old)
+    lo, hi = 0, min(len(old), len(new))
+    # 二分查找，每次比较都是C层面的内存比较
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if new.startswith(old[:mid]):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _replay_chunk_log(base: str, base_bytes: bytes, log_path: str) -> Tuple[str, bool]:
+    """在 .txt 内容上回放块日志
+
+    Returns:
+        Tuple[str, bool]: (回放后的正文, 日志是否有效)
+    """
+    if not os.path.exists(log_path):
+        return base, False
+
+    with open(log_path, "rb") as f:
+        lines = f.read().split(b"\n")
+
+    try:
+        header = json.loads(lines[0])
+    except (ValueError, IndexError):
+        return base, False
+    if header.get("base_sha1") != _sha1(base_bytes):
+        # 日志已经合并进 .txt（合并过程在删除日志前中断），丢弃
+        return base, False
+
+    text = base
+    for line in lines[1:]:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # 最后一条记录可能因中断而不完整，之前的记录仍然有效
+            logger.warning(f"块日志存在不完整的记录，已忽略: {log_path}")
+            break
+        if "t" in record:
+            text = text[:record["t"]]
+        text += record.get("a", "")
+    return text, True
+
+
+def read_novel_text(txt_path: str) -> str:
+    """读取小说正文（包括尚未合并进 .txt 的块日志内容）"""
+    base_bytes = b""
+    if os.path.exists(txt_path):
+        with open(txt_path, "rb") as f:
+            base_bytes = f.read()
+    base = base_bytes.decode("utf-8")
+    text, _ = _replay_chunk_log(base, base_bytes, chunk_log_path(txt_path))
+    return text
+
+
+def read_novel_metadata(meta_path: str) -> Dict[str, Any]:
+    """读取小说元数据（_meta.json 快照 + 增量日志）"""
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    delta_path = meta_delta_path(meta_path)
+    if os.path.exists(delta_path):
+        with open(delta_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"元数据增量日志存在不完整的记录，已忽略: {delta_path}")
+                    break
+                meta.update(record.get("set", {}))
+                for key in record.get("del", []):
+                    meta.pop(key, None)
+    return meta
+
+
+class NovelStore:
+    """单本小说的追加式存储"""
+
+    def __init__(self,
+                 txt_path: str,
+                 meta_path: Optional[str] = None,
+                 fsync_interval: float = 2.0,
+                 compact_ratio: float = 0.5,
+                 min_compact_bytes: int = 64 * 1024,
+                 meta_compact_entries: int = 50):
+        """
+        Args:
+            txt_path: 小说文本文件路径
+            meta_path: 元数据文件路径，默认为 <小说名>_meta.json
+            fsync_interval: 块日志两次 fsync 之间的最小间隔（秒）
+            compact_ratio: 块日志超过 .txt 体积的该比例时合并
+            min_compact_bytes: 触发合并的最小日志体积（字节）
+            meta_compact_entries: 元数据增量日志累积多少条后合并成快照
+        """
+        self.txt_path = txt_path
+        self.meta_path = meta_path or txt_path.replace('.txt', '_meta.json')
+        self.log_path = chunk_log_path(txt_path)
+        self.delta_path = meta_delta_path(self.meta_path)
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self.meta_compact_entries = meta_compact_entries
+
+        self._lock = threading.Lock()
+        self._length: Optional[int] = None  # 磁盘上（.txt + 块日志）正文的长度
+        self._tail = ""  # 磁盘上正文的末尾窗口
+        self._base_bytes = 0
+        self._base_sha1 = _sha1(b"")
+        self._log_file = None
+        self._log_bytes = 0
+        self._last_fsync = 0.0
+
+        self._meta_encoded: Optional[Dict[str, str]] = None  # 磁盘上元数据各字段的JSON编码
+        self.text_ref: Optional[Dict[str, Any]] = None  # 指向已合并正文的引用，合并时更新
+        self._meta_entries = 0
+
+        # 写盘量统计
+        self.bytes_written = 0
+
+    # ---------- 正文 ----------
+
+    def _load_text(self) -> None:
+        base_bytes = b""
+        if os.path.exists(self.txt_path):
+            with open(self.txt_path, "rb") as f:
+                base_bytes = f.read()
+        self._base_bytes = len(base_bytes)
+        self._base_sha1 = _sha1(base_bytes)
+        text, valid = _replay_chunk_log(base_bytes.decode("utf-8"), base_bytes, self.log_path)
+        self._length = len(text)
+        self._tail = text[-TAIL_WINDOW:]
+
+        if valid:
+            self._log_bytes = os.path.getsize(self.log_path)
+        else:
+            self._log_bytes = 0
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+
+    def _open_log(self) -> None:
+        if self._log_file is not None:
+            return
+        if self._log_bytes == 0:
+            # 新日志：第一行记录对应的 .txt 校验值
+            header = json.dumps({"base_len": self._base_bytes, "base_sha1": self._base_sha1}).encode("utf-8") + b"\n"
+            self._log_file = open(self.log_path, "ab")
+            self._log_file.write(header)
+            self._log_bytes += len(header)
+            self.bytes_written += len(header)
+        else:
+            self._log_file = open(self.log_path, "ab")
+
+    def save_text(self, text, offset: int = 0) -> None:
+        """保存正文，只把与上次保存相比的变化追加到块日志
+
+        Args:
+            text: 从 offset 开始的正文，str 或 TextBuffer；offset 为0时是完整正文
+            offset: text 在全文中的起始位置，此前的内容与上次保存时相同，不能超过已保存的长度
+        """
+        with self._lock:
+            if self._length is None:
+                self._load_text()
+            if offset > self._length:
+                raise ValueError(f"正文起始位置 {offset} 超出已保存的长度 {self._length}")
+
+            # 还没有 .txt 文件（新小说）时直接写入，保证文件始终存在
+            if not os.path.exists(self.txt_path):
+                self._compact_text(text)
+                return
+
+            window_start = self._length - len(self._tail)
+            if 0 < offset < window_start:
+                # 改动超出了内存中的末尾窗口，从磁盘补齐前面的内容后整体重写
+                self._compact_text(read_novel_text(self.txt_path)[:offset] + str(text))
+                return
+
+            # 在末尾窗口内查找新旧正文的公共前缀
+            length = offset + len(text)
+            start = max(offset, window_start)
+            keep = start + _common_prefix_length(self._tail[start - window_start:],
+                                                 text[start - offset:self._length - offset])
+            if keep == window_start > offset:
+                # 修改超出了末尾窗口，直接整体重写
+                self._compact_text(text)
+                return
+            if keep == self._length == length:
+                return
+
+            appended = text[keep - offset:length - offset]
+            record = {"a": appended}
+            if keep < self._length:
+                record["t"] = keep
+            line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+            self._open_log()
+            self._log_file.write(line)
+            self._log_file.flush()
+            self._log_bytes += len(line)
+            self.bytes_written += len(line)
+            self._tail = (self._tail[:keep - window_start] + appended)[-TAIL_WINDOW:]
+            self._length = length
+
+            now = time.time()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._log_file.fileno())
+                self._last_fsync = now
+
+            if self._log_bytes >= max(self.min_compact_bytes, self._base_bytes * self.compact_ratio):
+                self._compact_text(text if offset == 0 else read_novel_text(self.txt_path))
+
+    def _close_log(self) -> None:
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def _compact_text(self, text) -> None:
+        """把完整正文写入 .txt，并清空块日志"""
+        text = str(text)
+        self._length = len(text)
+        self._tail = text[-TAIL_WINDOW:]
+        data = text.encode("utf-8")
+        _write_atomic(self.txt_path, data)
+        self.bytes_written += len(data)
+        self._base_bytes = len(data)
+        self._base_sha1 = _sha1(data)
+        self.text_ref = make_text_ref(self.txt_path, data)
+
+        self._close_log()
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._log_bytes = 0
+        self._last_fsync = time.time()
+
+    def offsets(self) -> Dict[str, int]:
+        """已保存正文的位置：正文字数、.txt 字节数和块日志字节数（记录到任务库，供续写时核对）"""
+        with self._lock:
+            return {"length": self._length or 0, "txt_bytes": self._base_bytes, "log_bytes": self._log_bytes}
+
+    def flush(self) -> None:
+        """把块日志强制落盘"""
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.flush()
+                os.fsync(self._log_file.fileno())
+                self._last_fsync = time.time()
+
+    # ---------- 元数据 ----------
+
+    def save_metadata(self, metadata: Dict[str, Any]) -> None:
+        """保存元数据，只追加发生变化的字段"""
+        with self._lock:
+            encoded = {
+                key: json.dumps(value, ensure_ascii=False, sort_keys=True)
+                for key, value in metadata.items()
+                if key not in EXCLUDED_META_KEYS
+            }
+            if self.text_ref is not None:
+                encoded["text_ref"] = json.dumps(self.text_ref, sort_keys=True)
+
+            if self._meta_encoded is None:
+                if not os.path.exists(self.meta_path):
+                    self._write_meta_snapshot(encoded)
+                    return
+                existing = read_novel_metadata(self.meta_path)
+                self._meta_encoded = {
+                    key: json.dumps(value, ensure_ascii=False, sort_keys=True)
+                    for key, value in existing.items()
+                }
+                # 旧版本的元数据中可能包含正文，直接重写快照将其去除
+                if any(key in existing for key in EXCLUDED_META_KEYS):
+                    self._write_meta_snapshot(encoded)
+                    return
+
+            changed = [key for key, value in encoded.items() if self._meta_encoded.get(key) != value]
+            removed = [key for key in self._meta_encoded if key not in encoded]
+            if not changed and not removed:
+                return
+
+            parts = ", ".join(f"{json.dumps(key, ensure_ascii=False)}: {encoded[key]}" for key in changed)
+            line = "{\"set\": {" + parts + "}"
+            if removed:
+                line += ", \"del\": " + json.dumps(removed, ensure_ascii=False)
+            data = (line + "}\n").encode("utf-8")
+
+            with open(self.delta_path, "ab") as f:
+                f.write(data)
+            self.bytes_written += len(data)
+            self._meta_encoded = encoded
+            self._meta_entries += 1
+
+            if self._meta_entries >= self.meta_compact_entries:
+                self._write_meta_snapshot(encoded)
+
+    def _write_meta_snapshot(self, encoded: Dict[str, str]) -> None:
+        """把元数据写成完整的 _meta.json 快照，并清空增量日志"""
+        body = ",\n".join(f"  {json.dumps(key, ensure_ascii=False)}: {value}" for key, value in encoded.items())
+        data = ("{\n" + body + "\n}").encode("utf-8")
+        _write_atomic(self.meta_path, data)
+        self.bytes_written += len(data)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._meta_encoded = encoded
+        self._meta_entries = 0
+
+    # ---------- 生命周期 ----------
+
+    def close(self) -> None:
+        """合并所有日志，使 .txt 和 _meta.json 成为完整的最新内容"""
+        with self._lock:
+            if self._log_bytes:
+                self._close_log()
+                self._compact_text(read_novel_text(self.txt_path))
+                if self._meta_encoded is not None:
+                    self._meta_encoded["text_ref"] = json.dumps(self.text_ref, sort_keys=True)
+                    self._meta_entries += 1
+            self._close_log()
+            if self._meta_encoded is not None and self._meta_entries:
+                self._write_meta_snapshot(self._meta_encoded)
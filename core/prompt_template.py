@@ -0,0 +1,153 @@
+"""
+提示词模板模块 - 预编译的占位符模板和按小说设定缓存的渲染结果。
+
+模板（GENRE_SPECIFIC_PROMPTS、PROMPT_TEMPLATES 和自定义提示词）编译一次为
+"固定文本 / 占位符槽位" 交替的片段列表，渲染时用一次 ''.join 拼接。
+
+渲染结果只取决于模板和小说设定中的主角、世界观、故事结构、主题字段，
+缓存在小说设定的 _prompt_cache 字段中，这些字段变化时才重新渲染。
+"""
+
+import re
+import json
+from functools import lru_cache
+from typing import Any, Dict, List
+
+# 占位符形如 [PROTAGONIST_NAME]
+PLACEHOLDER_PATTERN = re.compile(r"\[([A-Z_]+)\]")
+
+# 小说设定中缓存渲染结果的字段（不写入元数据）
+PROMPT_CACHE_KEY = "_prompt_cache"
+
+# 影响模板渲染结果的设定字段
+SETUP_FIELDS = ("protagonist", "world_building", "story_structure", "themes")
+
+
+def format_value(value: Any) -> str:
+    """把设定中的值转换为替换文本：列表用顿号连接，字典转换为键值对"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "、".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return "；".join(f"{k}：{v}" for k, v in value.items())
+    return str(value)
+
+
+class PromptTemplate:
+    """编译后的提示词模板
+
+    segments 比 slots 多一项：渲染结果为 segments[0] + 值(slots[0]) + segments[1] + ...
+    """
+
+    __slots__ = ("text", "segments", "slots")
+
+    def __init__(self, text: str):
+        self.text = text
+        parts = PLACEHOLDER_PATTERN.split(text)
+        self.segments: List[str] = parts[0::2]
+        self.slots: List[str] = parts[1::2]
+
+    def render(self, values: Dict[str, str]) -> str:
+        """填充占位符，values 中没有的占位符保留原样"""
+        if not self.slots:
+            return self.text
+        out = [self.segments[0]]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(name)
+            out.append(f"[{name}]" if value is None else value)
+            out.append(segment)
+        return "".join(out)
+
+
+@lru_cache(maxsize=256)
+def compile_template(text: str) -> PromptTemplate:
+    """编译模板，相同的模板文本只编译一次"""
+    return PromptTemplate(text)
+
+
+def setup_values(novel_setup: Dict[str, Any]) -> Dict[str, str]:
+    """根据小说设定计算各占位符的替换文本，设定中没有的部分不替换"""
+    values: Dict[str, Any] = {}
+
+    # 主角信息
+    protagonist = novel_setup.get("protagonist")
+    if protagonist:
+        if isinstance(protagonist, dict):
+            values.update({
+                "PROTAGONIST_NAME": protagonist.get("name", "主角"),
+                "PROTAGONIST_GENDER": protagonist.get("gender", "未指定"),
+                "PROTAGONIST_AGE": protagonist.get("age", "未指定"),
+                "PROTAGONIST_TRAITS": protagonist.get("traits", ""),
+                "PROTAGONIST_APPEARANCE": protagonist.get("appearance", ""),
+                "PROTAGONIST_BACKGROUND": protagonist.get("background", ""),
+            })
+        else:
+            # 非字典类型 - 直接替换名称，其他使用默认值
+            values.update({
+                "PROTAGONIST_NAME": protagonist,
+                "PROTAGONIST_GENDER": "未指定",
+                "PROTAGONIST_AGE": "未指定",
+                "PROTAGONIST_TRAITS": "",
+                "PROTAGONIST_APPEARANCE": "",
+                "PROTAGONIST_BACKGROUND": "",
+            })
+
+    # 世界观
+    world = novel_setup.get("world_building")
+    if world:
+        if isinstance(world, dict):
+            values.update({
+                "WORLD_SETTING": world.get("setting", ""),
+                "WORLD_RULES": world.get("rules", ""),
+                "WORLD_HISTORY": world.get("history", ""),
+                "WORLD_CULTURE": world.get("culture", ""),
+            })
+        else:
+            values.update({"WORLD_SETTING": world, "WORLD_RULES": "", "WORLD_HISTORY": "", "WORLD_CULTURE": ""})
+
+    # 故事结构
+    story = novel_setup.get("story_structure")
+    if story:
+        if isinstance(story, dict):
+            values.update({
+                "STORY_HOOK": story.get("hook", ""),
+                "STORY_PLOT": story.get("plot", ""),
+                "STORY_CONFLICT": story.get("conflict", ""),
+                "STORY_CLIMAX": story.get("climax", ""),
+                "STORY_TWIST": story.get("twist", ""),
+                "STORY_RESOLUTION": story.get("resolution", ""),
+            })
+        else:
+            values.update({"STORY_HOOK": "", "STORY_PLOT": story, "STORY_CONFLICT": "",
+                           "STORY_CLIMAX": "", "STORY_TWIST": "", "STORY_RESOLUTION": ""})
+
+    # 主题
+    themes = novel_setup.get("themes")
+    if themes:
+        if isinstance(themes, dict):
+            values.update({"THEMES_LIST": themes.get("list", ""), "THEMES_EXPLORATION": themes.get("exploration", "")})
+        else:
+            values.update({"THEMES_LIST": themes, "THEMES_EXPLORATION": ""})
+
+    return {name: format_value(value) for name, value in values.items()}
+
+
+def _setup_signature(novel_setup: Dict[str, Any]) -> str:
+    return json.dumps([novel_setup.get(field) for field in SETUP_FIELDS],
+                      ensure_ascii=False, sort_keys=True, default=str)
+
+
+def render_for_setup(template_text: str, novel_setup: Dict[str, Any]) -> str:
+    """用小说设定渲染模板，结果缓存在设定中，设定的相关字段变化时重新渲染"""
+    signature = _setup_signature(novel_setup)
+    cache = novel_setup.get(PROMPT_CACHE_KEY)
+    if not isinstance(cache, dict) or cache.get("signature") != signature:
+        cache = {"signature": signature, "values": setup_values(novel_setup), "prompts": {}}
+        novel_setup[PROMPT_CACHE_KEY] = cache
+
+    rendered = cache["prompts"].get(template_text)
+    if rendered is None:
+        rendered = compile_template(template_text).render(cache["values"])
+        cache["prompts"][template_text] = rendered
+    return rendered
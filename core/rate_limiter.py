@@ -0,0 +1,293 @@
+"""
+速率限制模块 - 为聊天接口和媒体接口提供集中式调度。
+
+- 令牌桶：按每分钟请求数（RPM）和每分钟token数（TPM）限流
+- AIMD 自适应并发：成功时加法增长并发上限，遇到 429/5xx 时乘法减小并进入冷却
+所有正文生成、摘要和媒体请求都通过同一个限制器排队，批量生成时可以稳定运行在
+服务商的真实限额附近，而不是在空闲和被限流之间来回摆动。
+
+状态由线程锁保护，既可以在异步协程中使用（acquire/release），也可以在同步的
+媒体请求中使用（acquire_sync/release），两者共享同一份额度。
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+
+logger = logging.getLogger("novel_generator")
+
+# 被视为"服务端拥塞"的状态码
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """令牌桶，容量为每分钟额度，按秒匀速补充"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """返回获得 amount 个令牌还需等待的秒数，0 表示可以立即获得"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """集中式速率限制器：RPM/TPM 令牌桶 + AIMD 自适应并发"""
+
+    def __init__(self,
+                 requests_per_minute: int = 0,
+                 tokens_per_minute: int = 0,
+                 max_concurrency: int = 3,
+                 min_concurrency: int = 1,
+                 decrease_factor: float = 0.5,
+                 base_cooldown: float = 2.0,
+                 max_cooldown: float = 60.0,
+                 poll_interval: float = 0.05):
+        """
+        Args:
+            requests_per_minute: 每分钟最大请求数，0 表示不限制
+            tokens_per_minute: 每分钟最大token数，0 表示不限制
+            max_concurrency: 并发上限的最大值
+            min_concurrency: 并发上限的最小值
+            decrease_factor: 遇到限流时并发上限的缩减比例
+            base_cooldown: 遇到限流时的基础冷却时间（秒），连续限流时指数增长
+            max_cooldown: 冷却时间上限（秒）
+            poll_interval: 等待额度时的轮询间隔（秒）
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.poll_interval = poll_interval
+
+        self.concurrency_limit = self.max_concurrency
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+        self._successes_since_increase = 0
+        self._consecutive_throttles = 0
+        self._throttled_at = 0.0  # 上一次降低并发、设置冷却的时间
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.total_requests = 0
+        self.total_throttled = 0
+
+    def _try_acquire(self, tokens: int) -> float:
+        """尝试占用一个请求名额，成功返回0，否则返回建议等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.cooldown_until:
+                return self.cooldown_until - now
+            if self.in_flight >= self.concurrency_limit:
+                return self.poll_interval
+
+            wait = 0.0
+            if self.request_bucket:
+                wait = max(wait, self.request_bucket.wait_time(1, now))
+            if self.token_bucket and tokens > 0:
+                wait = max(wait, self.token_bucket.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket and tokens > 0:
+                self.token_bucket.consume(tokens)
+            self.in_flight += 1
+            self.total_requests += 1
+            return 0.0
+
+    async def acquire(self, tokens: int = 0, should_stop=None) -> bool:
+        """异步等待一个请求名额
+
+        Args:
+            tokens: 本次请求预计消耗的token数
+            should_stop: 可选的无参函数，返回True时放弃等待
+
+        Returns:
+            bool: 是否成功获得名额
+        """
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if should_stop and should_stop():
+                return False
+            await asyncio.sleep(min(wait, 1.0))
+
+    def acquire_sync(self, tokens: int = 0, should_stop=None) -> bool:
+        """同步等待一个请求名额，供同步的媒体请求使用"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if should_stop and should_stop():
+                return False
+            time.sleep(min(wait, 1.0))
+
+    def release(self, status: Optional[int] = None, retry_after: Optional[float] = None,
+                reserved_tokens: int = 0, used_tokens: Optional[int] = None,
+                started: Optional[float] = None) -> None:
+        """释放请求名额，并根据结果调整并发上限
+
+        Args:
+            status: HTTP状态码，None 表示网络错误或超时
+            retry_after: 服务端返回的 Retry-After（秒）
+            reserved_tokens: 获取名额时预留的token数
+            used_tokens: 实际消耗的token数，已知时多退少补
+            started: 请求获得名额的时间（time.monotonic()）。在上一次限流之前就已发出的请求
+                失败时不再降低并发和延长冷却：一次故障让N个进行中的请求同时失败，只算一次限流
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if self.token_bucket and used_tokens is not None and reserved_tokens:
+                diff = reserved_tokens - used_tokens
+                if diff > 0:
+                    self.token_bucket.refund(diff)
+                else:
+                    self.token_bucket.consume(-diff)
+
+            if status is None or status in THROTTLE_STATUS:
+                self._on_throttle(retry_after, started)
+            elif 200 <= status < 300:
+                self._on_success()
+
+    def cancel(self, reserved_tokens: int = 0) -> None:
+        """请求被取消（例如停止生成）时释放名额，不计为限流，并退还预留的token"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if self.token_bucket and reserved_tokens:
+                self.token_bucket.refund(reserved_tokens)
+
+    def _on_success(self) -> None:
+        self._consecutive_throttles = 0
+        self._successes_since_increase += 1
+        # 加法增长：每成功完成"一轮"（当前并发上限个）请求，上限加一
+        if (self.concurrency_limit < self.max_concurrency and
+                self._successes_since_increase >= self.concurrency_limit):
+            self.concurrency_limit += 1
+            self._successes_since_increase = 0
+            logger.info(f"请求稳定，并发上限提高到 {self.concurrency_limit}")
+
+    def _on_throttle(self, retry_after: Optional[float], started: Optional[float] = None) -> None:
+        self.total_throttled += 1
+        now = time.monotonic()
+        if started is not None and started < self._throttled_at:
+            # 请求在本轮冷却开始前就已发出，属于同一次故障，只遵守服务端给出的 Retry-After
+            if retry_after is not None and retry_after > 0:
+                self.cooldown_until = max(self.cooldown_until, now + min(self.max_cooldown, retry_after))
+            return
+
+        self._throttled_at = now
+        self._consecutive_throttles += 1
+        self._successes_since_increase = 0
+
+        # 乘法减小
+        new_limit = max(self.min_concurrency, int(self.concurrency_limit * self.decrease_factor))
+        if new_limit != self.concurrency_limit:
+            logger.info(f"接口限流或出错，并发上限降低到 {new_limit}")
+        self.concurrency_limit = new_limit
+
+        # 全局冷却：优先使用服务端给出的 Retry-After，否则指数退避并加入抖动
+        if retry_after is not None and retry_after > 0:
+            cooldown = min(self.max_cooldown, retry_after)
+        else:
+            cooldown = min(self.max_cooldown,
+                           self.base_cooldown * (2 ** (self._consecutive_throttles - 1)))
+            cooldown *= random.uniform(0.8, 1.2)
+        self.cooldown_until = max(self.cooldown_until, now + cooldown)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0, should_stop=None):
+        """异步上下文管理器形式的请求名额
+
+        在块内通过 record() 记录请求结果；块内抛出异常或未记录结果时按网络错误处理。
+        块被取消（CancelledError）且未记录结果时只释放名额，不计为限流。
+        should_stop 返回True导致放弃等待时，acquired 为False，调用方应直接返回。
+        """
+        result = _SlotResult(tokens)
+        result.acquired = await self.acquire(tokens, should_stop)
+        if not result.acquired:
+            yield result
+            return
+        started = time.monotonic()
+        cancelled = False
+        try:
+            yield result
+        except asyncio.CancelledError:
+            cancelled = not result.recorded
+            raise
+        except Exception:
+            result.status = None
+            raise
+        finally:
+            if cancelled:
+                self.cancel(tokens)
+            else:
+                self.release(result.status, result.retry_after, tokens, result.used_tokens, started)
+
+    def stats(self) -> dict:
+        """返回当前限流状态"""
+        with self._lock:
+            return {
+                "concurrency_limit": self.concurrency_limit,
+                "in_flight": self.in_flight,
+                "cooldown": max(0.0, self.cooldown_until - time.monotonic()),
+                "total_requests": self.total_requests,
+                "total_throttled": self.total_throttled
+            }
+
+
+class _SlotResult:
+    """slot() 中用于记录请求结果的对象"""
+
+    def __init__(self, reserved_tokens: int):
+        self.reserved_tokens = reserved_tokens
+        self.acquired = False
+        self.recorded = False
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.used_tokens: Optional[int] = None
+
+    def record(self, status: Optional[int], retry_after: Optional[float] = None,
+               used_tokens: Optional[int] = None) -> None:
+        self.recorded = True
+        self.status = status
+        self.retry_after = retry_after
+        self.used_tokens = used_tokens
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（仅支持秒数形式）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
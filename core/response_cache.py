@@ -0,0 +1,166 @@
+"""
+响应缓存模块 - 按内容哈希缓存确定性的模型调用结果。
+
+ResponseCache 把响应保存在本地 SQLite 数据库中：
+- 键为 (模型, 提示词哈希, temperature, top_p, max_tokens) 的哈希；
+- 超过 TTL 的条目视为未命中并删除；
+- 条目数或总大小超过上限时，按最近访问时间淘汰（LRU）；
+- temperature 高于阈值的调用直接绕过缓存。
+
+缓存是可选的，只有创建 NovelGenerator 时传入 response_cache 才会启用。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("novel_generator")
+
+
+def make_cache_key(model: str, prompt: str, temperature: float, top_p: float, max_tokens: int) -> str:
+    """根据模型和采样参数计算缓存键"""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material = json.dumps([model, prompt_hash, round(float(temperature), 4), round(float(top_p), 4),
+                           int(max_tokens)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """基于 SQLite 的模型响应缓存，可在多个线程中共用"""
+
+    def __init__(self,
+                 path: str,
+                 max_entries: int = 10000,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 30 * 24 * 3600,
+                 max_temperature: float = 0.5):
+        """
+        Args:
+            path: 数据库文件路径
+            max_entries: 最多保留的条目数
+            max_bytes: 响应内容总大小上限（字节）
+            ttl: 条目有效期（秒），0 表示永不过期
+            max_temperature: temperature 高于该值的调用不读写缓存
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+        self._conn.commit()
+
+    def cacheable(self, temperature: float) -> bool:
+        """temperature 不超过阈值的调用才使用缓存"""
+        return temperature is not None and temperature <= self.max_temperature
+
+    def get(self, model: str, prompt: str, temperature: float, top_p: float, max_tokens: int) -> Optional[str]:
+        """查找缓存的响应，未命中、已过期或应绕过缓存时返回 None"""
+        if not self.cacheable(temperature):
+            self.bypassed += 1
+            return None
+
+        key = make_cache_key(model, prompt, temperature, top_p, max_tokens)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?",
+                                         (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                response, created = row
+                if self.ttl and now - created > self.ttl:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"读取响应缓存失败: {e}")
+                return None
+        self.hits += 1
+        return response
+
+    def put(self, model: str, prompt: str, temperature: float, top_p: float, max_tokens: int,
+            response: str) -> bool:
+        """保存响应，返回是否写入了缓存"""
+        if not response or not self.cacheable(temperature):
+            return False
+
+        key = make_cache_key(model, prompt, temperature, top_p, max_tokens)
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now)
+                )
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入响应缓存失败: {e}")
+                return False
+        return True
+
+    def _evict(self) -> None:
+        """删除过期条目，再按最近访问时间淘汰超出数量或大小上限的条目（调用方持有锁）"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        removed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            removed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits,
+                "misses": self.misses, "bypassed": self.bypassed}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -23,7 +23,6 @@ from templates.prompts import (
 )
 
 from core.generator import NovelGenerator
-from core.import import GENRE_PROMPTS
 
 class SanQianLiuGenerator:
     """三千流小说专用生成器类"""
@@ -306,8 +305,16 @@ class SanQianLiuGenerator:
             
         print(f"已保存章节 {start_chapter}-{current_chapter} 到 {filename}")
 
-def create_sanqianliu_generator(api_key: str, model: str = "gemini-2.5-pro-exp-03-25") -> SanQianLiuGenerator:
-    """创建一个三千流生成器实例"""
+def create_sanqianliu_generator(api_key: str, model: str = "gemini-2.5-pro-exp-03-25",
+                                response_cache=None) -> SanQianLiuGenerator:
+    """创建一个三千流生成器实例
+
+    Args:
+        api_key: API密钥
+        model: 使用的模型名称
+        response_cache: 可选的响应缓存（数据库路径或 ResponseCache 实例）。章节生成的 temperature
+            为0.75，需要传入 max_temperature 不低于该值的 ResponseCache 才会缓存章节内容
+    """
     # 创建基础生成器
     base_generator = NovelGenerator(
         api_key=api_key,
@@ -318,7 +325,8 @@ def create_sanqianliu_generator(api_key: str, model: str = "gemini-2.5-pro-exp-0
         temperature=0.7,
         top_p=0.9,
         max_tokens=8000,
-        context_length=20000
+        context_length=20000,
+        response_cache=response_cache
     )
     
     # 创建并返回三千流专用生成器
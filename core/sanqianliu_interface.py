@@ -21,16 +21,18 @@ from templates.prompts import (
 class SanQianLiuInterface:
     """三千流小说生成器接口类"""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.5-pro-exp-03-25"):
+    def __init__(self, api_key: str, model: str = "gemini-2.5-pro-exp-03-25", response_cache=None):
         """
         初始化三千流接口
         
         Args:
             api_key: API密钥
             model: 使用的模型名称
+            response_cache: 可选的响应缓存（数据库路径或 ResponseCache 实例）
         """
         self.api_key = api_key
         self.model = model
+        self.response_cache = response_cache
         self.generator = None
         self.output_dir = "output/sanqianliu"
         self._ensure_output_dir()
@@ -47,7 +49,7 @@ class SanQianLiuInterface:
             target_length: 目标字数
             explosion_interval: 爆点间隔章节数
         """
-        self.generator = create_sanqianliu_generator(self.api_key, self.model)
+        self.generator = create_sanqianliu_generator(self.api_key, self.model, self.response_cache)
         # 重新设置参数
         self.generator.target_length = target_length
         self.generator.explosion_interval = explosion_interval
@@ -388,6 +390,6 @@ class SanQianLiuInterface:
         return summary
 
 
-def get_interface(api_key: str, model: str = "gemini-2.5-pro-exp-03-25") -> SanQianLiuInterface:
+def get_interface(api_key: str, model: str = "gemini-2.5-pro-exp-03-25", response_cache=None) -> SanQianLiuInterface:
     """获取三千流接口实例"""
-    return SanQianLiuInterface(api_key, model) 
\ No newline at end of file
+    return SanQianLiuInterface(api_key, model, response_cache) 
\ No newline at end of file
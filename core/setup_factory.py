@@ -0,0 +1,219 @@
+"""
+小说设定生成模块 - 随机生成主角、世界观、故事结构和主题。
+
+名字库、性格、世界观等数据保存在 templates/setup_data.json 中，首次使用时加载一次并转换为
+只读结构（列表转为元组、字典转为只读映射）。
+
+生成函数接受一个随机数生成器（默认为 random 模块）；create_novel_setups 使用独立的
+random.Random(seed)，可复现地批量生成大量设定。
+"""
+
+import os
+import json
+import time
+import random
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from ..templates.prompts import GENRE_SPECIFIC_PROMPTS
+except ImportError:
+    from templates.prompts import GENRE_SPECIFIC_PROMPTS
+
+SETUP_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "templates", "setup_data.json")
+
+# 带有特殊世界观元素的小说类型
+MAGIC_GENRES = ("奇幻冒险", "玄幻修仙", "轻小说")
+CULTIVATION_GENRES = ("玄幻修仙", "仙侠武侠", "都市异能")
+TECHNOLOGY_GENRES = ("科幻未来", "末世危机")
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def load_setup_data(path: str = SETUP_DATA_PATH):
+    """加载设定数据（只加载一次），返回只读结构"""
+    with open(path, "r", encoding="utf-8") as f:
+        return _freeze(json.load(f))
+
+
+def _language_data(language: str):
+    # 与原先一致：非中文一律使用英文数据
+    return load_setup_data()["中文" if language == "中文" else "English"]
+
+
+def generate_protagonist(novel_type: str, language: str = "中文", rng=random) -> Dict[str, Any]:
+    """生成主角信息"""
+    data = _language_data(language)["protagonist"]
+    if language == "中文":
+        # 根据小说类型选择名字
+        names = data["names"].get(novel_type, data["default_names"])
+        name = rng.choice(names)
+
+        # 根据小说类型生成年龄
+        if novel_type == "青春校园":
+            age = rng.randint(16, 22)
+        elif novel_type == "职场商战":
+            age = rng.randint(25, 45)
+        elif novel_type == "历史军事":
+            age = rng.randint(20, 40)
+        elif novel_type == "玄幻修仙" or novel_type == "仙侠武侠":
+            age = rng.randint(16, 25)  # 修仙小说主角通常从年轻开始修炼
+        else:
+            age = rng.randint(18, 35)
+    else:
+        name = rng.choice(data["names"])
+        age = rng.randint(18, 35)
+
+    traits = rng.sample(data["traits"], rng.randint(2, 3))
+    strengths = rng.sample(data["strengths"], rng.randint(1, 2))
+    weaknesses = rng.sample(data["weaknesses"], rng.randint(1, 2))
+    background = rng.sample(data["backgrounds"], rng.randint(1, 2))
+    goal = rng.choice(data["goals"])
+    motivation = rng.choice(data["motivations"])
+
+    return {
+        "name": name,
+        "age": age,
+        "traits": traits,
+        "strengths": strengths,
+        "weaknesses": weaknesses,
+        "background": background,
+        "goal": goal,
+        "motivation": motivation
+    }
+
+
+def generate_world_building(novel_type: str, language: str = "中文", rng=random) -> Dict[str, Any]:
+    """生成世界观和背景设定"""
+    data = _language_data(language)["world"]
+    if language != "中文":
+        return {
+            "setting": rng.choice(data["settings"]),
+            "era": rng.choice(data["eras"]),
+            "technology_level": rng.choice(data["technology_levels"])
+        }
+
+    # 根据小说类型选择设定，没有对应类型时使用通用设定
+    world_building = {}
+    for field, key in (("setting", "settings"), ("era", "eras"),
+                       ("social_structure", "social_structures"), ("historical_event", "historical_events")):
+        world_building[field] = rng.choice(data[key].get(novel_type, data["default_" + key]))
+
+    # 根据小说类型添加特殊元素
+    if novel_type in MAGIC_GENRES:
+        world_building["magic_system"] = rng.choice(data["magic_systems"])
+        world_building["races"] = rng.sample(data["races"], rng.randint(2, 4))
+
+    if novel_type in CULTIVATION_GENRES:
+        world_building["cultivation_system"] = rng.choice(data["cultivation_systems"])
+
+    if novel_type in TECHNOLOGY_GENRES:
+        world_building["technology_level"] = rng.choice(data["tech_levels"])
+        world_building["technologies"] = rng.sample(data["tech_levels"], rng.randint(2, 4))
+
+    world_building["theme"] = rng.choice(data["themes"].get(novel_type, data["default_themes"]))
+    return world_building
+
+
+def generate_story_structure(novel_type: str, language: str = "中文") -> Dict[str, str]:
+    """生成故事结构（三幕结构，中文按小说类型选择）"""
+    data = _language_data(language)["story"]
+    structure = data.get("structures", {}).get(novel_type, data["default"])
+    return dict(structure)
+
+
+def generate_themes(novel_type: str, language: str = "中文", rng=random) -> List[str]:
+    """生成小说主题：1-2个通用主题加上该类型的特定主题"""
+    data = _language_data(language)["themes"]
+    specific = data["specific"]
+
+    # 添加1-2个通用主题
+    selected_themes = rng.sample(data["common"], rng.randint(1, 2))
+
+    if language == "中文":
+        # 添加2-3个特定主题（如果有）
+        if novel_type in specific:
+            selected_themes.extend(rng.sample(specific[novel_type], rng.randint(2, 3)))
+        limit = 5
+    else:
+        # 中文类型名映射到英文主题表
+        mapped_type = data["type_mapping"].get(novel_type)
+        if mapped_type in specific:
+            selected_themes.extend(rng.sample(specific[mapped_type], rng.randint(1, 2)))
+        elif novel_type in specific:
+            selected_themes.extend(rng.sample(specific[novel_type], rng.randint(1, 2)))
+        limit = 4
+
+    # 去除重复主题（保持顺序，使结果可复现）并控制数量
+    selected_themes = list(dict.fromkeys(selected_themes))
+    if len(selected_themes) > limit:
+        selected_themes = rng.sample(selected_themes, limit)
+    return selected_themes
+
+
+def build_novel_setup(index: int,
+                      novel_type: str,
+                      language: str = "中文",
+                      target_length: int = 0,
+                      custom_prompt: Optional[str] = None,
+                      rng=random,
+                      timestamp: Optional[int] = None) -> Dict[str, Any]:
+    """生成一本小说的完整设定"""
+    return {
+        "title": "",
+        "author": "",
+        "index": index,  # 批量生成时区分并发生成的各本小说
+        "genre": novel_type,
+        "language": language,
+        "word_count": 0,
+        "target_length": target_length,
+        "timestamp": int(time.time()) if timestamp is None else timestamp,
+        "custom_prompt": custom_prompt,
+        "protagonist": generate_protagonist(novel_type, language, rng),
+        "world_building": generate_world_building(novel_type, language, rng),
+        "story_structure": generate_story_structure(novel_type, language),
+        "themes": generate_themes(novel_type, language, rng),
+        "supporting_characters": []
+    }
+
+
+def create_novel_setups(n: int,
+                        seed: Optional[int] = None,
+                        novel_types: Optional[Sequence[str]] = None,
+                        language: str = "中文",
+                        target_length: int = 0,
+                        custom_prompt: Optional[str] = None,
+                        timestamp: Optional[int] = None) -> List[Dict[str, Any]]:
+    """批量生成 n 本小说的设定，相同的 seed 生成相同的结果
+
+    Args:
+        n: 设定数量
+        seed: 随机种子，None 时每次结果不同
+        novel_types: 小说类型列表，第 i 本使用 novel_types[i]，超出部分随机选择类型；
+                     为空时全部随机选择
+        language: 语言
+        target_length: 目标字数
+        custom_prompt: 自定义提示词
+        timestamp: 设定中的时间戳，默认为当前时间（需要逐字节复现结果时指定）
+    """
+    rng = random.Random(seed)
+    genres = tuple(GENRE_SPECIFIC_PROMPTS.keys())
+    novel_types = list(novel_types or [])
+    if timestamp is None:
+        timestamp = int(time.time())
+
+    setups = []
+    for index in range(n):
+        novel_type = novel_types[index] if index < len(novel_types) else rng.choice(genres)
+        setups.append(build_novel_setup(index, novel_type, language, target_length,
+                                        custom_prompt, rng, timestamp))
+    return setups
@@ -0,0 +1,166 @@
+"""
+流式输出模块 - 解析 SSE（server-sent events）流式响应，并把增量内容实时分发给
+进度回调、状态回调和磁盘缓冲文件。
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger("novel_generator")
+
+# SSE 流结束标记
+SSE_DONE = "[DONE]"
+
+
+def parse_sse_line(line: str) -> Optional[str]:
+    """解析一行 SSE 数据，返回其中的增量文本
+
+    Args:
+        line: 去掉换行符的一行原始数据
+
+    Returns:
+        Optional[str]: 增量文本；非数据行、空增量返回 None，流结束返回 SSE_DONE
+    """
+    line = line.strip()
+    if not line or line.startswith(":") or not line.startswith("data:"):
+        return None
+
+    data = line[len("data:"):].strip()
+    if data == SSE_DONE:
+        return SSE_DONE
+
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        logger.debug(f"无法解析的SSE数据: {data[:100]}")
+        return None
+
+    if not isinstance(chunk, dict):
+        return None
+
+    choices = chunk.get("choices") or []
+    if choices and isinstance(choices[0], dict):
+        choice = choices[0]
+        delta = choice.get("delta") or {}
+        if isinstance(delta, dict) and delta.get("content"):
+            return delta["content"]
+        # 兼容部分服务在流式模式下仍返回 text 字段
+        if choice.get("text"):
+            return choice["text"]
+    elif chunk.get("content"):
+        return chunk["content"]
+
+    return None
+
+
+class StreamSink:
+    """流式内容接收器
+
+    接收逐块到达的增量文本：
+    1. 段落一旦完整（遇到空行），立即用清理函数逐段处理，并追加到磁盘缓冲文件；
+    2. 按时间间隔节流地调用状态回调和进度回调，避免刷屏；
+    3. 中途停止时，可以通过 cleaned_text() 取回已接收的部分内容。
+    """
+
+    def __init__(self,
+                 clean_func: Optional[Callable[[str, bool], str]] = None,
+                 partial_path: Optional[str] = None,
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 on_status: Optional[Callable[[str], None]] = None,
+                 status_interval: float = 2.0):
+        """
+        Args:
+            clean_func: 段落清理函数，参数为 (段落文本, 是否为第一段)
+            partial_path: 磁盘缓冲文件路径，为 None 时不写盘
+            on_progress: 进度回调，参数为已接收的字符数
+            on_status: 状态回调，参数为状态消息
+            status_interval: 回调的最小间隔（秒）
+        """
+        self.clean_func = clean_func
+        self.partial_path = partial_path
+        self.on_progress = on_progress
+        self.on_status = on_status
+        self.status_interval = status_interval
+        self.reset()
+
+    def reset(self) -> None:
+        """清空已接收内容，用于同一次调用内的重试"""
+        self._raw_parts: List[str] = []
+        self._pending = ""
+        self._cleaned_paragraphs: List[str] = []
+        self._paragraph_count = 0
+        self.received_chars = 0
+        self._last_notify = 0.0
+        self._remove_partial_file()
+
+    @property
+    def raw_text(self) -> str:
+        """已接收的原始文本"""
+        return "".join(self._raw_parts)
+
+    def feed(self, delta: str) -> None:
+        """接收一段增量文本"""
+        if not delta:
+            return
+
+        self._raw_parts.append(delta)
+        self.received_chars += len(delta)
+        self._pending += delta
+
+        # 提取已经完整的段落，提前清理
+        if "\n\n" in self._pending:
+            finished, self._pending = self._pending.rsplit("\n\n", 1)
+            for paragraph in finished.split("\n\n"):
+                self._accept_paragraph(paragraph)
+                self._paragraph_count += 1
+
+        now = time.time()
+        if now - self._last_notify >= self.status_interval:
+            self._last_notify = now
+            if self.on_status:
+                self.on_status(f"流式接收中，已接收 {self.received_chars} 字符...")
+            if self.on_progress:
+                self.on_progress(self.received_chars)
+
+    def cleaned_text(self) -> str:
+        """返回已清理的完整内容（已完成段落 + 清理后的剩余部分）"""
+        paragraphs = list(self._cleaned_paragraphs)
+        tail = self._clean(self._pending, self._paragraph_count == 0)
+        if tail:
+            paragraphs.append(tail)
+        return "\n\n".join(paragraphs)
+
+    def close(self) -> None:
+        """内容已正式合并到小说中，删除磁盘缓冲文件"""
+        self._remove_partial_file()
+
+    def _accept_paragraph(self, paragraph: str) -> None:
+        cleaned = self._clean(paragraph, self._paragraph_count == 0)
+        if not cleaned:
+            return
+        self._cleaned_paragraphs.append(cleaned)
+
+        if self.partial_path:
+            try:
+                os.makedirs(os.path.dirname(self.partial_path) or ".", exist_ok=True)
+                with open(self.partial_path, "a", encoding="utf-8") as f:
+                    f.write(cleaned + "\n\n")
+            except OSError as e:
+                logger.warning(f"写入流式缓冲文件失败: {e}")
+
+    def _clean(self, text: str, is_first: bool) -> str:
+        if not text.strip():
+            return ""
+        if self.clean_func:
+            return self.clean_func(text, is_first).strip()
+        return text.strip()
+
+    def _remove_partial_file(self) -> None:
+        if self.partial_path and os.path.exists(self.partial_path):
+            try:
+                os.remove(self.partial_path)
+            except OSError as e:
+                logger.warning(f"删除流式缓冲文件失败: {e}")
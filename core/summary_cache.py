@@ -0,0 +1,212 @@
+"""
+摘要缓存模块 - 按正文偏移分段的增量摘要树。
+
+SummaryTree 把正文按固定长度切成叶子段：
+- 每个叶子的摘要以 (层级, 序号, 偏移范围, 内容哈希) 为键缓存；
+- 上层节点合并至多 fanout 个子节点的摘要，其哈希由子节点哈希计算得到；
+- 新增正文时只有新叶子（以及被修改的末尾叶子）和它们的祖先节点需要重新摘要。
+
+缓存以 JSON Lines 形式保存在小说文件旁（<小说名>_summary_tree.jsonl），每条记录一个节点，
+同一节点以最后一条为准；过期记录超过有效记录时整体重写。
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("novel_generator")
+
+# 摘要请求：("leaf", 正文片段) 或 ("merge", 子节点摘要列表)
+SummaryRequest = Tuple[str, object]
+SummarizeFunc = Callable[[List[SummaryRequest]], Awaitable[List[Optional[str]]]]
+
+
+def _hash(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+class SummaryTree:
+    """增量摘要树
+
+    - plan(): 计算当前正文对应的树结构
+    - update(): 只为缓存未命中的节点请求摘要，返回根节点摘要
+    """
+
+    def __init__(self, path: Optional[str] = None, leaf_size: int = 20000, fanout: int = 4):
+        """
+        Args:
+            path: 缓存文件路径，为 None 时只保存在内存中
+            leaf_size: 叶子段的字符数
+            fanout: 每个上层节点合并的子节点数
+        """
+        if leaf_size <= 0 or fanout < 2:
+            raise ValueError("leaf_size 必须为正数，fanout 至少为2")
+        self.path = path
+        self.leaf_size = leaf_size
+        self.fanout = fanout
+
+        # (层级, 序号) -> 节点记录
+        self.nodes: Dict[Tuple[int, int], Dict[str, object]] = {}
+        self.requests_made = 0
+        self._stale_entries = 0
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    # ---------- 树结构 ----------
+
+    def plan(self, text: str) -> List[List[Dict[str, object]]]:
+        """按当前正文计算各层节点（不含摘要），第0层为叶子"""
+        leaves = []
+        for index, start in enumerate(range(0, len(text), self.leaf_size)):
+            segment = text[start:start + self.leaf_size]
+            leaves.append({"level": 0, "index": index, "start": start,
+                           "end": start + len(segment), "hash": _hash(segment)})
+
+        levels = [leaves]
+        while len(levels[-1]) > 1:
+            children = levels[-1]
+            parents = []
+            for index, first in enumerate(range(0, len(children), self.fanout)):
+                group = children[first:first + self.fanout]
+                parents.append({"level": len(levels), "index": index,
+                                "start": group[0]["start"], "end": group[-1]["end"],
+                                "hash": _hash("|".join(child["hash"] for child in group)),
+                                "children": len(group)})
+            levels.append(parents)
+        return levels
+
+    def cached(self, node: Dict[str, object]) -> Optional[str]:
+        """返回与节点内容一致的缓存摘要"""
+        entry = self.nodes.get((node["level"], node["index"]))
+        if entry and entry["hash"] == node["hash"] and entry["start"] == node["start"] \
+                and entry["end"] == node["end"]:
+            return entry["summary"]
+        return None
+
+    async def update(self, text: str, summarize: SummarizeFunc) -> Optional[str]:
+        """更新摘要树，返回覆盖全文的根节点摘要
+
+        Args:
+            text: 当前全文
+            summarize: 批量摘要函数，输入同一层缺失节点的请求列表，按顺序返回摘要（失败为 None）
+
+        Returns:
+            Optional[str]: 根节点摘要；有节点摘要失败时返回 None，已成功的节点仍会被缓存
+        """
+        if not text:
+            return None
+
+        levels = self.plan(text)
+        summaries: List[Optional[str]] = []
+        for level_nodes in levels:
+            child_summaries = summaries
+            summaries = []
+            missing = []
+            requests: List[SummaryRequest] = []
+            for node in level_nodes:
+                summary = self.cached(node)
+                if summary is None and node["level"] > 0:
+                    first = node["index"] * self.fanout
+                    parts = child_summaries[first:first + node["children"]]
+                    if any(part is None for part in parts):
+                        # 子节点摘要失败，本轮无法合并
+                        summaries.append(None)
+                        continue
+                    if len(parts) == 1:
+                        # 只有一个子节点时直接沿用其摘要
+                        summary = parts[0]
+                        self._store(node, summary)
+                    else:
+                        requests.append(("merge", parts))
+                        missing.append(len(summaries))
+                elif summary is None:
+                    requests.append(("leaf", text[node["start"]:node["end"]]))
+                    missing.append(len(summaries))
+                summaries.append(summary)
+
+            if requests:
+                self.requests_made += len(requests)
+                results = await summarize(requests)
+                for position, result in zip(missing, results):
+                    if result:
+                        summaries[position] = result
+                        self._store(level_nodes[position], result)
+
+        self._drop_stale(levels)
+        return summaries[0] if summaries else None
+
+    # ---------- 持久化 ----------
+
+    def _store(self, node: Dict[str, object], summary: str) -> None:
+        entry = {key: node[key] for key in ("level", "index", "start", "end", "hash")}
+        entry["summary"] = summary
+        if (node["level"], node["index"]) in self.nodes:
+            self._stale_entries += 1
+        self.nodes[(node["level"], node["index"])] = entry
+        self._append(entry)
+
+    def _drop_stale(self, levels: List[List[Dict[str, object]]]) -> None:
+        """删除超出当前树结构的节点（例如正文被截短），过期记录过多时重写缓存文件"""
+        valid = {(node["level"], node["index"]) for level_nodes in levels for node in level_nodes}
+        for key in [key for key in self.nodes if key not in valid]:
+            del self.nodes[key]
+            self._stale_entries += 1
+        if self._stale_entries > len(self.nodes):
+            self.rewrite()
+
+    def _append(self, entry: Dict[str, object]) -> None:
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"写入摘要缓存失败: {e}")
+
+    def rewrite(self) -> None:
+        """只保留有效节点，原子地重写缓存文件"""
+        self._stale_entries = 0
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key in sorted(self.nodes):
+                    f.write(json.dumps(self.nodes[key], ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"重写摘要缓存失败: {e}")
+
+    def load(self) -> bool:
+        """从缓存文件加载，返回是否加载到已有节点"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+
+        entries = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        key = (int(entry["level"]), int(entry["index"]))
+                        if not isinstance(entry["summary"], str) or not entry["hash"]:
+                            continue
+                    except (ValueError, KeyError, TypeError):
+                        # 跳过写入中断造成的损坏行
+                        continue
+                    self.nodes[key] = entry
+                    entries += 1
+        except OSError as e:
+            logger.warning(f"读取摘要缓存失败: {e}")
+            return False
+
+        self._stale_entries = entries - len(self.nodes)
+        return len(self.nodes) > 0
@@ -0,0 +1,147 @@
+"""
+文本缓冲区模块 - 以分块列表保存小说正文。
+
+- 追加为 O(1)，len() 直接返回缓存的长度；
+- 切片和 tail() 只拼接涉及到的块，str() 拼接全文但不修改缓冲区；
+- 支持末尾截断和替换，用于长文本清理；
+- changed_from 记录自上次 mark() 以来被改动的最小位置，保存时只需写出该位置之后的内容。
+"""
+
+from bisect import bisect_right
+from typing import List, Union
+
+
+class TextBuffer:
+    """分块文本缓冲区"""
+
+    def __init__(self, text: Union[str, "TextBuffer"] = ""):
+        self._chunks: List[str] = []
+        self._starts: List[int] = []  # 每个块在全文中的起始位置
+        self._length = 0
+        self._changed_from = 0  # 自上次 mark() 以来被改动（截断或追加）的最小位置
+        if text:
+            self.append(str(text))
+
+    # ---------- 基本协议 ----------
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __str__(self) -> str:
+        # 只读：不合并块，其他线程持有的切片位置和并发的追加都不受影响
+        return "".join(self._chunks)
+
+    def __repr__(self) -> str:
+        return f"TextBuffer(length={self._length}, chunks={len(self._chunks)})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (str, TextBuffer)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __contains__(self, item: str) -> bool:
+        return item in str(self)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key < 0:
+                key += self._length
+            if not 0 <= key < self._length:
+                raise IndexError("TextBuffer index out of range")
+            i = bisect_right(self._starts, key) - 1
+            return self._chunks[i][key - self._starts[i]]
+
+        if not isinstance(key, slice):
+            raise TypeError("TextBuffer indices must be integers or slices")
+
+        start, stop, step = key.indices(self._length)
+        if step != 1:
+            return str(self)[key]
+        if start >= stop:
+            return ""
+
+        first = bisect_right(self._starts, start) - 1
+        last = bisect_right(self._starts, stop - 1) - 1
+        if first == last:
+            offset = self._starts[first]
+            return self._chunks[first][start - offset:stop - offset]
+
+        parts = [self._chunks[first][start - self._starts[first]:]]
+        parts.extend(self._chunks[first + 1:last])
+        parts.append(self._chunks[last][:stop - self._starts[last]])
+        return "".join(parts)
+
+    # ---------- 修改 ----------
+
+    def append(self, text: str) -> "TextBuffer":
+        """在末尾追加文本"""
+        if text:
+            self._starts.append(self._length)
+            self._chunks.append(text)
+            self._length += len(text)
+        return self
+
+    def __iadd__(self, text: str) -> "TextBuffer":
+        return self.append(str(text))
+
+    def truncate(self, length: int) -> "TextBuffer":
+        """截断到指定长度"""
+        length = max(0, length)
+        while self._chunks and self._starts[-1] >= length:
+            self._chunks.pop()
+            self._starts.pop()
+        if self._chunks and self._starts[-1] + len(self._chunks[-1]) > length:
+            self._chunks[-1] = self._chunks[-1][:length - self._starts[-1]]
+        self._length = min(self._length, length)
+        self._changed_from = min(self._changed_from, self._length)
+        return self
+
+    def replace_tail(self, count: int, text: str) -> "TextBuffer":
+        """用新文本替换末尾 count 个字符"""
+        self.truncate(self._length - count)
+        return self.append(text)
+
+    def rstrip(self) -> "TextBuffer":
+        """就地去除末尾空白"""
+        while self._chunks:
+            stripped = self._chunks[-1].rstrip()
+            if stripped:
+                self._length -= len(self._chunks[-1]) - len(stripped)
+                self._chunks[-1] = stripped
+                break
+            self._length -= len(self._chunks[-1])
+            self._chunks.pop()
+            self._starts.pop()
+        self._changed_from = min(self._changed_from, self._length)
+        return self
+
+    # ---------- 保存标记 ----------
+
+    @property
+    def changed_from(self) -> int:
+        """自上次 mark() 以来被改动的最小位置，此前的内容与上次保存时相同"""
+        return self._changed_from
+
+    def mark(self) -> None:
+        """标记当前内容已保存"""
+        self._changed_from = self._length
+
+    def mark_changed(self, position: int = 0) -> None:
+        """标记 position 之后的内容需要重新保存（例如保存失败时）"""
+        self._changed_from = max(0, min(self._changed_from, position))
+
+    # ---------- 查询 ----------
+
+    def tail(self, count: int) -> str:
+        """返回末尾 count 个字符"""
+        if count <= 0:
+            return ""
+        return self[-count:]
+
+    def endswith(self, suffix: str) -> bool:
+        return self.tail(len(suffix)).endswith(suffix) if suffix else True
@@ -0,0 +1,296 @@
+"""
+文本后处理模块 - 内容清理、标点修复、长文本去重和相似度检查。
+
+这些函数不依赖生成器状态，可以被 PostProcessor 提交到进程池中执行。
+PostProcessor 的进程池大小可配置；设为0、进程池无法创建或已损坏时，在当前进程中同步执行。
+"""
+
+import re
+import asyncio
+import logging
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pickle import PicklingError
+from typing import Optional
+
+try:
+    from .text_similarity import similarity as text_similarity
+    from .fingerprint_index import FingerprintIndex
+except ImportError:
+    from core.text_similarity import similarity as text_similarity
+    from core.fingerprint_index import FingerprintIndex
+
+logger = logging.getLogger("novel_generator")
+
+# 超过该字数的小说在清理新内容时额外进行重复段落检测
+LONG_TEXT_THRESHOLD = 250000
+
+# 模型回复中常见的前导文本
+LEADING_PREFIXES = ["以下是继续的内容", "以下是故事的继续", "故事继续", "接下来是续写内容", "下面继续创作", "接着写"]
+
+# 标记行：该行及其后的一个空行会被跳过
+MARKERS = ["注意:", "note:", "说明:", "explanation:", "```", "提示:", "继续写作:"]
+
+# 标点修复规则，按顺序应用（fix_punctuation_sequential 的参考实现）
+PUNCTUATION_RULES = [(re.compile(pattern), replacement) for pattern, replacement in [
+    # 减少连续的句号、感叹号、问号（保留最多3个）
+    (r'。{4,}', '。。。'),
+    (r'！{4,}', '！！！'),
+    (r'？{4,}', '？？？'),
+    (r'\.{4,}', '...'),
+    (r'!{4,}', '!!!'),
+    (r'\?{4,}', '???'),
+    # 减少连续的省略号（保留一个）
+    (r'。。。。。+', '。。。'),
+    (r'\.\.\.\.\.+', '...'),
+    # 处理常见的错误标点组合
+    (r'。，', '。'),
+    (r'，。', '。'),
+    (r'！。', '！'),
+    (r'。！', '！'),
+    (r'？。', '？'),
+    (r'。？', '？'),
+    # 中英文引号修正
+    (r'"+', '"'),
+]]
+
+# 单遍标点修复：一个交替正则找出所有可能被上述规则改写的片段
+# - 连续的中文标点（。，！？）：规则的匹配和替换结果都只含这四个字符，不会跨越其他字符，
+#   因此按顺序对这一片段单独应用全部规则，结果与对整行应用相同；片段很短且重复出现，结果带缓存
+# - 连续4个以上的英文句点、感叹号、问号：保留3个
+# - 连续的英文双引号：保留1个
+PUNCTUATION_PATTERN = re.compile(r'[。，！？]{2,}|\.{4,}|!{4,}|\?{4,}|"{2,}')
+
+
+def simplify(text: str) -> str:
+    """仅保留字母和数字，用于重复检测"""
+    return ''.join(c for c in text if c.isalnum())
+
+
+def fix_punctuation_sequential(text: str) -> str:
+    """逐条应用 PUNCTUATION_RULES 的参考实现，用于校验 fix_punctuation"""
+    for pattern, replacement in PUNCTUATION_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+@lru_cache(maxsize=1024)
+def _fix_punctuation_run(run: str) -> str:
+    return fix_punctuation_sequential(run)
+
+
+def _replace_punctuation(match) -> str:
+    run = match.group()
+    first = run[0]
+    if first == '"':
+        return '"'
+    if first in '.!?':
+        return first * 3
+    return _fix_punctuation_run(run)
+
+
+def fix_punctuation(text: str) -> str:
+    """修复文本中的标点符号问题
+
+    1. 减少连续的标点符号
+    2. 修正中英文标点混用问题
+
+    只扫描一遍文本，结果与 fix_punctuation_sequential 相同。
+    """
+    return PUNCTUATION_PATTERN.sub(_replace_punctuation, text)
+
+
+def clean_lines(content: str, strip_prefix: bool = True) -> str:
+    """逐行清理内容：去除前导文本和标记行、控制空行、修复标点"""
+    # 移除可能的标记和前导文本
+    if strip_prefix:
+        if content.startswith("继续创作") or content.startswith("继续"):
+            content = content.split(":", 1)[-1].strip()
+
+        if content.startswith("："):
+            content = content[1:].strip()
+
+        for prefix in LEADING_PREFIXES:
+            if content.lower().startswith(prefix.lower()):
+                content = content[len(prefix):].strip()
+
+    # 按行分割，保留行尾换行符
+    lines = content.splitlines(keepends=True)
+    cleaned_lines = []
+    skip_mode = False  # 用于处理标记行及其后的空行
+    consecutive_empty_lines = 0  # 连续空行计数
+
+    for line in lines:
+        line_stripped = line.strip()
+
+        # 处理标记行开始
+        if any(marker in line_stripped.lower() for marker in MARKERS):
+            skip_mode = True
+            continue
+
+        # 如果在 skip_mode 且当前行是空行，则继续跳过，并退出 skip_mode
+        if skip_mode and not line_stripped:
+            skip_mode = False
+            continue
+
+        if skip_mode:
+            continue
+
+        if not line_stripped:
+            consecutive_empty_lines += 1
+            # 限制连续空行数量，最多保留1个空行用于段落分隔
+            if consecutive_empty_lines <= 1:
+                cleaned_lines.append(line)
+            continue
+
+        consecutive_empty_lines = 0
+        line_content = line.rstrip('\r\n')
+        original_ending = line[len(line_content):]
+        if line_stripped.startswith('#'):
+            # 标题行：去除 '#' 标记
+            line = line_stripped.lstrip('#').strip() + original_ending
+        else:
+            line = fix_punctuation(line_content) + original_ending
+        cleaned_lines.append(line)
+
+    return "".join(cleaned_lines)
+
+
+def fix_long_text_issues(new_content: str, similarity_threshold: float = 0.8) -> str:
+    """处理长文本特有的问题
+
+    1. 检测并移除与已有内容高度重复的段落
+    2. 减少重复的词句和表达
+    """
+    paragraphs = new_content.split('\n\n')
+    if len(paragraphs) <= 1:
+        paragraphs = new_content.split('\n')
+
+    # 过滤掉非常短的段落
+    filtered_paragraphs = [p for p in paragraphs if len(p.strip()) > 5]
+
+    final_paragraphs = []
+    added_paragraphs = set()  # 用于跟踪已添加的段落内容
+    seen_fingerprints = FingerprintIndex()  # 已保留段落的指纹，覆盖整个检查范围而不只是前5段
+
+    for p in filtered_paragraphs:
+        is_duplicate = False
+        p_simplified = simplify(p)
+
+        # 跳过几乎为空的段落
+        if len(p_simplified) < 5:
+            continue
+
+        # 检查是否与前几个段落高度重复
+        for existing_p in final_paragraphs[-5:]:
+            existing_simplified = simplify(existing_p)
+            if len(existing_simplified) < 5:
+                continue
+
+            if len(existing_simplified) > len(p_simplified):
+                if p_simplified in existing_simplified:
+                    is_duplicate = True
+                    break
+            elif existing_simplified in p_simplified:
+                is_duplicate = True
+                break
+
+            if text_similarity(p_simplified, existing_simplified) > similarity_threshold:
+                is_duplicate = True
+                break
+
+        # 检查是否与已保留的段落完全相同或近似重复
+        p_hash = hash(p_simplified)
+        if p_hash in added_paragraphs:
+            is_duplicate = True
+        elif not is_duplicate and seen_fingerprints.find_duplicate(p) is not None:
+            is_duplicate = True
+
+        if not is_duplicate:
+            final_paragraphs.append(p)
+            added_paragraphs.add(p_hash)
+            seen_fingerprints.add_paragraph(p)
+
+    return '\n\n'.join(final_paragraphs)
+
+
+def finish_clean(cleaned_content: str, novel_length: int = 0) -> str:
+    """对逐行清理后的内容做整体处理：长文本去重和首尾空白"""
+    if novel_length > LONG_TEXT_THRESHOLD:
+        cleaned_content = fix_long_text_issues(cleaned_content)
+    # 去除整个文本块首尾的空白，但保留内部的段落空行
+    return cleaned_content.strip()
+
+
+def clean_content(content: str, novel_length: int = 0) -> str:
+    """清理生成的内容，处理重复内容、标点符号过多等问题，优化空行处理
+
+    novel_length 为小说当前长度，超过25万字时会进行更严格的重复段落清理。
+    """
+    return finish_clean(clean_lines(content), novel_length)
+
+
+def tail_similarity(content: str, tail: str) -> float:
+    """新内容与小说尾部（均去除标点和空白后）的相似度"""
+    return text_similarity(simplify(content), simplify(tail))
+
+
+class PostProcessor:
+    """在进程池中运行文本后处理函数
+
+    - workers > 0: 使用指定大小的进程池（首次使用时创建）
+    - workers == 0: 在当前进程中同步执行
+    进程池无法创建或损坏时自动回退为同步执行。
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = max(0, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def synchronous(self) -> bool:
+        return self.workers == 0
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.synchronous:
+            return None
+        if self._pool is None:
+            try:
+                # 使用 spawn 启动子进程，避免在有其他线程运行时 fork
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError, NotImplementedError) as e:
+                logger.warning(f"创建文本处理进程池失败，改为同步处理: {e}")
+                self.workers = 0
+        return self._pool
+
+    async def run(self, func, *args):
+        """执行后处理函数并返回结果，func 必须是可被子进程导入的模块级函数"""
+        pool = self._get_pool()
+        if pool is None:
+            return func(*args)
+        try:
+            # 提交时才会启动子进程，例如在守护进程中会因不能创建子进程而失败
+            future = pool.submit(func, *args)
+        except (BrokenProcessPool, PicklingError, OSError, RuntimeError, AssertionError) as e:
+            return self._fallback(e, func, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            # 子进程意外退出；func 自身抛出的异常直接传给调用方，不影响进程池
+            return self._fallback(e, func, *args)
+
+    def _fallback(self, error, func, *args):
+        """进程池不可用：关闭进程池，之后都在当前进程中同步执行"""
+        logger.warning(f"文本处理进程池不可用，改为同步处理: {error}")
+        self.shutdown()
+        self.workers = 0
+        return func(*args)
+
+    def shutdown(self) -> None:
+        """关闭进程池，之后再次使用时重新创建"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
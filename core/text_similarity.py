@@ -0,0 +1,98 @@
+"""
+文本相似度模块 - 基于后缀自动机的最长公共子串计算。
+
+相似度为 最长公共子串长度 / 较短文本长度，取值 0~1，任一文本为空时为 0。
+后缀自动机在较短文本上构建（O(n)），再用较长文本在自动机上匹配（O(m)）。
+"""
+
+from typing import Dict, List
+
+
+def longest_common_substring(text1: str, text2: str) -> int:
+    """返回两段文本最长公共子串的长度"""
+    if not text1 or not text2:
+        return 0
+
+    # 在较短的文本上构建自动机，状态数更少
+    if len(text1) > len(text2):
+        text1, text2 = text2, text1
+
+    transitions: List[Dict[str, int]] = [{}]
+    link = [-1]
+    length = [0]
+    last = 0
+
+    for ch in text1:
+        cur = len(length)
+        transitions.append({})
+        length.append(length[last] + 1)
+        link.append(0)
+
+        p = last
+        while p != -1 and ch not in transitions[p]:
+            transitions[p][ch] = cur
+            p = link[p]
+
+        if p != -1:
+            q = transitions[p][ch]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                clone = len(length)
+                transitions.append(dict(transitions[q]))
+                length.append(length[p] + 1)
+                link.append(link[q])
+                while p != -1 and transitions[p].get(ch) == q:
+                    transitions[p][ch] = clone
+                    p = link[p]
+                link[q] = clone
+                link[cur] = clone
+        last = cur
+
+    # 用较长的文本在自动机上匹配
+    limit = len(text1)
+    state = 0
+    current = 0
+    best = 0
+    for ch in text2:
+        while state and ch not in transitions[state]:
+            state = link[state]
+            current = length[state]
+        if ch in transitions[state]:
+            state = transitions[state][ch]
+            current += 1
+            if current > best:
+                best = current
+                if best == limit:
+                    break
+        else:
+            state = 0
+            current = 0
+
+    return best
+
+
+def similarity(text1: str, text2: str) -> float:
+    """计算两段文本的相似度：最长公共子串长度占较短文本的比例"""
+    if not text1 or not text2:
+        return 0
+    return longest_common_substring(text1, text2) / min(len(text1), len(text2))
+
+
+def similarity_dp(text1: str, text2: str) -> float:
+    """原先基于二维动态规划表的实现，仅用于校验和基准测试"""
+    if not text1 or not text2:
+        return 0
+
+    m = len(text1)
+    n = len(text2)
+    dp = [[0] * (n + 1) for _ in range(m + 1)]
+
+    max_len = 0
+    for i in range(1, m + 1):
+        for j in range(1, n + 1):
+            if text1[i - 1] == text2[j - 1]:
+                dp[i][j] = dp[i - 1][j - 1] + 1
+                max_len = max(max_len, dp[i][j])
+
+    return max_len / min(m, n)
@@ -0,0 +1,181 @@
+"""
+token预算模块 - 按模型系列估算token数，并在上下文窗口内组装提示词。
+
+TokenEstimator 用UTF-8编码长度区分宽字符（汉字、全角标点等）和ASCII字符，
+再按模型系列的校准系数换算为token数；估算值可加，便于按块累加。
+ContextAssembler 计算扣除 max_tokens 和安全余量后的提示词预算，缓存模板、摘要等
+不可变文本的token数，并从正文末尾截取恰好放得下的上下文。
+"""
+
+import re
+import math
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+# 模型系列校准参数：(模型名前缀, 每个宽字符的token数, 每个token对应的ASCII字符数, 上下文窗口token数)
+# 数值依据各家公开的分词器说明粗略校准，按前缀顺序匹配，越具体的前缀越靠前
+MODEL_FAMILIES = [
+    ("gpt-4.1", 0.75, 4.2, 1047576),
+    ("gpt-4.5", 0.75, 4.2, 128000),
+    ("chatgpt-4o", 0.75, 4.2, 128000),
+    ("gpt-4o", 0.75, 4.2, 128000),
+    ("o1", 0.75, 4.2, 200000),
+    ("o3", 0.75, 4.2, 200000),
+    ("o4", 0.75, 4.2, 200000),
+    ("claude", 1.2, 3.5, 200000),
+    ("gemini-1.5-pro", 0.8, 4.0, 2000000),
+    ("gemini", 0.8, 4.0, 1000000),
+    ("deepseek", 0.6, 3.3, 64000),
+    ("qwen-plus", 0.65, 4.0, 128000),
+    ("qwen", 0.65, 4.0, 32000),
+    ("qwq", 0.65, 4.0, 32000),
+    ("moonshot", 0.6, 4.0, 8000),
+    ("glm", 0.65, 4.0, 8000),
+    ("ernie", 0.75, 4.0, 8000),
+    ("doubao", 0.6, 4.0, 32000),
+    ("grok", 1.0, 4.0, 131072),
+    ("phi", 1.3, 4.0, 16000),
+]
+
+# 未知模型使用的参数
+DEFAULT_FAMILY = ("default", 1.0, 4.0, 128000)
+
+# 模型名中的窗口大小，例如 moonshot-v1-128k、ERNIE-4.0-8K
+WINDOW_PATTERN = re.compile(r"(\d+)k\b", re.IGNORECASE)
+
+# 预留给消息格式、系统开销和估算误差的余量
+SAFETY_RATIO = 0.05
+SAFETY_TOKENS = 256
+
+# 截取正文末尾时的分块大小（字符）
+TAIL_BLOCK = 2048
+
+
+def model_family(model: str) -> Tuple[str, float, float, int]:
+    """返回模型所属系列的校准参数，模型名中带有窗口大小时以其为准"""
+    name = (model or "").lower()
+    family = next((f for f in MODEL_FAMILIES if name.startswith(f[0])), DEFAULT_FAMILY)
+    match = WINDOW_PATTERN.search(name)
+    if match:
+        family = family[:3] + (int(match.group(1)) * 1000,)
+    return family
+
+
+class TokenEstimator:
+    """按模型系列校准的本地token估算器"""
+
+    def __init__(self, model: str = ""):
+        self.family, self.wide_ratio, self.ascii_per_token, self.context_window = model_family(model)
+
+    def weight(self, text: str) -> float:
+        """未取整的token估算值，对文本拼接可加"""
+        if not text:
+            return 0.0
+        length = len(text)
+        # ASCII字符占1字节，其余字符按多数为3字节的汉字和全角标点估算（不取整，保证可加）
+        wide = min(length, (len(text.encode("utf-8")) - length) / 2)
+        return wide * self.wide_ratio + (length - wide) / self.ascii_per_token
+
+    def count(self, text: str) -> int:
+        """估算文本的token数"""
+        return math.ceil(self.weight(text))
+
+
+class ContextAssembler:
+    """在模型上下文窗口内组装提示词
+
+    用法:
+        assembler = ContextAssembler("deepseek-chat")
+        budget = assembler.prompt_budget(max_tokens=4000)
+        tail = assembler.fit_tail(text, budget - assembler.count_all(fixed_parts), max_chars=75000)
+    """
+
+    def __init__(self, model: str = "", context_window: Optional[int] = None, cache_size: int = 256):
+        """
+        Args:
+            model: 模型名称，用于选择校准参数和默认上下文窗口
+            context_window: 上下文窗口token数，默认按模型系列确定
+            cache_size: 缓存token数的不可变文本条数
+        """
+        self.model = model
+        self.estimator = TokenEstimator(model)
+        self.context_window = context_window or self.estimator.context_window
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+
+    def weight(self, text: str) -> float:
+        """带缓存的未取整token估算值
+
+        模板、摘要、固定指导文本在多次调用间是同一个字符串对象，哈希值已缓存，查找为O(1)。
+        """
+        if not text:
+            return 0.0
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+        value = self.estimator.weight(text)
+        self._cache[text] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def count(self, text: str) -> int:
+        return math.ceil(self.weight(text))
+
+    def count_all(self, parts: Iterable[str]) -> int:
+        return math.ceil(sum(self.weight(part) for part in parts))
+
+    def prompt_budget(self, max_tokens: int) -> int:
+        """提示词可用的token数：上下文窗口扣除输出长度和安全余量"""
+        reserve = max_tokens + SAFETY_TOKENS + int(self.context_window * SAFETY_RATIO)
+        return max(0, self.context_window - reserve)
+
+    def fit_head(self, text: str, tokens: int) -> str:
+        """返回不超过 tokens 个token的最长前缀"""
+        if tokens <= 0 or not text:
+            return ""
+        if self.weight(text) <= tokens:
+            return text
+        return text[:self._fit_length(text, tokens, from_end=False)]
+
+    def fit_tail(self, text, tokens: int, max_chars: Optional[int] = None) -> str:
+        """返回不超过 tokens 个token（且不超过 max_chars 个字符）的最长后缀
+
+        text 可以是 str 或 TextBuffer，只会切取末尾用到的部分。
+        """
+        length = len(text)
+        if max_chars is not None:
+            length = min(length, max(0, max_chars))
+        if tokens <= 0 or length <= 0:
+            return ""
+
+        # 从末尾按块累加，找到超出预算的那一块
+        weight = self.estimator.weight
+        total = 0.0
+        end = len(text)
+        taken = 0
+        while taken < length:
+            size = min(TAIL_BLOCK, length - taken)
+            block = text[end - taken - size:end - taken]
+            block_weight = weight(block)
+            if total + block_weight > tokens:
+                # 在该块内二分查找还能放下的最长后缀
+                keep = self._fit_length(block, tokens - total, from_end=True)
+                return text[end - taken - keep:]
+            total += block_weight
+            taken += size
+        return text[end - taken:]
+
+    def _fit_length(self, text: str, tokens: float, from_end: bool) -> int:
+        """二分查找 text 中估算值不超过 tokens 的最长前缀（或后缀）长度"""
+        weight = self.estimator.weight
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            part = text[-mid:] if from_end else text[:mid]
+            if weight(part) <= tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return low
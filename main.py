@@ -2,7 +2,6 @@ import os
 import sys
 import logging
 import traceback
-import importlib.util
 
 # 设置日志
 logging.basicConfig(
@@ -64,64 +63,59 @@ try:
 except ImportError:
     logger.warning("无法导入ctypes模块")
 
-# 检查ui模块是否存在
-def check_module(module_name):
-    """检查模块是否可以导入"""
-    try:
-        spec = importlib.util.find_spec(module_name)
-        if spec is not None:
-            logger.info(f"模块 {module_name} 可以被导入")
-            return True
-        else:
-            logger.warning(f"模块 {module_name} 不可用")
-            return False
-    except Exception as e:
-        logger.error(f"检查模块 {module_name} 时出错: {str(e)}")
-        return False
-
-# 检查关键模块
-check_module('ui')
-check_module('ui.app')
+def load_app_class():
+    """导入界面模块，返回 NovelGeneratorApp
 
-# 直接导入UI模块
-try:
-    # 尝试不同的导入方式
-    try:
-        from ui.app import NovelGeneratorApp
-        logger.info("成功导入UI模块 (从ui.app)")
-    except ImportError:
-        # 尝试直接导入
-        if is_frozen:
-            # 在打包环境中尝试绝对导入
-            sys.path.insert(0, os.path.join(base_dir, 'ui'))
-            import app
-            NovelGeneratorApp = app.NovelGeneratorApp
-            logger.info("成功导入UI模块 (从app)")
-        else:
-            # 其他情况下重新抛出异常
-            raise
-except ImportError as e:
-    logger.error(f"无法导入UI模块: {traceback.format_exc()}")
-    # 在控制台显示错误信息
-    print("错误：无法导入UI模块")
-    print(f"当前Python路径: {sys.path}")
-    print(f"错误详情: {str(e)}")
-    print("请尝试使用python main_wrapper.py启动程序")
-    
-    # 在GUI中显示错误（如果可能）
+    界面模块在 main() 中才导入：文本处理和批量生成的子进程会重新导入本模块，
+    不需要加载界面；生成器、网络库和媒体模块由界面在首次使用时导入。
+    """
     try:
-        import tkinter as tk
-        from tkinter import messagebox
-        root = tk.Tk()
-        root.withdraw()  # 隐藏主窗口
-        messagebox.showerror("导入错误", 
-                             f"无法导入UI模块。\n\n错误详情: {str(e)}\n\n请联系开发者获取支持。")
-    except:
-        pass
-    
-    # 等待用户按键后退出
-    input("按Enter键退出...")
-    sys.exit(1)
+        # 尝试不同的导入方式
+        try:
+            from ui.app import NovelGeneratorApp
+            logger.info("成功导入UI模块 (从ui.app)")
+        except ImportError:
+            # 尝试直接导入
+            if is_frozen:
+                # 在打包环境中尝试绝对导入
+                sys.path.insert(0, os.path.join(base_dir, 'ui'))
+                import app
+                NovelGeneratorApp = app.NovelGeneratorApp
+                logger.info("成功导入UI模块 (从app)")
+            else:
+                # 其他情况下重新抛出异常
+                raise
+        return NovelGeneratorApp
+    except ImportError as e:
+        logger.error(f"无法导入UI模块: {traceback.format_exc()}")
+        # 在控制台显示错误信息
+        print("错误：无法导入UI模块")
+        print(f"当前Python路径: {sys.path}")
+        print(f"错误详情: {str(e)}")
+        print("请尝试使用python main_wrapper.py启动程序")
+        
+        # 在GUI中显示错误（如果可能）
+        try:
+            import tkinter as tk
+            from tkinter import messagebox
+            root = tk.Tk()
+            root.withdraw()  # 隐藏主窗口
+            messagebox.showerror("导入错误", 
+                                 f"无法导入UI模块。\n\n错误详情: {str(e)}\n\n请联系开发者获取支持。")
+        except:
+            pass
+        
+        # 等待用户按键后退出
+        input("按Enter键退出...")
+        sys.exit(1)
+
+def profile_startup():
+    """输出启动时各模块的导入耗时（--profile-startup）"""
+    if is_frozen:
+        print("打包后的程序不支持 --profile-startup，请在源码目录中运行 python main.py --profile-startup")
+        return
+    from utils.startup_profile import profile_imports, format_report
+    print(format_report(profile_imports(cwd=current_dir)))
 
 def main():
     """
@@ -131,6 +125,7 @@ def main():
     from tkinter import messagebox
     
     logger.info("AI小说生成器启动")
+    NovelGeneratorApp = load_app_class()
     
     try:
         root = tk.Tk()
@@ -181,4 +176,10 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # 打包后的程序启动文本处理和批量生成的子进程时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if "--profile-startup" in sys.argv[1:]:
+        profile_startup()
+    else:
+        main() 
\ No newline at end of file
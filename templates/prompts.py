@@ -439,6 +439,51 @@ PROMPT_TEMPLATES = {
     }
 }
 
+# 续写提示词中的固定写作指导（get_prompt 按语言、是否超长文本拼接）
+ZH_GUIDELINES = (
+    "\n\n重要写作要求:\n"
+    "1. 风格要求：创作风格要求有创意、引人入胜、专业，适合小说阅读。\n"
+    "2. 创新性：不要简单重复已有内容或情节，要创造新的发展和转折。\n"
+    "3. 核心：专注于人物塑造和有趣的情节推进。\n"
+    "4. 平衡：平衡对话、动作、描写和内心活动。\n"
+    "5. 一致性：与已有的世界观和角色特征保持一致。\n"
+)
+ZH_LONG_TEXT_GUIDELINES = (
+    "6. 注意：这是一篇长篇小说（已超25万字），请专注于推进情节，避免重复。\n"
+    "7. 引入新鲜元素和发展，保持读者兴趣。\n"
+    "8. 避免过度的标点符号模式和冗余描述。\n"
+)
+ZH_LONG_TEXT_CONTINUATION = (
+    "\n\n特别注意：这是一篇已超过25万字的长篇小说。请确保你的续写：\n"
+    "1. 显著推进情节，而不是停留在当前事件。\n"
+    "2. 在保持故事连贯性的同时引入新鲜元素。\n"
+    "3. 避免任何对描述、对话模式或情节发展的重复。\n"
+    "4. 保持简洁、有目的的写作，减少冗余。\n"
+)
+ZH_LENGTH_GUIDANCE = "\n\n【重要要求】：\n1. 请生成至少800字的详细内容\n2. 包含丰富的情节发展、人物对话和场景描写\n3. 确保故事引人入胜，节奏合理\n4. 使用生动的描写和自然的对话\n5. 避免过于简短或草率的描述"
+
+EN_GUIDELINES = (
+    "\n\nImportant guidelines:\n"
+    "1. Write in a creative, engaging and professional style, suitable for a novel\n"
+    "2. Don't simply repeat existing content or plots, but create new developments and twists\n"
+    "3. Focus on character development and interesting plot progression\n"
+    "4. Balance dialogue, action, description, and introspection\n"
+    "5. Maintain consistency with existing worldbuilding and character traits\n"
+)
+EN_LONG_TEXT_GUIDELINES = (
+    "6. This is a long novel (over 250,000 words), so focus on advancing the plot and avoid repetition\n"
+    "7. Introduce fresh elements and developments to maintain reader interest\n"
+    "8. Avoid excessive punctuation patterns and redundant descriptions\n"
+)
+EN_LONG_TEXT_CONTINUATION = (
+    "\n\nThis is a long-form novel already exceeding 250,000 words. Please ensure your continuation:\n"
+    "1. Advances the plot significantly rather than lingering on current events\n"
+    "2. Introduces fresh elements while maintaining story coherence\n"
+    "3. Avoids any repetition of descriptions, dialogue patterns, or plot developments\n"
+    "4. Maintains concise, purposeful writing with minimal redundancy\n"
+)
+EN_LENGTH_GUIDANCE = "\n\nIMPORTANT REQUIREMENTS:\n1. Generate at least 800 words of detailed content\n2. Include rich plot development, character dialogue, and scene descriptions\n3. Ensure the story is engaging and well-paced\n4. Use vivid descriptions and natural dialogue"
+
 # 添加结局提示词
 ENDING_PROMPTS = {
     "中文": {
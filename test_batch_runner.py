@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试多进程批量生成
+验证任务分片、各进程写入同一输出目录、父进程汇总状态并只创建一次汇总文件
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from mock_llm_server import start_in_thread, list_novel_files
+from core.batch_runner import BatchRunner, split_round_robin
+from core.novel_store import read_novel_text
+
+
+def test_split_round_robin():
+    """测试任务轮询分片"""
+    assert split_round_robin(list(range(5)), 2) == [[0, 2, 4], [1, 3]]
+    assert split_round_robin([0], 4) == [[0]]
+
+
+def test_batch_runner():
+    """测试两个进程生成三本小说"""
+    server, stop_server = start_in_thread(chars=1500)
+
+    original_cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            output_dir = os.path.join(tmp_dir, "batch")
+            messages = []
+            runner = BatchRunner({
+                "api_key": "test_key",
+                "num_novels": 3,
+                "target_length": 3000,
+                "auto_summary_interval": 0,
+                "base_url": server.url,
+                "main_output_dir": output_dir
+            }, processes=2, status_callback=messages.append)
+            result = runner.run()
+            os.chdir(original_cwd)
+
+            assert result["output_dir"] == output_dir
+            assert result["failed_shards"] == []
+            assert result["completed"] == 3
+            assert any(message.startswith("[进程2]") for message in messages)
+
+            novels = list_novel_files(output_dir)
+            assert [name.split("_")[1] for name in novels] == ["1", "2", "3"]
+            for name in novels:
+                assert len(read_novel_text(os.path.join(output_dir, name))) >= 3000
+            with open(os.path.join(output_dir, "summary.txt"), "r", encoding="utf-8") as f:
+                assert "生成数量: 3本" in f.read()
+    finally:
+        os.chdir(original_cwd)
+        stop_server()
+
+
+if __name__ == "__main__":
+    test_split_round_robin()
+    test_batch_runner()
+    print("多进程批量生成测试通过")
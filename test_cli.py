@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试命令行批量生成
+验证任务文件校验、JSON Lines 进度输出、退出码、续写输出目录，以及收到 SIGTERM 时保存并退出
+"""
+
+import sys
+import os
+import io
+import json
+import signal
+import tempfile
+import subprocess
+import contextlib
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from mock_llm_server import LatencyModel, start_in_thread, list_novel_files
+from core.cli import main, EXIT_OK, EXIT_USAGE, EXIT_INTERRUPTED
+from core.novel_store import read_novel_text
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_job(directory, **job):
+    path = os.path.join(directory, "job.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    return path
+
+
+def run_cli(*args):
+    """以子进程运行 python -m core，返回 (退出码, 事件列表)"""
+    result = subprocess.run([sys.executable, "-m", "core", *args], cwd=PROJECT_DIR,
+                            capture_output=True, text=True, encoding="utf-8")
+    return result.returncode, [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def test_job_errors():
+    """测试任务文件错误时输出 error 事件并返回参数错误退出码"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for job, message in (({"api_key": "k", "colour": "red"}, "colour"),
+                             ({"api_key": "k", "status_callback": "x"}, "status_callback"),
+                             ({"api_key": "k", "processes": 0}, "processes")):
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                assert main([write_job(tmp_dir, **job)]) == EXIT_USAGE
+            event = json.loads(stdout.getvalue())
+            assert event["event"] == "error" and message in event["message"]
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            assert main([os.path.join(tmp_dir, "missing.json")]) == EXIT_USAGE
+
+
+def test_cli_without_gui():
+    """测试命令行入口不导入图形界面"""
+    code = "import sys, core.cli; print('tkinter' in sys.modules, 'ui.app' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True)
+    assert result.stdout.split() == ["False", "False"], result.stderr
+
+
+def test_cli_generate_and_resume():
+    """测试生成两本小说后续写同一输出目录"""
+    server, stop_server = start_in_thread(chars=1500)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = os.path.join(tmp_dir, "out")
+            job = write_job(tmp_dir, api_key="test_key", num_novels=2, target_length=3000,
+                            auto_summary_interval=0, base_url=server.url)
+
+            code, events = run_cli(job, "--output-dir", output_dir, "--processes", "2", "--concurrency", "1")
+            assert code == EXIT_OK
+            assert events[0]["event"] == "start" and events[0]["processes"] == 2
+            assert any(event["event"] == "progress" for event in events)
+            done = events[-1]
+            assert done["event"] == "done" and done["completed"] == done["expected"] == 2
+            assert done["output_dir"] == output_dir
+
+            novels = list_novel_files(output_dir)
+            lengths = [len(read_novel_text(os.path.join(output_dir, name))) for name in novels]
+            assert len(novels) == 2
+
+            code, events = run_cli(job, "--resume", output_dir)
+            assert code == EXIT_OK
+            assert events[-1]["completed"] == 2 and events[-1]["output_dir"] == output_dir
+            assert [len(read_novel_text(os.path.join(output_dir, name))) for name in novels] > lengths
+    finally:
+        stop_server()
+
+
+def test_cli_sigterm():
+    """测试收到 SIGTERM 时停止生成、保存内容并返回中断退出码"""
+    server, stop_server = start_in_thread(chars=500, latency=LatencyModel("fixed", 0.2))
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = os.path.join(tmp_dir, "out")
+            job = write_job(tmp_dir, api_key="test_key", num_novels=1, target_length=1000000,
+                            auto_summary_interval=0, base_url=server.url)
+            process = subprocess.Popen([sys.executable, "-m", "core", job, "--output-dir", output_dir],
+                                       cwd=PROJECT_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                       text=True, encoding="utf-8")
+            for line in process.stdout:
+                if json.loads(line)["event"] == "progress":
+                    break
+            process.send_signal(signal.SIGTERM)
+            events = [json.loads(line) for line in process.stdout]
+            assert process.wait(timeout=60) == EXIT_INTERRUPTED
+            assert events[-1]["event"] == "done" and events[-1]["stopped"]
+            assert any(name.endswith(".txt") for name in os.listdir(output_dir))
+    finally:
+        stop_server()
+
+
+if __name__ == "__main__":
+    test_job_errors()
+    test_cli_without_gui()
+    test_cli_generate_and_resume()
+    test_cli_sigterm()
+    print("命令行批量生成测试通过")
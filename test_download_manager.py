@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试媒体文件下载管理
+验证封面和音乐并发流式下载、连接中断后用 Range 请求续传、上次运行留下的临时文件续传，
+以及按内容哈希去重和已下载链接直接复用
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from aiohttp import web
+from mock_llm_server import start_in_thread
+from core.http_pool import ConnectionPool
+from core.download_manager import DownloadManager, PART_SUFFIX
+from core.media_generator import MediaGenerator
+
+SETUP = {"novel_type": "奇幻冒险", "protagonist_name": "林逸", "protagonist_age": 18, "background": "魔法学院"}
+
+
+def download(manager, *items):
+    """在新的事件循环中并发下载 (链接, 本地路径)，结束后关闭连接池"""
+    async def run():
+        try:
+            return await asyncio.gather(*(manager.download(url, path) for url, path in items))
+        finally:
+            await manager.http_pool.close()
+    return asyncio.run(run())
+
+
+def test_media_downloads_streamed():
+    """测试多张封面和音乐经由下载管理器下载，没有遗留临时文件"""
+    server, stop_server = start_in_thread(file_size=512 * 1024)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            media = MediaGenerator("test_key", status_callback=lambda message: None, base_url=server.media_url,
+                                   poll_interval=0.05, download_dir=tmp_dir)
+            results = media.generate_cover_images(SETUP, 6)
+            music = media.generate_music(SETUP)
+
+            paths = [result["local_path"] for result in results] + [music["local_path"]]
+            assert len(set(paths)) == 7 and server.stats["downloads"] == 7
+            for path in paths:
+                assert os.path.getsize(path) == 512 * 1024
+                with open(path, "rb") as f:
+                    assert f.read() == server.file_content(os.path.basename(path).split("_")[-1])
+            assert os.path.exists(os.path.join(tmp_dir, "downloads.json"))
+            assert not [name for _, _, files in os.walk(tmp_dir) for name in files if name.endswith(PART_SUFFIX)]
+    finally:
+        stop_server()
+
+
+def test_resume_after_disconnect():
+    """测试传输一半时连接断开，重试时只请求剩余部分"""
+    server, stop_server = start_in_thread(file_size=1024 * 1024, download_failures=2)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manager = DownloadManager(ConnectionPool(), tmp_dir, retry_delay=0.01)
+            local_path = os.path.join(tmp_dir, "music", "song.mp3")
+            [path] = download(manager, (f"{server.media_url}/files/song.mp3", local_path))
+
+            assert path == local_path
+            with open(path, "rb") as f:
+                assert f.read() == server.file_content("song.mp3")
+            assert manager.stats["retries"] == 2 and manager.stats["resumed"] == 2
+            assert server.stats["range_requests"] == 2
+            # 中断前已下载的部分没有重新传输
+            assert server.stats["download_bytes"] == 1024 * 1024
+    finally:
+        stop_server()
+
+
+def test_resume_partial_file_from_previous_run():
+    """测试上次运行留下的临时文件在新的下载管理器中续传；临时文件比服务器文件更长时从头下载"""
+    server, stop_server = start_in_thread(file_size=100 * 1024)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            content = server.file_content("cover.png")
+            first = os.path.join(tmp_dir, "first.png")
+            second = os.path.join(tmp_dir, "second.png")
+            with open(first + PART_SUFFIX, "wb") as f:
+                f.write(content[:30 * 1024])
+            with open(second + PART_SUFFIX, "wb") as f:
+                f.write(content + b"stale")
+
+            manager = DownloadManager(ConnectionPool(), tmp_dir, retry_delay=0.01)
+            download(manager, (f"{server.media_url}/files/cover.png", first))
+            with open(first, "rb") as f:
+                assert f.read() == content
+            assert server.stats["download_bytes"] == 70 * 1024
+
+            manager = DownloadManager(ConnectionPool(), tmp_dir, retry_delay=0.01)
+            [path] = download(manager, (f"{server.media_url}/files/cover.png?copy=1", second))
+            # 416 后从头下载，内容与 first.png 相同，去重后返回已有文件
+            assert path == first and manager.stats["retries"] == 1
+            assert not os.path.exists(second) and not os.path.exists(second + PART_SUFFIX)
+    finally:
+        stop_server()
+
+
+def test_dedup_and_cache():
+    """测试内容相同的文件只保留一份，已下载的链接不再请求服务器"""
+    server, stop_server = start_in_thread()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            url = f"{server.media_url}/files/a.png"
+            first, second, other = (os.path.join(tmp_dir, name) for name in ("1.png", "2.png", "3.png"))
+            manager = DownloadManager(ConnectionPool(), tmp_dir, max_concurrent=1)
+            paths = download(manager, (url, first), (url + "?copy=1", second), (f"{server.media_url}/files/b.png", other))
+            assert paths == [first, first, other] and manager.stats["deduplicated"] == 1
+            assert sorted(os.listdir(tmp_dir)) == ["1.png", "3.png", "downloads.json"]
+
+            # 新的下载管理器从索引中恢复，同一链接直接返回本地文件
+            downloads = server.stats["downloads"]
+            manager = DownloadManager(ConnectionPool(), tmp_dir)
+            assert download(manager, (url, os.path.join(tmp_dir, "4.png"))) == [first]
+            assert server.stats["downloads"] == downloads and manager.stats["cached"] == 1
+
+            # 文件被删除后重新下载
+            os.remove(first)
+            assert download(manager, (url, first)) == [first] and os.path.exists(first)
+    finally:
+        stop_server()
+
+
+def test_compressed_responses():
+    """测试下载时要求不压缩传输；服务器仍返回 gzip 内容时不按 Content-Length 校验，也不续传"""
+    content = os.urandom(64 * 1024)
+    encodings = []
+
+    async def handler(request):
+        encodings.append(request.headers.get("Accept-Encoding"))
+        response = web.Response(body=content)
+        if request.match_info["name"] == "forced.bin":
+            response.enable_compression(web.ContentCoding.gzip)
+        else:
+            response.enable_compression()
+        return response
+
+    async def run(tmp_dir):
+        app = web.Application()
+        app.router.add_get("/files/{name}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/files"
+        manager = DownloadManager(ConnectionPool(), tmp_dir, retry_delay=0.01)
+        forced = os.path.join(tmp_dir, "forced.bin")
+        # 上次下载留下的临时文件：压缩传输时不能按偏移续传，从头下载
+        with open(forced + PART_SUFFIX, "wb") as f:
+            f.write(content[:1000])
+        try:
+            plain = await manager.download(f"{url}/plain.bin", os.path.join(tmp_dir, "plain.bin"))
+            return (plain, await manager.download(f"{url}/forced.bin", forced)), manager
+        finally:
+            await manager.http_pool.close()
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        (plain, forced), manager = asyncio.run(run(tmp_dir))
+        assert set(encodings) == {"identity"}
+        assert plain == os.path.join(tmp_dir, "plain.bin") and forced == plain
+        with open(plain, "rb") as f:
+            assert f.read() == content
+        assert manager.stats["deduplicated"] == 1 and manager.stats["resumed"] == 0
+
+
+if __name__ == "__main__":
+    test_media_downloads_streamed()
+    test_resume_after_disconnect()
+    test_resume_partial_file_from_previous_run()
+    test_dedup_and_cache()
+    test_compressed_responses()
+    print("媒体文件下载管理测试通过")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试段落指纹索引
+验证近似重复段落检测、索引文件的增量写入和重新加载
+"""
+
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.fingerprint_index import FingerprintIndex
+
+
+def make_paragraph(rng, length=150):
+    return "".join(chr(0x4e00 + rng.randrange(3000)) for _ in range(length))
+
+
+def test_near_duplicate_lookup():
+    """测试能找到全书任意位置的近似重复段落，无关段落不会误判"""
+    rng = random.Random(11)
+    paragraphs = [make_paragraph(rng) for _ in range(500)]
+    index = FingerprintIndex()
+    index.add_text("\n\n".join(paragraphs))
+    assert len(index) == 500
+
+    # 修改开头段落中的一个字
+    edited = paragraphs[3][:50] + "的" + paragraphs[3][51:]
+    assert index.find_duplicate(edited) == 3
+    assert index.find_duplicate(paragraphs[499]) == 499
+    assert index.find_duplicate(make_paragraph(rng)) is None
+    # 过短的段落不参与检测
+    assert index.find_duplicate("他点了点头。") is None
+
+
+def test_persistence():
+    """测试索引增量追加到文件并可重新加载"""
+    rng = random.Random(5)
+    first = make_paragraph(rng)
+    second = make_paragraph(rng)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "奇幻_1_fingerprints.jsonl")
+
+        # 索引文件不存在时根据全文建立
+        index = FingerprintIndex.for_text(path, first)
+        assert len(index) == 1
+        index.add_text(second)
+
+        reloaded = FingerprintIndex.for_text(path, "")
+        assert len(reloaded) == 2
+        assert reloaded.find_duplicate(second) == 1
+
+        reloaded.rebuild(second)
+        assert len(FingerprintIndex.for_text(path, "")) == 1
+
+
+def test_replace_tail():
+    """测试末尾段落被替换后的索引与根据全文重建的结果一致"""
+    rng = random.Random(7)
+    paragraphs = [make_paragraph(rng) for _ in range(30)]
+    cleaned = [make_paragraph(rng) for _ in range(3)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "奇幻_1_fingerprints.jsonl")
+        index = FingerprintIndex(path)
+        for paragraph in paragraphs:
+            index.add_text(paragraph)
+        index.replace_tail("\n\n".join(paragraphs[-5:]), "\n\n".join(cleaned))
+
+        expected = FingerprintIndex()
+        expected.rebuild("\n\n".join(paragraphs[:-5] + cleaned))
+        assert index.fingerprints == expected.fingerprints
+        assert index.find_duplicate(paragraphs[-1]) is None
+        assert index.find_duplicate(cleaned[-1]) == 27
+        assert FingerprintIndex.for_text(path, "").fingerprints == expected.fingerprints
+
+
+if __name__ == "__main__":
+    test_near_duplicate_lookup()
+    test_persistence()
+    test_replace_tail()
+    print("段落指纹索引测试通过")
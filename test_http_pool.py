@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试共享HTTP连接池
+验证并发请求复用同一个会话，单个请求的网络错误不会关闭共享会话
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+from aiohttp import web
+
+from core.http_pool import ConnectionPool
+
+
+def test_pool_isolates_request_errors():
+    """测试一个请求失败不会影响其他请求和共享会话"""
+
+    async def ok_handler(request):
+        await asyncio.sleep(0.05)
+        return web.json_response({"ok": True})
+
+    async def broken_handler(request):
+        # 直接断开连接，模拟网络错误
+        request.transport.close()
+        return web.Response()
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/ok", ok_handler)
+        app.router.add_get("/broken", broken_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+        pool = ConnectionPool(limit_per_host=4)
+
+        async def fetch(path):
+            session = await pool.get_session()
+            try:
+                async with session.get(base + path) as response:
+                    return (await response.json())["ok"]
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return False
+
+        try:
+            results = await asyncio.gather(*[fetch("/ok") for _ in range(8)], fetch("/broken"))
+            assert results[:8] == [True] * 8
+            assert results[8] is False
+            assert not pool.closed
+            assert await fetch("/ok") is True
+            assert pool.sessions_created == 1
+        finally:
+            await pool.close()
+            await runner.cleanup()
+        assert pool.closed
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_pool_isolates_request_errors()
+    print("✅ 连接池测试完成")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试批量生成任务库
+验证状态、保存位置和重试次数的记录（包括API调用放弃重试时），以及批次中断后只续写未完成和尚未开始的小说
+"""
+
+import sys
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from aiohttp import web
+from mock_llm_server import LatencyModel, start_in_thread, list_novel_files
+from core.job_store import JobStore, job_store_path, STATUS_RUNNING, STATUS_DONE
+from core.generator import NovelGenerator
+from core.novel_store import read_novel_text
+
+
+def test_job_store_records():
+    """测试计划、开始、保存、重试和完成的记录，以及输出目录移动后路径仍然有效"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dir = os.path.join(tmp_dir, "out")
+        store = JobStore(job_store_path(output_dir))
+        store.plan(range(3))
+        txt_path = os.path.join(output_dir, "novel_1.txt")
+        setup = {"index": 0, "target_length": 1000, "word_count": 0, "content": "正文", "summaries": [{"word_count": 500}]}
+        store.start(txt_path, 0, setup)
+        store.update(txt_path, setup, {"length": 500, "txt_bytes": 1500, "log_bytes": 0})
+        store.add_retry(txt_path)
+        store.add_retry(txt_path)
+
+        entry = store.get(txt_path)
+        assert entry["status"] == STATUS_RUNNING and entry["retries"] == 2
+        assert entry["word_count"] == 500 and entry["txt_bytes"] == 1500
+        assert "content" not in entry["setup"] and entry["summaries"] == [{"word_count": 500}]
+        assert store.unstarted() == [1, 2]
+        assert store.counts() == {STATUS_RUNNING: 1, "pending": 2}
+
+        store.finish(txt_path, STATUS_DONE)
+        assert store.unfinished() == []
+        store.close()
+
+        moved_dir = os.path.join(tmp_dir, "moved")
+        shutil.move(output_dir, moved_dir)
+        store = JobStore(job_store_path(moved_dir))
+        assert store.entries()[0]["txt_path"] == os.path.join(moved_dir, "novel_1.txt")
+        # 再次开始时保留重试次数
+        store.start(os.path.join(moved_dir, "novel_1.txt"), 0, setup)
+        assert store.entries()[0]["retries"] == 2
+        store.close()
+
+
+def test_resume_interrupted_batch():
+    """测试批次中断后只续写被中断的小说并生成尚未开始的小说，全部完成后状态为 done"""
+    server, stop_server = start_in_thread(chars=500, latency=LatencyModel.parse("fixed:0.05"))
+
+    settings = dict(api_key="test_key", num_novels=3, max_workers=1, target_length=3000,
+                    auto_summary_interval=0, base_url=server.url, postprocess_workers=0)
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            generator = NovelGenerator(main_output_dir=output_dir, **settings)
+            worker = threading.Thread(target=lambda: asyncio.run(generator.generate_novels()))
+            worker.start()
+            deadline = time.time() + 30
+            while time.time() < deadline and not any(run.word_count > 0 for run in list(generator.runs.values())):
+                time.sleep(0.02)
+            generator.stop()
+            worker.join(timeout=30)
+            assert not worker.is_alive()
+
+            store = JobStore(job_store_path(output_dir))
+            interrupted = store.unfinished()
+            assert [entry["index"] for entry in interrupted] == [0]
+            assert interrupted[0]["word_count"] == len(read_novel_text(interrupted[0]["txt_path"])) > 0
+            assert store.unstarted() == [1, 2]
+            store.close()
+
+            resumed = NovelGenerator(continue_from_dir=output_dir, **settings)
+            assert [info["txt_path"] for info in resumed.continuation_files] == [interrupted[0]["txt_path"]]
+            assert resumed.novel_indices == [1, 2] and resumed.num_novels == 3
+            assert asyncio.run(resumed.generate_novels())
+            assert resumed.completed_novels == 3
+
+            store = JobStore(job_store_path(output_dir))
+            entries = store.entries()
+            assert not store.unfinished() and not store.unstarted()
+            assert [entry["index"] for entry in entries] == [0, 1, 2]
+            assert [os.path.basename(entry["txt_path"]) for entry in entries] == list_novel_files(output_dir)
+            for entry in entries:
+                assert entry["status"] == STATUS_DONE
+                assert entry["word_count"] == len(read_novel_text(entry["txt_path"])) >= 3000
+            store.close()
+
+            # 全部完成后再续写，与扫描目录一样续写所有小说
+            assert len(NovelGenerator(continue_from_dir=output_dir, **settings).continuation_files) == 3
+    finally:
+        stop_server()
+
+
+def test_api_give_up_recorded_as_retry():
+    """测试接口拒绝请求（4xx）时立即放弃，不再重复请求，放弃记录到所属小说的任务库条目"""
+    state = {"calls": 0}
+    text = "这是一段用于测试的小说正文。" * 40
+
+    async def handler(request):
+        state["calls"] += 1
+        if state["calls"] == 1:
+            return web.json_response({"error": "invalid api key"}, status=401)
+        return web.json_response({"choices": [{"message": {"content": text}}]})
+
+    async def run(output_dir):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            generator = NovelGenerator(api_key="test_key", target_length=500, auto_summary_interval=0,
+                                       base_url=f"http://127.0.0.1:{port}/v1/chat/completions",
+                                       main_output_dir=output_dir, postprocess_workers=0)
+            assert await generator.generate_novels()
+        finally:
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        asyncio.run(run(output_dir))
+        store = JobStore(job_store_path(output_dir))
+        [entry] = store.entries()
+        # 401 后 _generate_content 放弃一次，返回的空内容又触发一次"内容过短"重试
+        # （重复请求时第二次调用就会成功，不会记录重试）
+        assert entry["status"] == STATUS_DONE and entry["retries"] == 2
+        store.close()
+
+
+if __name__ == "__main__":
+    test_job_store_records()
+    test_resume_interrupted_batch()
+    test_api_give_up_recorded_as_retry()
+    print("任务库测试通过")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试异步媒体生成
+验证多张封面同时提交并发轮询、同步接口、正文完成后等待后台媒体任务，以及停止时不被媒体任务阻塞
+"""
+
+import sys
+import os
+import time
+import json
+import asyncio
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from mock_llm_server import start_in_thread
+from core.media_generator import MediaGenerator
+from core.generator import NovelGenerator
+
+SETUP = {"novel_type": "奇幻冒险", "protagonist_name": "林逸", "protagonist_age": 18, "background": "魔法学院"}
+
+
+def test_cover_images_concurrent():
+    """测试多张封面同时提交、并发等待，总耗时接近单张的耗时"""
+    server, stop_server = start_in_thread(media_delay=0.5)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            media = MediaGenerator("test_key", status_callback=lambda message: None, base_url=server.media_url,
+                                   poll_interval=0.05, download_dir=tmp_dir)
+            start = time.time()
+            results = media.generate_cover_images(SETUP, 4)
+            elapsed = time.time() - start
+
+            assert len(results) == 4 and elapsed < 1.5, elapsed
+            assert server.stats["media_submits"] == 4 and server.stats["downloads"] == 4
+            for result in results:
+                assert os.path.exists(result["local_path"])
+                assert result["local_path"].startswith(os.path.join(tmp_dir, "images"))
+
+            music = media.generate_music(SETUP)
+            assert music["status"] == "complete" and os.path.exists(music["local_path"])
+    finally:
+        stop_server()
+
+
+def test_media_runs_in_background():
+    """测试封面在后台生成：正文完成后等待媒体任务，并写入媒体信息"""
+    server, stop_server = start_in_thread(chars=1500, media_delay=0.3)
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            generator = NovelGenerator(api_key="test_key", num_novels=2, max_workers=2, target_length=3000,
+                                       auto_summary_interval=0, base_url=server.url, main_output_dir=output_dir,
+                                       generate_cover=True, num_cover_images=2, media_base_url=server.media_url,
+                                       postprocess_workers=0)
+            generator.media_generator.poll_interval = 0.05
+            generator.media_generator.download_dir = os.path.join(output_dir, "downloads")
+            assert asyncio.run(generator.generate_novels())
+
+            assert generator.completed_novels == 2 and not generator.media_tasks
+            assert server.stats["media_submits"] == 4 and server.stats["downloads"] == 4
+            with open(os.path.join(output_dir, "media_info.json"), encoding="utf-8") as f:
+                assert len(json.load(f)["images"]) == 2
+    finally:
+        stop_server()
+
+
+def test_stop_does_not_wait_for_media():
+    """测试正文完成后媒体任务仍在轮询时停止，生成立即结束并取消媒体任务"""
+    server, stop_server = start_in_thread(chars=1500, media_delay=600)
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            generator = NovelGenerator(api_key="test_key", num_novels=1, target_length=3000,
+                                       auto_summary_interval=0, base_url=server.url, main_output_dir=output_dir,
+                                       generate_cover=True, generate_music=True, media_base_url=server.media_url,
+                                       postprocess_workers=0)
+            generator.media_generator.download_dir = os.path.join(output_dir, "downloads")
+            result = {}
+            worker = threading.Thread(target=lambda: result.update(ok=asyncio.run(generator.generate_novels())))
+            worker.start()
+            deadline = time.time() + 30
+            while time.time() < deadline and not (getattr(generator, "completed_novels", 0) == 1
+                                                  and server.stats["media_polls"]):
+                time.sleep(0.05)
+            assert generator.completed_novels == 1 and worker.is_alive()
+
+            start = time.time()
+            generator.stop()
+            worker.join(timeout=10)
+            assert not worker.is_alive() and time.time() - start < 5
+            assert result["ok"] and not generator.media_tasks
+    finally:
+        stop_server()
+
+
+if __name__ == "__main__":
+    test_cover_images_concurrent()
+    test_media_runs_in_background()
+    test_stop_does_not_wait_for_media()
+    print("异步媒体生成测试通过")
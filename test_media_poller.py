@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试媒体任务批量轮询
+验证所有等待中的图片任务合并为一个查询请求、按进度调整轮询间隔、超时处理，
+以及 MediaTaskManager 中上次未完成的任务一并查询并更新状态
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+import aiohttp
+from mock_llm_server import start_in_thread
+from core.media_poller import TaskPoller, parse_progress
+from core.media_task_manager import MediaTaskManager
+from core.media_generator import MediaGenerator
+
+
+class FakeService:
+    """模拟的批量查询接口：任务在第 N 次查询时完成"""
+
+    def __init__(self, finish_after):
+        self.finish_after = finish_after  # 任务ID -> 第几次查询时完成（None 表示永不完成）
+        self.calls = []
+
+    async def query(self, ids):
+        self.calls.append(list(ids))
+        infos = []
+        for task_id in ids:
+            finish = self.finish_after.get(task_id)
+            if finish is not None and len(self.calls) >= finish:
+                infos.append({"id": task_id, "status": "FAILURE" if task_id == "bad" else "SUCCESS",
+                              "progress": "100%", "failReason": "banned prompt"})
+            else:
+                infos.append({"id": task_id, "status": "IN_PROGRESS", "progress": f"{len(self.calls) * 10}%"})
+        return infos
+
+
+def test_progress_and_interval():
+    """测试进度解析，以及进度越高轮询间隔越短"""
+    assert parse_progress("45%") == 0.45 and parse_progress(None) == 0.0 and parse_progress("120%") == 1.0
+
+    poller = TaskPoller(FakeService({}).query, min_interval=1, max_interval=9, jitter=0)
+    assert poller.next_interval([]) == 9 and poller.next_interval([0.5, 0.2]) == 5
+    assert poller.next_interval([1.0]) == 1
+
+    poller.jitter = 0.2
+    assert all(4 <= poller.next_interval([0.5]) <= 6 for _ in range(50))
+
+
+def test_single_request_per_interval():
+    """测试50个等待中的任务每个间隔只发出一个查询请求，结果分发给各自的等待方"""
+    finish_after = {f"mj-{i}": 2 + i % 3 for i in range(49)}
+    finish_after["bad"] = 2
+    service = FakeService(finish_after)
+
+    async def run():
+        poller = TaskPoller(service.query, min_interval=0.01, max_interval=0.02, batch_size=100)
+        results = await asyncio.gather(*(poller.wait(task_id, 5) for task_id in finish_after))
+        return poller, dict(zip(finish_after, results))
+
+    poller, results = asyncio.run(run())
+    assert len(service.calls) == poller.requests == 4
+    assert len(service.calls[0]) == 50 and poller.pending == 0
+    assert results["bad"]["status"] == "FAILURE"
+    assert all(results[task_id]["status"] == "SUCCESS" for task_id in finish_after if task_id != "bad")
+
+
+def test_timeout_and_batches():
+    """测试超过 batch_size 时分批查询，超时的等待方得到 None 且不再被轮询"""
+    service = FakeService({"a": 1, "b": 1, "c": 1, "slow": None})
+
+    async def run():
+        poller = TaskPoller(service.query, min_interval=0.01, max_interval=0.01, batch_size=2)
+        results = await asyncio.gather(*(poller.wait(task_id, 0.2) for task_id in ("a", "b", "c", "slow")))
+        await asyncio.sleep(0.05)
+        return poller, results
+
+    poller, results = asyncio.run(run())
+    assert [result is not None for result in results] == [True, True, True, False]
+    assert [len(ids) for ids in service.calls[:2]] == [2, 2] and poller.pending == 0
+    calls = len(service.calls)
+    time.sleep(0.05)
+    assert len(service.calls) == calls
+
+
+def test_task_manager_integration():
+    """测试封面任务记录在 MediaTaskManager 中，上次未完成的任务与新任务合并查询"""
+    server, stop_server = start_in_thread(media_delay=0.3)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 上次运行时提交、尚未完成的任务
+            orphan_id = asyncio.run(_submit_orphan(server))
+            manager = MediaTaskManager(os.path.join(tmp_dir, "media_tasks.json"))
+            orphan = manager.add_image_task(orphan_id, {"title": "旧小说"}, "prompt", tmp_dir)
+
+            media = MediaGenerator("test_key", status_callback=lambda message: None, base_url=server.media_url,
+                                   poll_interval=0.2, download_dir=tmp_dir, task_manager=manager)
+            results = media.generate_cover_images({"novel_type": "武侠江湖", "title": "新小说"}, 20)
+
+            assert len(results) == 20
+            # 每个间隔一个请求，而不是每个任务一个请求
+            assert server.stats["media_polls"] == media.poller.requests <= 8
+            reloaded = MediaTaskManager(os.path.join(tmp_dir, "media_tasks.json"))
+            assert reloaded.get_task(orphan)["status"] == "success"
+            assert not reloaded.get_pending_tasks()
+            completed = reloaded.get_completed_tasks()
+            assert len(completed) == 21
+            assert all(task["result"]["local_path"] for task in completed if task["local_id"] != orphan)
+    finally:
+        stop_server()
+
+
+async def _submit_orphan(server):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{server.media_url}/mj/submit/imagine", json={"prompt": "prompt"}) as res:
+            return (await res.json())["result"]
+
+
+if __name__ == "__main__":
+    test_progress_and_interval()
+    test_single_request_per_interval()
+    test_timeout_and_batches()
+    test_task_manager_integration()
+    print("媒体任务批量轮询测试通过")
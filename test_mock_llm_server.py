@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试本地模拟大模型服务
+验证同一种子返回相同内容、错误注入，以及生成器按配置的 base_url 并发生成多本小说
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+import aiohttp
+
+from mock_llm_server import MockLLMServer, LatencyModel, list_novel_files
+from core.generator import NovelGenerator
+from core.novel_store import read_novel_text
+
+
+async def _post(url, payload):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=payload) as response:
+            return response.status, response.headers.get("Retry-After"), await response.json()
+
+
+def test_seeded_responses_and_errors():
+    """测试同一种子返回相同内容，错误按概率注入"""
+    async def run(seed, rate_429=0.0):
+        server = MockLLMServer(seed=seed, chars=500, rate_429=rate_429,
+                               latency=LatencyModel.parse("uniform:0:0.01"))
+        url = await server.start()
+        try:
+            results = [await _post(url, {"messages": [{"role": "user", "content": "测试"}]})
+                       for _ in range(3)]
+        finally:
+            await server.stop()
+        return results, server.stats
+
+    first, _ = asyncio.run(run(1))
+    second, _ = asyncio.run(run(1))
+    other, _ = asyncio.run(run(2))
+    texts = [body["choices"][0]["message"]["content"] for _, _, body in first]
+    assert texts == [body["choices"][0]["message"]["content"] for _, _, body in second]
+    assert texts != [body["choices"][0]["message"]["content"] for _, _, body in other]
+    assert all(len(text) >= 500 for text in texts)
+
+    throttled, stats = asyncio.run(run(1, rate_429=1.0))
+    assert all(status == 429 and retry_after == "1" for status, retry_after, _ in throttled)
+    assert stats["status_429"] == 3
+
+
+def test_generate_novels_with_base_url():
+    """测试生成器使用配置的 base_url，并发生成的各本小说分别保存"""
+    async def run(tmp_dir):
+        server = MockLLMServer(chars=1500, rate_500=0.2, seed=3)
+        url = await server.start()
+        try:
+            generator = NovelGenerator(api_key="test_key", num_novels=2, max_workers=2,
+                                       target_length=3000, auto_summary_interval=0, base_url=url)
+            generator.output_dir = tmp_dir
+            await generator.generate_novels()
+        finally:
+            await server.stop()
+        return generator, server.stats
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            generator, stats = asyncio.run(run(tmp_dir))
+        finally:
+            os.chdir(original_cwd)
+
+        assert generator.base_url.startswith("http://127.0.0.1:")
+        assert stats["ok"] > 0
+        novels = list_novel_files(generator.main_output_dir)
+        assert [name.split("_")[1] for name in novels] == ["1", "2"]
+        for name in novels:
+            assert len(read_novel_text(os.path.join(generator.main_output_dir, name))) >= 3000
+
+
+if __name__ == "__main__":
+    test_seeded_responses_and_errors()
+    test_generate_novels_with_base_url()
+    print("模拟大模型服务测试通过")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试单本小说的生成上下文
+验证进度计算、多本小说并发生成时各自的摘要间隔和保存互不影响，以及停止时各小说写入自己的文件
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from mock_llm_server import MockLLMServer, LatencyModel, start_in_thread, list_novel_files
+from core.novel_run import NovelRun, LONG_TEXT_THRESHOLD
+from core.generator import NovelGenerator
+from core.novel_store import read_novel_text, read_novel_metadata
+
+
+def test_novel_run_progress():
+    """测试进度和预计剩余时间只按本小说的字数计算"""
+    setup = {"index": 2, "target_length": 1000}
+    run = NovelRun(2, setup, "/tmp/novel_3.txt", "甲" * 200)
+    assert run.novel_id == 2 and run.meta_path == "/tmp/novel_3_meta.json"
+    assert run.last_summary_word_count == 200 and not run.is_long_text
+
+    run.start_time -= 10
+    run.text.append("乙" * 300)
+    run.update_progress()
+    assert setup["word_count"] == 500 and setup["percentage"] == 50.0
+    assert abs(setup["estimated_time"] - 500 / 30) < 0.5
+
+    assert NovelRun(0, {}, "a.txt", "字" * (LONG_TEXT_THRESHOLD + 1)).is_long_text
+
+
+def test_concurrent_novels_are_isolated():
+    """测试四本小说并发生成时各自按自己的字数生成摘要并保存到各自的文件"""
+    async def run(output_dir):
+        server = MockLLMServer(chars=1500, latency=LatencyModel.parse("uniform:0.01:0.05"))
+        url = await server.start()
+        try:
+            generator = NovelGenerator(api_key="test_key", num_novels=4, max_workers=4, target_length=4000,
+                                       auto_summary_interval=1500, base_url=url, main_output_dir=output_dir,
+                                       postprocess_workers=0)
+            assert await generator.generate_novels()
+        finally:
+            await server.stop()
+        return generator
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = asyncio.run(run(output_dir))
+        assert generator.completed_novels == 4
+        assert not generator.runs and not generator.summary_tasks
+
+        novels = list_novel_files(output_dir)
+        assert [name.split("_")[1] for name in novels] == ["1", "2", "3", "4"]
+        for name in novels:
+            path = os.path.join(output_dir, name)
+            meta = read_novel_metadata(path.replace(".txt", "_meta.json"))
+            assert meta["word_count"] == len(read_novel_text(path)) >= 4000
+            # 每本小说都按自己的字数生成了后台摘要
+            assert meta.get("summaries"), name
+
+
+def test_stop_saves_each_novel():
+    """测试停止时各小说的正文保存到自己的文件，不产生额外文件"""
+    server, stop_server = start_in_thread(chars=800, latency=LatencyModel.parse("fixed:0.05"))
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            generator = NovelGenerator(api_key="test_key", num_novels=3, max_workers=3, target_length=1000000,
+                                       auto_summary_interval=0, base_url=server.url, main_output_dir=output_dir,
+                                       postprocess_workers=0)
+            worker = threading.Thread(target=lambda: asyncio.run(generator.generate_novels()))
+            worker.start()
+            deadline = time.time() + 30
+            while time.time() < deadline and not (
+                    len(generator.runs) == 3 and all(run.word_count > 0 for run in list(generator.runs.values()))):
+                time.sleep(0.05)
+            generator.stop()
+            worker.join(timeout=30)
+            assert not worker.is_alive()
+
+            novels = list_novel_files(output_dir)
+            assert len(novels) == 3, novels
+            for name in novels:
+                path = os.path.join(output_dir, name)
+                text = read_novel_text(path)
+                assert text and read_novel_metadata(path.replace(".txt", "_meta.json"))["word_count"] == len(text)
+    finally:
+        stop_server()
+
+
+def test_save_from_other_thread_snapshots_on_loop():
+    """测试从其他线程保存时在事件循环中取快照，不破坏正在追加的正文缓冲区"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            generator = NovelGenerator(api_key="test_key", main_output_dir=output_dir, postprocess_workers=0)
+            generator._loop = loop
+            setup = {"genre": "奇幻冒险", "id": "race", "target_length": 100000}
+            run = generator._get_run(setup)
+            done = threading.Event()
+            # 记录取快照的线程：正文缓冲区只能在事件循环线程中读取
+            snapshot_threads = set()
+            snapshot = run.snapshot
+            run.snapshot = lambda: (snapshot_threads.add(threading.get_ident()), snapshot())[1]
+
+            async def write():
+                for i in range(3000):
+                    run.text.append(str(i % 10) * 7)
+                    if i % 50 == 0:
+                        await asyncio.sleep(0)
+                done.set()
+
+            asyncio.run_coroutine_threadsafe(write(), loop)
+            saves = 0
+            while not done.is_set() or saves < 3:
+                generator._save_all_novels()
+                saves += 1
+                saved = read_novel_text(run.txt_path)
+                assert saved == asyncio.run_coroutine_threadsafe(_prefix(run, len(saved)), loop).result()
+
+            assert snapshot_threads == {thread.ident}
+            text = asyncio.run_coroutine_threadsafe(_prefix(run, None), loop).result()
+            assert len(run.text) == len(text) == 21000
+            assert text == "".join(str(i % 10) * 7 for i in range(3000))
+            generator._close_novel_stores()
+            assert read_novel_text(run.txt_path) == text
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def _prefix(run, length):
+    text = str(run.text)
+    return text if length is None else text[:length]
+
+
+if __name__ == "__main__":
+    test_novel_run_progress()
+    test_concurrent_novels_are_isolated()
+    test_stop_saves_each_novel()
+    test_save_from_other_thread_snapshots_on_loop()
+    print("小说生成上下文测试通过")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试追加式小说存储
+验证块日志回放、合并中断后的恢复、元数据增量日志，以及写盘量随长度线性增长
+"""
+
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+
+from core.novel_store import (NovelStore, read_novel_text, read_novel_metadata, chunk_log_path,
+                              read_text_ref)
+from core.generator import NovelGenerator
+
+
+def make_chunk(rng, length=2000):
+    return "".join(chr(0x4e00 + rng.randrange(3000)) for _ in range(length))
+
+
+def test_append_and_replace_tail():
+    """测试追加、末尾替换后读取的内容与内存中一致，写盘量线性增长"""
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        txt_path = os.path.join(tmp_dir, "奇幻_1.txt")
+        store = NovelStore(txt_path)
+        text = ""
+        for i in range(200):
+            text = text.rstrip() + "\n\n" + make_chunk(rng)
+            if i % 40 == 39:
+                # 模拟长文本清理：替换最近一部分内容
+                text = text[:-3000] + "清理后的内容。" * 50
+            store.save_text(text)
+            store.save_metadata({"id": 1, "word_count": len(text), "content": text})
+            assert read_novel_text(txt_path) == text
+
+        meta = read_novel_metadata(txt_path.replace(".txt", "_meta.json"))
+        assert meta["word_count"] == len(text)
+        assert "content" not in meta
+
+        # 整体重写时写盘量约为 200 * 平均长度；追加式存储只写入其几分之一
+        assert store.bytes_written < len(text.encode("utf-8")) * 5
+
+        store.close()
+        assert not os.path.exists(chunk_log_path(txt_path))
+        with open(txt_path, "r", encoding="utf-8") as f:
+            assert f.read() == text
+
+
+def test_save_from_offset():
+    """测试只传入改动位置之后的正文，包括改动超出内存中末尾窗口时从磁盘补齐"""
+    rng = random.Random(4)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        txt_path = os.path.join(tmp_dir, "奇幻_3.txt")
+        store = NovelStore(txt_path, min_compact_bytes=32 * 1024)
+        text = ""
+        saved = 0
+        for i in range(120):
+            offset = saved
+            if i % 30 == 29 and len(text) > 70000:
+                # 改写末尾窗口之前的几个字
+                offset = len(text) - 70000
+                text = text[:offset] + "清理后" + text[offset + 3:]
+            text += make_chunk(rng)
+            store.save_text(text[offset:], offset)
+            saved = len(text)
+            assert read_novel_text(txt_path) == text
+        assert store.bytes_written < len(text.encode("utf-8")) * 5
+
+        try:
+            store.save_text("多余的内容", len(text) + 1)
+            assert False, "起始位置超出已保存的长度时应当报错"
+        except ValueError:
+            pass
+        store.close()
+        with open(txt_path, "r", encoding="utf-8") as f:
+            assert f.read() == text
+
+
+def test_recovery():
+    """测试合并中断留下的旧日志被丢弃，不完整的最后一条记录被忽略"""
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        txt_path = os.path.join(tmp_dir, "奇幻_2.txt")
+        store = NovelStore(txt_path)
+        first = make_chunk(rng)
+        second = first + make_chunk(rng)
+        store.save_text(first)
+        store.save_text(second)
+        store._close_log()
+
+        log_path = chunk_log_path(txt_path)
+        with open(log_path, "rb") as f:
+            stale_log = f.read()
+
+        # 模拟合并时 .txt 已替换、日志尚未删除
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(second)
+        assert read_novel_text(txt_path) == second
+
+        # 模拟写入最后一条记录时中断
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(first)
+        with open(log_path, "wb") as f:
+            f.write(stale_log + b'{"a": "\xe6\x9c\xaa\xe5')
+        assert read_novel_text(txt_path) == second
+
+
+def test_text_ref_and_migration():
+    """测试元数据按引用保存正文，旧版本内嵌正文的元数据在加载时被迁移"""
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 新格式：合并后 text_ref 指向完整正文
+        txt_path = os.path.join(tmp_dir, "奇幻_1.txt")
+        store = NovelStore(txt_path)
+        text = make_chunk(rng)
+        for _ in range(5):
+            text += make_chunk(rng)
+            store.save_text(text)
+            store.save_metadata({"id": 1, "word_count": len(text)})
+        store.close()
+        with open(txt_path.replace(".txt", "_meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        assert "content" not in meta
+        assert read_text_ref(tmp_dir, meta["text_ref"]) == text
+
+        # 旧格式：正文内嵌在 _meta.json 中，且 .txt 已丢失
+        legacy_meta = os.path.join(tmp_dir, "武侠_2_meta.json")
+        legacy_text = make_chunk(rng)
+        with open(legacy_meta, "w", encoding="utf-8") as f:
+            json.dump({"id": 2, "genre": "武侠", "content": legacy_text}, f, ensure_ascii=False)
+
+        generator = NovelGenerator(api_key="test_key", continue_from_dir=tmp_dir)
+        paths = sorted(os.path.basename(info["txt_path"]) for info in generator.continuation_files)
+        assert paths == ["奇幻_1.txt", "武侠_2.txt"]
+
+        migrated = read_novel_metadata(legacy_meta)
+        assert "content" not in migrated
+        assert read_text_ref(tmp_dir, migrated["text_ref"]) == legacy_text
+        assert read_novel_text(os.path.join(tmp_dir, "武侠_2.txt")) == legacy_text
+
+
+if __name__ == "__main__":
+    test_append_and_replace_tail()
+    test_save_from_offset()
+    test_recovery()
+    test_text_ref_and_migration()
+    print("追加式小说存储测试通过")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试提示词模板
+验证模板编译与单遍渲染、按小说设定缓存渲染结果，以及 get_prompt 的占位符替换
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.prompt_template import compile_template, render_for_setup, setup_values, PROMPT_CACHE_KEY
+from core.generator import NovelGenerator
+from core.novel_store import EXCLUDED_META_KEYS
+
+
+def test_render():
+    """测试渲染结果与依次替换一致，未提供的占位符保留原样"""
+    template = compile_template("主角：[PROTAGONIST_NAME]，年龄：[PROTAGONIST_AGE]，世界：[WORLD_SETTING]，[UNKNOWN]")
+    assert template.slots == ["PROTAGONIST_NAME", "PROTAGONIST_AGE", "WORLD_SETTING", "UNKNOWN"]
+    assert compile_template(template.text) is template
+
+    values = setup_values({"protagonist": {"name": "林逸"}, "themes": ["成长", "友情"]})
+    assert values["PROTAGONIST_AGE"] == "未指定"
+    assert values["THEMES_LIST"] == "成长、友情"
+    assert "WORLD_SETTING" not in values
+    assert template.render(values) == "主角：林逸，年龄：未指定，世界：[WORLD_SETTING]，[UNKNOWN]"
+
+
+def test_render_for_setup_cache():
+    """测试渲染结果缓存在设定中，设定变化后重新渲染"""
+    setup = {"protagonist": "张三", "world_building": {"setting": "天元大陆"}}
+    text = "[PROTAGONIST_NAME]身处[WORLD_SETTING]"
+    assert render_for_setup(text, setup) == "张三身处天元大陆"
+    cache = setup[PROMPT_CACHE_KEY]
+    assert render_for_setup(text, setup) == "张三身处天元大陆"
+    assert setup[PROMPT_CACHE_KEY] is cache
+
+    setup["protagonist"] = "李四"
+    assert render_for_setup(text, setup) == "李四身处天元大陆"
+    assert setup[PROMPT_CACHE_KEY] is not cache
+
+
+def test_get_prompt():
+    """测试 get_prompt 替换自定义提示词中的占位符，缓存字段不写入元数据"""
+    generator = NovelGenerator(api_key="test_key")
+    generator.custom_prompt = "请创作：主角[PROTAGONIST_NAME]，主题[THEMES_LIST]"
+    setup = {"genre": "奇幻冒险", "language": "中文", "protagonist": {"name": "林逸"}, "themes": ["冒险"]}
+    prompt = generator.get_prompt(setup, "第一段\n\n第二段")
+    assert prompt.startswith("请创作：主角林逸，主题冒险\n\n请用中文创作。")
+    assert "已有内容（最近部分）:\n第二段" in prompt
+    assert PROMPT_CACHE_KEY in setup and PROMPT_CACHE_KEY in EXCLUDED_META_KEYS
+
+
+if __name__ == "__main__":
+    test_render()
+    test_render_for_setup_cache()
+    test_get_prompt()
+    print("提示词模板测试通过")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试速率限制器
+验证令牌桶限流、AIMD并发调整、同一次故障只升级一次冷却、取消不计为限流，
+以及生成器遇到429时由限制器统一冷却后重试
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+
+from core.rate_limiter import RateLimiter
+from core.generator import NovelGenerator
+
+
+def test_request_bucket():
+    """测试每分钟请求数额度用完后需要等待"""
+    limiter = RateLimiter(requests_per_minute=2, max_concurrency=10)
+    for _ in range(2):
+        assert limiter.acquire_sync()
+        limiter.release(200)
+    assert limiter._try_acquire(0) > 0
+
+
+def test_aimd_concurrency():
+    """测试限流时并发上限减半并遵守Retry-After，成功后逐步恢复"""
+    limiter = RateLimiter(max_concurrency=4)
+    limiter.acquire_sync()
+    limiter.release(429, retry_after=0.2)
+    stats = limiter.stats()
+    assert stats["concurrency_limit"] == 2
+    assert 0 < stats["cooldown"] <= 0.2
+
+    limiter.cooldown_until = 0
+    for _ in range(10):
+        limiter.acquire_sync()
+        limiter.release(200)
+    assert limiter.stats()["concurrency_limit"] == 4
+
+
+def test_concurrent_failures_escalate_once():
+    """测试一次故障让多个进行中的请求同时失败时，只降低一次并发、冷却不叠加"""
+    limiter = RateLimiter(max_concurrency=8, base_cooldown=2.0)
+    for _ in range(4):
+        limiter.acquire_sync()
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.release(500, started=started)
+    stats = limiter.stats()
+    assert stats["concurrency_limit"] == 4 and stats["total_throttled"] == 4
+    assert stats["cooldown"] <= 2.0 * 1.2
+
+    # 冷却后新发出的请求再次失败，才按连续限流升级
+    limiter.cooldown_until = 0
+    limiter.acquire_sync()
+    limiter.release(500, started=time.monotonic())
+    stats = limiter.stats()
+    assert stats["concurrency_limit"] == 2 and 4.0 * 0.8 <= stats["cooldown"] <= 4.0 * 1.2
+
+
+def test_cancelled_request_is_not_throttle():
+    """测试请求被取消时只释放名额，不降低并发也不进入冷却"""
+    limiter = RateLimiter(max_concurrency=4, tokens_per_minute=1000)
+
+    async def request(started):
+        async with limiter.slot(100) as slot:
+            assert slot.acquired
+            started.set()
+            await asyncio.sleep(10)
+
+    async def run():
+        started = asyncio.Event()
+        task = asyncio.create_task(request(started))
+        await started.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0 and stats["total_throttled"] == 0
+    assert stats["cooldown"] == 0 and stats["concurrency_limit"] == 4
+    assert limiter.token_bucket.tokens > 999
+
+
+def test_concurrency_cap():
+    """测试同时进行的请求数不超过并发上限"""
+    limiter = RateLimiter(max_concurrency=3)
+    peak = {"value": 0}
+
+    async def task():
+        async with limiter.slot() as slot:
+            peak["value"] = max(peak["value"], limiter.in_flight)
+            await asyncio.sleep(0.02)
+            slot.record(200)
+
+    async def run():
+        await asyncio.gather(*[task() for _ in range(10)])
+
+    asyncio.run(run())
+    assert peak["value"] == 3
+    assert limiter.in_flight == 0
+
+
+def test_generator_retries_through_limiter():
+    """测试生成器遇到429后由限制器冷却并重试成功"""
+    state = {"calls": 0}
+    text = "这是一段用于测试的小说正文。" * 20
+
+    async def handler(request):
+        state["calls"] += 1
+        if state["calls"] == 1:
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "0.1"})
+        return web.json_response({"choices": [{"message": {"content": text}}]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            generator = NovelGenerator(api_key="test_key", max_workers=2)
+            generator.output_dir = tmp_dir
+            generator.base_url = f"http://127.0.0.1:{port}/v1/chat/completions"
+            generator.running = True
+            try:
+                content = await generator._generate_content("测试", {})
+            finally:
+                await generator.close_session()
+                await runner.cleanup()
+        return content, generator.rate_limiter.stats()
+
+    content, stats = asyncio.run(run())
+    assert content == text
+    assert state["calls"] == 2
+    assert stats["total_throttled"] == 1
+    assert stats["concurrency_limit"] == 2  # 限流时降为1，成功一轮后恢复
+    assert stats["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    test_request_bucket()
+    test_aimd_concurrency()
+    test_concurrent_failures_escalate_once()
+    test_cancelled_request_is_not_throttle()
+    test_concurrency_cap()
+    test_generator_retries_through_limiter()
+    print("速率限制器测试通过")
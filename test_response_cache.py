@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试响应缓存
+验证缓存键、TTL、LRU淘汰、高温调用绕过缓存，以及同步 generate_content 命中缓存时不再请求接口
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from mock_llm_server import start_in_thread
+from core.generator import NovelGenerator
+from core.response_cache import ResponseCache
+
+
+def test_cache_rules():
+    """测试命中、绕过、过期和淘汰规则"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResponseCache(os.path.join(tmp_dir, "cache.db"), max_entries=2, ttl=60)
+        args = ("mock", "请生成摘要", 0.3, 0.9, 4000)
+        assert cache.get(*args) is None
+        assert cache.put(*args, "摘要内容")
+        assert cache.get(*args) == "摘要内容"
+        # 任一采样参数不同都视为不同的调用
+        assert cache.get("mock", "请生成摘要", 0.3, 0.9, 3000) is None
+
+        # 高温调用不读写缓存
+        assert not cache.put("mock", "请继续写作", 0.8, 0.9, 4000, "正文")
+        assert cache.get("mock", "请继续写作", 0.8, 0.9, 4000) is None
+        assert cache.bypassed == 1
+
+        # 超出条目上限时淘汰最久未访问的条目
+        cache.put("mock", "提示词二", 0.3, 0.9, 4000, "二")
+        cache.get(*args)
+        cache.put("mock", "提示词三", 0.3, 0.9, 4000, "三")
+        assert cache.get(*args) == "摘要内容"
+        assert cache.get("mock", "提示词二", 0.3, 0.9, 4000) is None
+        assert cache.stats()["entries"] == 2
+
+        # 过期条目视为未命中
+        cache.ttl = 0.05
+        time.sleep(0.1)
+        assert cache.get(*args) is None
+        cache.close()
+
+
+def test_generate_content_uses_cache():
+    """测试重复的确定性调用从本地缓存读取"""
+    server, stop_server = start_in_thread(chars=500)
+
+    original_cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            cache = ResponseCache(os.path.join(tmp_dir, "cache.db"))
+            generator = NovelGenerator(api_key="test_key", base_url=server.url, response_cache=cache)
+
+            first = generator.generate_content("请生成摘要", temperature=0.2)
+            second = generator.generate_content("请生成摘要", temperature=0.2)
+            assert first and first == second
+            assert server.stats["requests"] == 1
+            assert cache.hits == 1
+
+            # 正常写作温度不使用缓存
+            generator.generate_content("请继续写作")
+            generator.generate_content("请继续写作")
+            assert server.stats["requests"] == 3
+            # 同步接口在当前进程中后处理，不遗留后处理进程池
+            assert generator.postprocessor.workers > 0 and generator.postprocessor._pool is None
+            cache.close()
+            os.chdir(original_cwd)
+    finally:
+        os.chdir(original_cwd)
+        stop_server()
+
+
+if __name__ == "__main__":
+    test_cache_rules()
+    test_generate_content_uses_cache()
+    print("响应缓存测试通过")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试小说设定生成
+验证设定数据只读、批量生成可复现，以及 NovelGenerator 生成的设定结构
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.setup_factory import create_novel_setups, load_setup_data
+from core.generator import NovelGenerator
+
+
+def test_setup_data_is_frozen():
+    """测试设定数据加载一次且不可修改"""
+    data = load_setup_data()
+    assert load_setup_data() is data
+    names = data["中文"]["protagonist"]["names"]["奇幻冒险"]
+    assert isinstance(names, tuple) and names
+    try:
+        data["中文"]["protagonist"]["names"]["奇幻冒险"] = ()
+        assert False, "设定数据应为只读"
+    except TypeError:
+        pass
+
+
+def test_create_novel_setups():
+    """测试相同种子生成相同的设定，指定的类型按顺序使用"""
+    first = create_novel_setups(2000, seed=7, timestamp=1700000000)
+    second = create_novel_setups(2000, seed=7, timestamp=1700000000)
+    assert json.dumps(first, ensure_ascii=False) == json.dumps(second, ensure_ascii=False)
+    assert create_novel_setups(5, seed=8, timestamp=1700000000) != first[:5]
+    assert [setup["index"] for setup in first[:3]] == [0, 1, 2]
+
+    setups = create_novel_setups(3, seed=1, novel_types=["玄幻修仙", "科幻未来"], target_length=50000)
+    assert [setup["genre"] for setup in setups[:2]] == ["玄幻修仙", "科幻未来"]
+    assert "cultivation_system" in setups[0]["world_building"]
+    assert "technologies" in setups[1]["world_building"]
+    assert setups[0]["target_length"] == 50000
+    assert 2 <= len(setups[0]["themes"]) <= 5
+
+    english = create_novel_setups(2, seed=1, novel_types=["奇幻冒险"], language="English")
+    assert set(english[0]["world_building"]) == {"setting", "era", "technology_level"}
+
+
+def test_generator_setup():
+    """测试 NovelGenerator 生成的设定"""
+    generator = NovelGenerator(api_key="test_key", novel_type="青春校园")
+    setup = generator._create_novel_setup(3)
+    assert setup["index"] == 3 and setup["genre"] == "青春校园"
+    assert 16 <= setup["protagonist"]["age"] <= 22
+    assert set(setup["story_structure"]) == {"act1", "act2", "act3"}
+
+
+if __name__ == "__main__":
+    test_setup_data_is_frozen()
+    test_create_novel_setups()
+    test_generator_setup()
+    print("小说设定生成测试通过")
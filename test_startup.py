@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试启动耗时
+验证启动界面时不导入生成器、网络库、媒体和三千流模块，且冷启动导入耗时在预算内
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.startup_profile import (profile_imports, parse_importtime, startup_entries, format_report,
+                                   STARTUP_BUDGET)
+
+
+def test_parse_importtime():
+    """测试解析 -X importtime 输出"""
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   json.decoder",
+        "import time:       200 |        300 | json",
+        "import time:        50 |         50 |     _tkinter",
+        "import time:       400 |        450 |   tkinter",
+        "import time:      1000 |       1450 | ui.app",
+    ])
+    entries = parse_importtime(output)
+    assert [e["module"] for e in entries] == ["json.decoder", "json", "_tkinter", "tkinter", "ui.app"]
+    assert entries[2]["depth"] == 2 and entries[4]["cumulative_us"] == 1450
+    assert [e["module"] for e in startup_entries(entries, ["ui.app"])] == ["_tkinter", "tkinter", "ui.app"]
+
+
+def test_startup_budget():
+    """测试界面模块冷启动时延迟导入的模块未被导入，耗时在预算内"""
+    profile = profile_imports()
+    assert profile["deferred_loaded"] == [], profile["deferred_loaded"]
+    assert profile["seconds"] < STARTUP_BUDGET, format_report(profile)
+    assert any(e["module"] == "ui.app" for e in profile["entries"])
+
+
+if __name__ == "__main__":
+    test_parse_importtime()
+    test_startup_budget()
+    print("启动耗时测试通过")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试流式（SSE）生成功能
+验证SSE解析、段落提前清理、停止时保留部分内容，以及流式续写写回原文件并报告进度
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from aiohttp import web
+from mock_llm_server import MockLLMServer
+
+from core import text_processing
+from core.generator import NovelGenerator
+from core.streaming import StreamSink, parse_sse_line, SSE_DONE
+from core.novel_store import read_novel_text, read_novel_metadata
+
+
+def _sse(content):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": content}}]}, ensure_ascii=False) + "\n\n"
+
+
+def test_parse_sse_line():
+    """测试SSE数据行解析"""
+    assert parse_sse_line(_sse("你好").strip()) == "你好"
+    assert parse_sse_line("data: [DONE]") == SSE_DONE
+    assert parse_sse_line(": keep-alive") is None
+    assert parse_sse_line("") is None
+    assert parse_sse_line('data: {"choices": [{"delta": {}}]}') is None
+
+
+def test_stream_sink_paragraphs():
+    """测试完整段落会被提前清理并写入缓冲文件"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        partial_path = os.path.join(tmp_dir, "novel.txt.partial")
+        sink = StreamSink(clean_func=lambda text, is_first: text.replace("！！！！！", "！！！"),
+                          partial_path=partial_path)
+        sink.feed("第一段内容！！！！！\n")
+        sink.feed("\n第二段")
+        assert os.path.exists(partial_path)
+        with open(partial_path, "r", encoding="utf-8") as f:
+            assert f.read() == "第一段内容！！！\n\n"
+        sink.feed("内容")
+        assert sink.cleaned_text() == "第一段内容！！！\n\n第二段内容"
+        assert sink.raw_text == "第一段内容！！！！！\n\n第二段内容"
+        sink.close()
+        assert not os.path.exists(partial_path)
+
+
+def test_stream_generation_and_stop():
+    """测试流式生成的完整结果，以及停止时保留已接收的部分内容"""
+    paragraphs = [f"第{i}段：林逸走过长长的山路，远处传来钟声。" * 3 for i in range(6)]
+    state = {}
+
+    async def handler(request):
+        payload = await request.json()
+        assert payload.get("stream") is True
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, paragraph in enumerate(paragraphs):
+            await response.write(_sse(paragraph + "\n\n").encode("utf-8"))
+            if state["stop_after"] is not None and i == state["stop_after"]:
+                state["generator"].stop_event.set()
+            await asyncio.sleep(0.01)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def run(stop_after):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            generator = NovelGenerator(api_key="test_key", stream=True)
+            generator.output_dir = tmp_dir
+            generator.base_url = f"http://127.0.0.1:{port}/v1/chat/completions"
+            generator.running = True
+            state["generator"] = generator
+            state["stop_after"] = stop_after
+
+            setup = {"genre": "奇幻冒险", "id": "stream", "target_length": 5000}
+            sink = generator._create_stream_sink(generator._get_run(setup))
+            try:
+                content = await generator._generate_text("测试提示词", stream_sink=sink)
+            finally:
+                await generator.close_session()
+                await runner.cleanup()
+            return content
+
+    full = asyncio.run(run(None))
+    assert full == "\n\n".join(paragraphs)
+
+    partial = asyncio.run(run(1))
+    assert partial
+    assert partial.startswith(paragraphs[0])
+    assert len(partial) < len(full)
+
+
+def _write_novel(novel_dir, text="开头。" * 300):
+    """写入一本待续写的小说及其元数据，返回文本路径"""
+    txt_path = os.path.join(novel_dir, "novel_1_奇幻冒险.txt")
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    with open(txt_path.replace(".txt", "_meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"genre": "奇幻冒险", "language": "中文", "target_length": 3000, "word_count": len(text)},
+                  f, ensure_ascii=False)
+    return txt_path
+
+
+def _run_continuation(output_dir, **kwargs):
+    """用模拟服务流式续写，返回收到的进度"""
+    progress = []
+
+    async def run():
+        server = MockLLMServer(chars=1500)
+        url = await server.start()
+        try:
+            generator = NovelGenerator(api_key="test_key", base_url=url, stream=True, auto_summary_interval=0,
+                                       postprocess_workers=0, progress_callback=progress.append,
+                                       status_callback=lambda message: None, **kwargs)
+            generator.output_dir = output_dir
+            assert await generator.generate_novels()
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+    return progress
+
+
+def test_stream_continuation_from_file():
+    """测试单文件流式续写写回原文件，不在默认输出目录中另存一份"""
+    with tempfile.TemporaryDirectory() as novel_dir, tempfile.TemporaryDirectory() as output_dir:
+        txt_path = _write_novel(novel_dir)
+        progress = _run_continuation(output_dir, continue_from_file=txt_path)
+
+        text = read_novel_text(txt_path)
+        assert len(text) >= 3000 and text.startswith("开头。")
+        assert read_novel_metadata(txt_path.replace(".txt", "_meta.json"))["word_count"] == len(text)
+        assert not os.path.exists(txt_path + ".partial")
+        assert not [name for name in os.listdir(output_dir) if name.startswith("novel_")]
+        assert progress
+
+
+def test_stream_continuation_from_dir_reports_progress():
+    """测试批量流式续写时，接收中的内容也会报告进度"""
+    with tempfile.TemporaryDirectory() as novel_dir, tempfile.TemporaryDirectory() as output_dir:
+        txt_path = _write_novel(novel_dir)
+        progress = _run_continuation(output_dir, continue_from_dir=novel_dir)
+
+        length = len(read_novel_text(txt_path))
+        assert length >= 3000
+        # 除每段完成后的字数外，还有接收过程中的进度
+        counts = [item["word_count"] for item in progress if "word_count" in item]
+        assert any(900 < count < length for count in counts), counts
+
+
+def test_stream_output_cleaned_once():
+    """测试流式生成和流式续写的正文只做一次整体处理，不再逐行清理整段内容"""
+    calls = {"clean_content": 0, "finish_clean": 0, "summaries": 0}
+    originals = {name: getattr(text_processing, name) for name in ("clean_content", "finish_clean")}
+    gather_texts = NovelGenerator._gather_texts
+
+    def counting(name):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return originals[name](*args, **kwargs)
+        return wrapper
+
+    async def counting_gather(self, prompts, label="摘要"):
+        # 摘要不是流式生成的，每个摘要完整清理一次
+        calls["summaries"] += len(prompts)
+        return await gather_texts(self, prompts, label)
+
+    for name in originals:
+        setattr(text_processing, name, counting(name))
+    NovelGenerator._gather_texts = counting_gather
+    try:
+        with tempfile.TemporaryDirectory() as novel_dir, tempfile.TemporaryDirectory() as output_dir:
+            _write_novel(novel_dir)
+            _run_continuation(output_dir, continue_from_dir=novel_dir)
+            _run_continuation(output_dir, num_novels=1, target_length=3000)
+    finally:
+        for name, func in originals.items():
+            setattr(text_processing, name, func)
+        NovelGenerator._gather_texts = gather_texts
+    assert calls["clean_content"] == calls["summaries"], calls
+    assert calls["finish_clean"] - calls["clean_content"] >= 4, calls
+
+
+if __name__ == "__main__":
+    test_parse_sse_line()
+    test_stream_sink_paragraphs()
+    test_stream_generation_and_stop()
+    test_stream_continuation_from_file()
+    test_stream_continuation_from_dir_reports_progress()
+    test_stream_output_cleaned_once()
+    print("✅ 流式生成功能测试完成")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试增量摘要树
+验证新增正文只为新叶子及其祖先请求摘要，缓存可持久化，末尾修改只影响对应叶子
+"""
+
+import sys
+import os
+import random
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.summary_cache import SummaryTree
+
+
+def make_text(rng, length):
+    return "".join(chr(0x4e00 + rng.randrange(3000)) for _ in range(length))
+
+
+class FakeSummarizer:
+    """记录请求的摘要函数：叶子摘要为首字符，合并摘要为子摘要拼接"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def __call__(self, requests):
+        self.requests.extend(requests)
+        return [content[0] if kind == "leaf" else "(" + "".join(content) + ")"
+                for kind, content in requests]
+
+
+def test_incremental_updates():
+    """测试每次追加只请求新叶子和祖先节点，结果与从头构建一致"""
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "奇幻_1_summary_tree.jsonl")
+        tree = SummaryTree(path, leaf_size=100, fanout=2)
+        summarizer = FakeSummarizer()
+
+        text = make_text(rng, 800)
+        root = asyncio.run(tree.update(text, summarizer))
+        # 8 个叶子 + 4 + 2 + 1 个合并节点
+        assert len(summarizer.requests) == 15
+
+        summarizer.requests.clear()
+        text += make_text(rng, 100)
+        root = asyncio.run(tree.update(text, summarizer))
+        # 新叶子及其所在的上层节点；只有一个子节点的父节点不需要请求
+        assert [kind for kind, _ in summarizer.requests] == ["leaf", "merge"]
+
+        fresh = SummaryTree(None, leaf_size=100, fanout=2)
+        assert asyncio.run(fresh.update(text, FakeSummarizer())) == root
+
+        # 从缓存文件恢复后不需要任何请求
+        reloaded = SummaryTree(path, leaf_size=100, fanout=2)
+        summarizer.requests.clear()
+        assert asyncio.run(reloaded.update(text, summarizer)) == root
+        assert summarizer.requests == []
+
+        # 修改末尾内容：只重新摘要末尾叶子及其祖先
+        text = text[:-50] + make_text(rng, 50)
+        asyncio.run(reloaded.update(text, summarizer))
+        assert [kind for kind, _ in summarizer.requests] == ["leaf", "merge"]
+
+
+def test_failed_node_is_retried():
+    """测试摘要失败的节点不被缓存，下次更新时重试"""
+    rng = random.Random(2)
+    text = make_text(rng, 300)
+    tree = SummaryTree(None, leaf_size=100, fanout=4)
+    calls = []
+
+    async def flaky(requests):
+        calls.append(len(requests))
+        return [None if kind == "leaf" and len(calls) == 1 and i == 1 else content[0]
+                for i, (kind, content) in enumerate(requests)]
+
+    assert asyncio.run(tree.update(text, flaky)) is None
+    assert asyncio.run(tree.update(text, flaky)) is not None
+    # 第二次只重试失败的叶子和根节点
+    assert calls == [3, 1, 1]
+
+
+if __name__ == "__main__":
+    test_incremental_updates()
+    test_failed_node_is_retried()
+    print("增量摘要树测试通过")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试并发分段摘要
+验证摘要请求并发发送、按原顺序返回，以及后台摘要不阻塞正文生成
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from mock_llm_server import MockLLMServer, LatencyModel
+from core.generator import NovelGenerator
+
+
+def test_segment_summaries_are_concurrent_and_ordered():
+    """测试摘要树的节点摘要并发请求（不超过 summary_concurrency），结果按提示词顺序返回"""
+    async def run():
+        generator = NovelGenerator(api_key="test_key", max_workers=4, context_length=2000)
+        generator.running = True
+        state = {"active": 0, "peak": 0}
+
+        async def fake_generate_text(prompt, stream_sink=None, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            # 越靠前的段落返回越慢，验证结果顺序与完成顺序无关
+            segment = prompt[-1000:]
+            await asyncio.sleep(0.05 if "甲" in segment else 0.01)
+            state["active"] -= 1
+            return None if "戊" in segment else segment[:1]
+
+        generator._generate_text = fake_generate_text
+        prompts = [generator._segment_summary_prompt(char * 1000) for char in "甲乙丙丁戊己"]
+        return await generator._gather_texts(prompts), state, generator.summary_concurrency
+
+    results, state, limit = asyncio.run(run())
+    assert results == ["甲", "乙", "丙", "丁", None, "己"]
+    assert state["peak"] == min(limit, 6) > 1
+
+
+def test_background_summary_does_not_block_generation():
+    """测试摘要在后台生成期间正文继续生成，结束前摘要写入小说设定"""
+    async def run(tmp_dir):
+        server = MockLLMServer(chars=1500, latency=LatencyModel.parse("fixed:0.01"))
+        url = await server.start()
+        try:
+            generator = NovelGenerator(api_key="test_key", target_length=6000,
+                                       auto_summary_interval=2000, base_url=url)
+            generator.output_dir = tmp_dir
+            generator.running = True
+            state = {"chunks_during_summary": 0, "summarizing": False}
+
+            original_generate_text = generator._generate_text
+
+            async def slow_summary(text, txt_path):
+                state["summarizing"] = True
+                await asyncio.sleep(0.3)
+                state["summarizing"] = False
+                return f"前{len(text)}字的摘要"
+
+            async def counting_generate_text(prompt, stream_sink=None, **kwargs):
+                if state["summarizing"]:
+                    state["chunks_during_summary"] += 1
+                return await original_generate_text(prompt, stream_sink, **kwargs)
+
+            generator._generate_incremental_summary = slow_summary
+            generator._generate_text = counting_generate_text
+            setup = {"genre": "奇幻冒险", "id": "bg", "target_length": 6000, "language": "中文"}
+            try:
+                await generator.generate_novel_content(setup)
+            finally:
+                await generator.close_session()
+                generator._close_novel_stores()
+        finally:
+            await server.stop()
+        return setup, state, generator
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        setup, state, generator = asyncio.run(run(tmp_dir))
+    assert state["chunks_during_summary"] > 0
+    assert setup["summaries"]
+    assert not generator.summary_tasks
+
+
+if __name__ == "__main__":
+    test_segment_summaries_are_concurrent_and_ordered()
+    test_background_summary_does_not_block_generation()
+    print("并发分段摘要测试通过")
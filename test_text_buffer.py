@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试分块文本缓冲区
+验证切片、末尾替换、去除空白与普通字符串的行为一致，以及与智能合并、追加式存储配合使用
+"""
+
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.text_buffer import TextBuffer
+from core.novel_store import NovelStore, read_novel_text
+from core.generator import NovelGenerator
+
+
+def test_matches_str():
+    """测试随机操作后与普通字符串结果一致"""
+    rng = random.Random(3)
+    buffer = TextBuffer()
+    text = ""
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.6:
+            piece = "".join(rng.choice("天地玄黄 \n") for _ in range(rng.randint(1, 50)))
+            buffer.append(piece)
+            text += piece
+        elif op < 0.8:
+            count = rng.randint(0, 80)
+            piece = "宇宙洪荒" * rng.randint(0, 5)
+            buffer.replace_tail(count, piece)
+            text = text[:max(0, len(text) - count)] + piece
+        else:
+            buffer.rstrip()
+            text = text.rstrip()
+
+        assert len(buffer) == len(text)
+        start, stop = sorted(rng.randint(-len(text) - 5, len(text) + 5) for _ in range(2))
+        assert buffer[start:stop] == text[start:stop]
+        assert buffer.tail(100) == text[-100:]
+        if text:
+            assert buffer[-1] == text[-1]
+    assert str(buffer) == text
+
+
+def test_str_is_read_only():
+    """测试 str() 不合并文本块"""
+    buffer = TextBuffer("第一章")
+    buffer.append("他醒了。")
+    assert str(buffer) == "第一章他醒了。" and len(buffer._chunks) == 2
+    assert buffer[3:] == "他醒了。"
+
+
+def test_changes_tracked():
+    """测试 changed_from 记录上次标记以来改动的最小位置"""
+    buffer = TextBuffer("第一章他醒了。")
+    assert buffer.changed_from == 0
+
+    buffer.mark()
+    buffer.append("  ")
+    assert buffer.changed_from == 7
+    buffer.rstrip()
+    buffer.replace_tail(3, "睡着了。")
+    assert buffer.changed_from == 4 and buffer[buffer.changed_from:] == "睡着了。"
+
+    buffer.mark()
+    buffer.mark_changed(2)
+    assert buffer.changed_from == 2
+
+
+def test_smart_join_and_store():
+    """测试智能合并就地追加，追加式存储可以直接保存缓冲区"""
+    generator = NovelGenerator(api_key="test_key")
+    buffer = TextBuffer("第一章\n\n他醒了。  \n")
+    expected = generator._smart_join_content(str(buffer), "窗外下着雨。")
+    result = generator._smart_join_content(buffer, "窗外下着雨。")
+    assert result is buffer
+    assert str(buffer) == expected
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        txt_path = os.path.join(tmp_dir, "奇幻_1.txt")
+        store = NovelStore(txt_path)
+        store.save_text(buffer)
+        buffer.append("\n\n雨停了。")
+        store.save_text(buffer)
+        buffer.replace_tail(3, "天亮了。")
+        store.save_text(buffer)
+        assert read_novel_text(txt_path) == str(buffer)
+
+
+if __name__ == "__main__":
+    test_matches_str()
+    test_str_is_read_only()
+    test_changes_tracked()
+    test_smart_join_and_store()
+    print("文本缓冲区测试通过")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试文本后处理
+验证模块级清理函数的行为，以及进程池执行与同步执行结果一致、进程池不可用时回退为同步执行
+"""
+
+import sys
+import os
+import random
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core import text_processing
+from core.text_processing import (PostProcessor, clean_content, fix_long_text_issues,
+                                  fix_punctuation, fix_punctuation_sequential)
+
+
+# 标点修复的固定样例：(输入, 期望输出)
+PUNCTUATION_GOLDEN = [
+    ("他笑了。。。。。。", "他笑了。。。"),
+    ("真的吗？？？？？", "真的吗？？？"),
+    ("好！！！！！！", "好！！！"),
+    ("等等......", "等等..."),
+    ("what!!!!!", "what!!!"),
+    ("why?????", "why???"),
+    ('他说""你好""', '他说"你好"'),
+    ("结束了。，然后", "结束了。然后"),
+    ("然后，。结束", "然后。结束"),
+    ("好！。", "好！"),
+    ("好。！", "好！"),
+    ("吗？。", "吗？"),
+    ("吗。？", "吗？"),
+    # 规则按顺序应用，前一条规则的结果会影响后一条
+    ("。，。", "。。"),
+    ("，。，", "。"),
+    ("。，。。。", "。。。。"),
+    ("普通的一句话，没有问题。", "普通的一句话，没有问题。"),
+]
+
+SAMPLE = "以下是继续的内容林逸推开门！！！！！\n\n\n\n注意: 这是说明\n\n# 第二章\n他笑了。，然后离开。"
+
+
+def test_clean_functions():
+    """测试前导文本、标记行、空行、标题和标点的清理"""
+    assert clean_content(SAMPLE) == "林逸推开门！！！\n\n第二章\n他笑了。然后离开。"
+
+    paragraph = "林逸走过长长的山路，远处传来钟声，他停下脚步望向山顶。"
+    text = "\n\n".join([paragraph, "另一段完全不同的内容，讲述了城中的集市和热闹的人群。", paragraph])
+    assert fix_long_text_issues(text).count(paragraph) == 1
+
+
+def test_fix_punctuation():
+    """测试单遍标点修复与逐条应用规则的结果一致"""
+    for text, expected in PUNCTUATION_GOLDEN:
+        assert fix_punctuation(text) == expected, text
+        assert fix_punctuation_sequential(text) == expected, text
+
+    rng = random.Random(42)
+    for _ in range(20000):
+        text = "".join(rng.choice('。，！？.!?"林 ') for _ in range(rng.randint(0, 30)))
+        assert fix_punctuation(text) == fix_punctuation_sequential(text), text
+
+
+def test_process_pool_and_fallback():
+    """测试进程池与同步执行结果一致，进程池损坏时回退为同步执行"""
+    async def run(processor):
+        try:
+            return await asyncio.gather(
+                processor.run(text_processing.clean_content, SAMPLE, 0),
+                processor.run(text_processing.tail_similarity, "林逸推开门", "他推开门走了")
+            )
+        finally:
+            processor.shutdown()
+
+    expected = asyncio.run(run(PostProcessor(0)))
+    assert asyncio.run(run(PostProcessor(2))) == expected
+
+    # 函数自身抛出的异常（即使是 OSError 等）传给调用方，进程池继续使用
+    async def failing(processor):
+        try:
+            await processor.run(os.stat, os.path.join(os.path.dirname(__file__), "不存在的文件"))
+        except FileNotFoundError:
+            return await processor.run(text_processing.tail_similarity, "林逸推开门", "他推开门走了")
+        finally:
+            processor.shutdown()
+    processor = PostProcessor(1)
+    assert asyncio.run(failing(processor)) == expected[1]
+    assert not processor.synchronous
+
+    # 进程池已关闭导致提交失败时改为同步执行
+    processor = PostProcessor(1)
+    processor._get_pool().shutdown()
+    result = asyncio.run(processor.run(text_processing.clean_content, SAMPLE, 0))
+    assert result == expected[0]
+    assert processor.synchronous
+
+
+if __name__ == "__main__":
+    test_clean_functions()
+    test_fix_punctuation()
+    test_process_pool_and_fallback()
+    print("文本后处理测试通过")
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试文本相似度计算
+验证后缀自动机实现与原动态规划实现结果一致
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.text_similarity import longest_common_substring, similarity, similarity_dp
+
+
+def test_known_cases():
+    """测试典型输入"""
+    assert similarity("", "abc") == 0
+    assert similarity("abc", "") == 0
+    assert longest_common_substring("他走进了房间", "她也走进了房间里") == 5
+    assert similarity("abc", "xxabcxx") == 1.0
+    assert similarity("abcd", "xyz") == 0
+
+
+def test_parity_with_dp():
+    """测试随机文本上与原动态规划实现结果一致"""
+    rng = random.Random(7)
+    for _ in range(1000):
+        a = "".join(rng.choice("天地玄黄") for _ in range(rng.randint(0, 30)))
+        b = "".join(rng.choice("天地玄黄") for _ in range(rng.randint(0, 30)))
+        assert similarity(a, b) == similarity_dp(a, b), (a, b)
+        assert similarity(a, b) == similarity(b, a)
+
+
+if __name__ == "__main__":
+    test_known_cases()
+    test_parity_with_dp()
+    print("文本相似度测试通过")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试token预算
+验证模型系列参数、估算值可加、按预算截取上下文，以及 get_prompt 不超出小窗口模型的上下文
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.token_budget import ContextAssembler, TokenEstimator, model_family
+from core.text_buffer import TextBuffer
+from core.generator import NovelGenerator
+
+
+def test_model_family():
+    """测试按模型名选择校准参数和上下文窗口"""
+    assert model_family("deepseek-chat")[0] == "deepseek"
+    assert model_family("moonshot-v1-128k")[3] == 128000
+    assert model_family("ERNIE-4.0-8K")[3] == 8000
+    assert model_family("unknown-model")[0] == "default"
+
+    estimator = TokenEstimator("deepseek-chat")
+    text_a, text_b = "林逸推开门，走了出去。", "He said hello."
+    assert abs(estimator.weight(text_a + text_b) - estimator.weight(text_a) - estimator.weight(text_b)) < 1e-9
+    assert estimator.count("林" * 100) == 60
+
+
+def test_fit_tail():
+    """测试截取的后缀恰好不超过预算"""
+    assembler = ContextAssembler("claude-3-7-sonnet-latest")
+    text = TextBuffer()
+    for i in range(200):
+        text.append(f"第{i}段：林逸走过长长的山路，远处传来钟声。Chapter {i} ends.\n\n")
+
+    tail = assembler.fit_tail(text, 1000)
+    assert str(text).endswith(tail)
+    assert assembler.count(tail) <= 1000
+    assert assembler.count(text[-(len(tail) + 1):]) > 1000
+
+    assert assembler.fit_tail(text, 10 ** 6, max_chars=500) == text[-500:]
+    assert assembler.fit_tail(text, 0) == ""
+
+
+def test_prompt_fits_window():
+    """测试小窗口模型的提示词加上输出长度不超出上下文窗口"""
+    generator = NovelGenerator(api_key="test_key", model="glm-4-airx")
+    setup = {"genre": "奇幻冒险", "language": "中文", "summaries": [{"summary": "摘要" * 200}]}
+    text = "林逸走过长长的山路，远处传来钟声。\n\n" * 5000
+    prompt = generator.get_prompt(setup, text)
+
+    assembler = generator._get_context_assembler()
+    assert assembler.count(prompt) + generator._completion_tokens(setup) <= assembler.context_window
+    assert "摘要" * 200 in prompt
+    assert prompt.count("远处传来钟声") > 10
+
+    # 切换模型后按新模型的窗口截取
+    generator.model = "gemini-2.0-flash"
+    assert len(generator.get_prompt(setup, text)) > len(prompt)
+
+
+if __name__ == "__main__":
+    test_model_family()
+    test_fit_tail()
+    test_prompt_fits_window()
+    print("token预算测试通过")
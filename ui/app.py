@@ -3,11 +3,9 @@ import sys
 import time
 import threading
 import tkinter as tk
-import asyncio
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 from typing import Dict, Any, Optional, List
 
-from PIL import Image, ImageTk
 import webbrowser
 import logging
 
@@ -19,14 +17,12 @@ if parent_dir not in sys.path:
 
 # 尝试使用相对导入（作为模块导入时）或使用绝对导入（直接运行时）
 try:
-    from ..core.generator import NovelGenerator
     from ..core.model_manager import get_model_list
     from ..utils.config import save_config, load_config
     from ..utils.common import open_directory
     from ..templates.prompts import MODEL_DESCRIPTIONS, GENRE_SPECIFIC_PROMPTS, __version__
     from .dialogs import AdvancedSettingsDialog, AboutDialog, WelcomeDialog, MultiTypeDialog
 except ImportError:
-    from core.generator import NovelGenerator
     from core.model_manager import get_model_list
     from utils.config import save_config, load_config
     from utils.common import open_directory
@@ -42,6 +38,8 @@ def run_asyncio_event_loop(coro):
     Returns:
         协程的运行结果
     """
+    # asyncio 导入较慢（会连带导入ssl），只在开始生成时导入
+    import asyncio
     try:
         # 在Windows上设置正确的事件循环策略
         if sys.platform.startswith('win'):
@@ -1016,7 +1014,11 @@ class NovelGeneratorApp:
                 "auto_summary_interval": self.auto_summary_interval_var.get() if self.auto_summary_var.get() else 0,
                 "generate_cover": self.generate_cover_var.get(),
                 "generate_music": self.generate_music_var.get(),
-                "num_cover_images": self.num_cover_images_var.get()
+                "num_cover_images": self.num_cover_images_var.get(),
+                "stream": self.advanced_settings.get("stream", False),
+                "requests_per_minute": self.advanced_settings.get("requests_per_minute", 0),
+                "tokens_per_minute": self.advanced_settings.get("tokens_per_minute", 0),
+                "base_url": self.advanced_settings.get("base_url", "")
             }
             
             # 保存配置
@@ -1052,7 +1054,11 @@ class NovelGeneratorApp:
             # 创建输出目录
             os.makedirs(self.output_dir, exist_ok=True)
             
-            # 创建生成器实例
+            # 创建生成器实例（生成器及其网络依赖在首次生成时才导入，加快启动）
+            try:
+                from ..core.generator import NovelGenerator
+            except ImportError:
+                from core.generator import NovelGenerator
             self.generator = NovelGenerator(**self.generation_settings)
             
             # 设置主输出目录
@@ -0,0 +1,122 @@
+"""
+启动耗时分析 - 统计启动界面时各模块的导入耗时。
+
+在子进程中使用 python -X importtime 导入界面模块（避免当前进程已缓存的模块影响结果），
+解析每个模块的自身耗时和累计耗时，并检查应当延迟导入的模块（生成器、网络库、媒体和
+三千流相关模块）是否被提前导入。main.py --profile-startup 和启动耗时测试都使用这里的函数。
+"""
+
+import os
+import sys
+import json
+import subprocess
+from typing import Any, Dict, List, Optional, Sequence
+
+# 启动窗口前需要导入的模块
+STARTUP_MODULES = ("ui.app",)
+
+# 应当在首次使用时才导入的模块
+DEFERRED_MODULES = (
+    "asyncio",
+    "ssl",
+    "aiohttp",
+    "core.generator",
+    "core.media_generator",
+    "core.media_task_manager",
+    "core.sanqianliu_generator",
+    "core.sanqianliu_interface",
+)
+
+# 冷启动导入耗时预算（秒），远高于正常值，只用于发现明显的回归
+STARTUP_BUDGET = 1.5
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+seconds = time.perf_counter() - start
+print(__import__("json").dumps({{"seconds": seconds, "deferred_loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 的输出，返回 [{module, self_us, cumulative_us, depth}]"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        entries.append({
+            "module": stripped,
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1]),
+            "depth": (len(name) - len(stripped) - 1) // 2,
+        })
+    return entries
+
+
+def startup_entries(entries: List[Dict[str, Any]], modules: Sequence[str]) -> List[Dict[str, Any]]:
+    """只保留 modules 及其导入的模块（importtime 先输出子模块，再输出导入它们的模块）"""
+    selected = []
+    inside = False
+    for entry in reversed(entries):
+        if entry["depth"] == 0:
+            inside = entry["module"] in modules
+        if inside:
+            selected.append(entry)
+    selected.reverse()
+    return selected
+
+
+def profile_imports(modules: Sequence[str] = STARTUP_MODULES,
+                    deferred: Sequence[str] = DEFERRED_MODULES,
+                    cwd: Optional[str] = None,
+                    python: Optional[str] = None) -> Dict[str, Any]:
+    """在新的子进程中导入 modules，返回总耗时、各模块耗时和被提前导入的延迟模块"""
+    code = _PROBE.format(modules=tuple(modules), deferred=tuple(deferred))
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd or PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {', '.join(modules)} 失败:\n{result.stderr[-2000:]}")
+
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    summary["entries"] = startup_entries(parse_importtime(result.stderr), modules)
+    return summary
+
+
+def format_report(profile: Dict[str, Any], top: int = 20) -> str:
+    """格式化启动耗时报告：按累计耗时排序的顶层模块（含直接导入）和自身耗时最高的模块"""
+    entries = profile["entries"]
+    lines = [f"启动导入总耗时: {profile['seconds'] * 1000:.1f} ms（预算 {STARTUP_BUDGET * 1000:.0f} ms）"]
+
+    lines.append("")
+    lines.append("顶层模块及其直接导入（累计耗时）:")
+    for entry in sorted((e for e in entries if e["depth"] <= 1),
+                        key=lambda e: e["cumulative_us"], reverse=True)[:top]:
+        lines.append(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}")
+
+    lines.append("")
+    lines.append("自身耗时最高的模块:")
+    for entry in sorted(entries, key=lambda e: e["self_us"], reverse=True)[:top]:
+        lines.append(f"  {entry['self_us'] / 1000:8.1f} ms  {entry['module']}")
+
+    loaded = profile["deferred_loaded"]
+    lines.append("")
+    if loaded:
+        lines.append(f"警告：以下模块应延迟导入，但在启动时已被导入: {', '.join(loaded)}")
+    else:
+        lines.append("延迟导入的模块均未在启动时导入")
+    return "\n".join(lines)